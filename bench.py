@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+无头帧时间基准
+每个屏幕脚本在独立子进程里运行（SDL dummy 驱动；game3.py 用 offscreen 驱动 + llvmpipe GL），
+指标源换成合成波形，视频用 ffmpeg lavfi 生成的测试片（没有 ffmpeg 时用合成帧流代替），
+跑固定帧数后退出，输出帧时间 p50/p95/p99、CPU 时间和峰值内存(RSS) 的 JSON。
+用法:
+    python bench.py                          # 跑所有屏幕
+    python bench.py home7.py game3.py --frames 600 --out bench.json
+"""
+import argparse
+import io
+import json
+import math
+import os
+import resource
+import runpy
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+DASHBOARDS = ["home.py", "home2.py", "home3.py", "home4.py", "home5.py", "home6.py", "home7.py"]
+VIDEO_SCREENS = ["game.py", "game2.py", "game3.py"]
+EXTERNAL_PLAYER = {"game.py"}  # 用 VLC 外部播放，只测菜单
+MENU_CLIPS = 48                # 只测菜单时的视频数，够翻几页
+SCREENS = DASHBOARDS + ["image_slider.py"] + VIDEO_SCREENS
+GL_SCREENS = {"game3.py"}
+
+
+# ------------------ 合成数据源 ------------------
+def install_synthetic_metrics():
+    """把 metrics_sampler 的读取函数换成随时间变化的正弦波，不依赖 sysfs"""
+    import metrics_sampler
+    t0 = time.monotonic()
+
+    def wave(lo, hi, period, phase=0.0):
+        def read():
+            t = time.monotonic() - t0
+            return lo + (hi - lo) * (0.5 + 0.5 * math.sin(2 * math.pi * t / period + phase))
+        return read
+
+    cores = os.cpu_count() or 1
+    metrics_sampler.get_cpu_temperature = wave(40, 80, 7.0)
+    metrics_sampler.get_cpu_usage = wave(0, 100, 3.0)
+    metrics_sampler.get_memory_usage = wave(20, 60, 11.0)
+    metrics_sampler.get_disk_usage = wave(30, 40, 13.0)
+    sent, recv = wave(0, 1024, 17.0), wave(0, 1024, 19.0, 1.0)
+    metrics_sampler.get_network_speed = lambda: (sent(), recv())
+    core_waves = [wave(0, 100, 3.0, i) for i in range(cores)]
+    metrics_sampler.get_cpu_core_usage = lambda: [w() for w in core_waves]
+
+
+class SyntheticStream(io.RawIOBase):
+    """无限长的伪视频字节流，按帧循环一段预先生成的图案"""
+    def __init__(self, block_size=1920 * 1080 * 3):
+        self.block = bytes((i * 7) & 0xFF for i in range(256)) * (block_size // 256 + 1)
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = len(b)
+        out = memoryview(b)
+        filled = 0
+        while filled < n:
+            chunk = self.block[self.pos:self.pos + n - filled]
+            out[filled:filled + len(chunk)] = chunk
+            filled += len(chunk)
+            self.pos = (self.pos + len(chunk)) % len(self.block)
+        return n
+
+
+class SyntheticDecoder:
+    """代替 ffmpeg 子进程：stdout 是合成帧流"""
+    def __init__(self, cmd):
+        self.args = cmd
+        self.stdout = io.BufferedReader(SyntheticStream())
+        self.stderr = None
+        self.returncode = None
+        self.pid = 0
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self, timeout=None):
+        self.returncode = self.returncode if self.returncode is not None else -9
+        return self.returncode
+
+    def kill(self):
+        self.returncode = -9
+
+    terminate = kill
+
+
+def install_synthetic_video():
+    real_popen = subprocess.Popen
+
+    def popen(cmd, *args, **kwargs):
+        if isinstance(cmd, (list, tuple)) and cmd and os.path.basename(cmd[0]) == "ffmpeg":
+            return SyntheticDecoder(cmd)
+        return real_popen(cmd, *args, **kwargs)
+    subprocess.Popen = popen
+
+
+def make_test_clip(folder, seconds=10):
+    """用 ffmpeg lavfi 的 testsrc2 生成一段 720p H.264 测试片，没有 ffmpeg 时放一个占位文件"""
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, "bench.mp4")
+    if shutil.which("ffmpeg"):
+        subprocess.run(["ffmpeg", "-loglevel", "error", "-y", "-f", "lavfi",
+                        "-i", f"testsrc2=size=1280x720:rate=30:duration={seconds}",
+                        "-c:v", "libx264", "-pix_fmt", "yuv420p", path], check=True)
+        return True
+    open(path, "wb").close()
+    return False
+
+
+# ------------------ 子进程：跑一个屏幕 ------------------
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(math.ceil(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[k]
+
+
+def run_child(screen, frames, warmup, out_path, tap, scroll, synthetic_video, deadline):
+    sys.path.insert(0, ROOT)
+    install_synthetic_metrics()
+    if synthetic_video:
+        install_synthetic_video()
+    import pygame
+
+    stamps = []
+    state = {"presents": 0}
+
+    def on_present():
+        state["presents"] += 1
+        stamps.append(time.perf_counter())
+        if state["presents"] >= frames + warmup:
+            # 播放器收到 QUIT 回到菜单，菜单再收到 QUIT 退出
+            pygame.event.post(pygame.event.Event(pygame.QUIT))
+
+    real_flip, real_update = pygame.display.flip, pygame.display.update
+
+    def flip():
+        real_flip()
+        on_present()
+
+    def update(*args):
+        real_update(*args)
+        on_present()
+
+    pygame.display.flip = flip
+    pygame.display.update = update
+
+    def watchdog():
+        # 空闲时仪表盘不刷新，帧数可能凑不够：到时间后不断投递 QUIT，直到屏幕退出
+        time.sleep(deadline)
+        while True:
+            if pygame.display.get_init():
+                pygame.event.post(pygame.event.Event(pygame.QUIT))
+            time.sleep(0.5)
+    threading.Thread(target=watchdog, daemon=True).start()
+
+    def driver():
+        # 菜单只在有变化时 flip，不能等它 present 再投递输入：窗口建好后由这个线程定时投递
+        while not (pygame.display.get_init() and pygame.display.get_surface()):
+            time.sleep(0.05)
+        time.sleep(0.2)
+        if tap:
+            # 模拟点击第一个按钮（按下再松开），进入视频播放
+            pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=tap, button=1))
+            pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONUP, pos=tap, button=1))
+        step = 0
+        while scroll and state["presents"] < frames + warmup:
+            # 滚轮往下翻 8 行再往上翻 8 行，每次滚动菜单重画一屏
+            pygame.event.post(pygame.event.Event(pygame.MOUSEWHEEL, x=0, y=-1 if step // 8 % 2 == 0 else 1,
+                                                 flipped=False))
+            step += 1
+            time.sleep(1 / 30)
+    threading.Thread(target=driver, daemon=True).start()
+
+    usage0 = resource.getrusage(resource.RUSAGE_SELF)
+    children0 = resource.getrusage(resource.RUSAGE_CHILDREN)
+    wall0 = time.perf_counter()
+    error = None
+    try:
+        runpy.run_path(os.path.join(ROOT, screen), run_name="__main__")
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            error = str(e.code)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    usage1 = resource.getrusage(resource.RUSAGE_SELF)
+    children1 = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    times = [(b - a) * 1000 for a, b in zip(stamps[warmup:], stamps[warmup + 1:])]
+    ordered = sorted(times)
+    result = {
+        "screen": screen,
+        "frames": len(times),
+        "wall_s": round(time.perf_counter() - wall0, 3),
+        "frame_ms": {
+            "p50": round(percentile(ordered, 50), 3),
+            "p95": round(percentile(ordered, 95), 3),
+            "p99": round(percentile(ordered, 99), 3),
+            "max": round(ordered[-1], 3) if ordered else 0.0,
+        },
+        "cpu_s": round((usage1.ru_utime - usage0.ru_utime) + (usage1.ru_stime - usage0.ru_stime), 3),
+        # 已回收的子进程（ffmpeg 解码器）的 CPU 时间
+        "cpu_children_s": round((children1.ru_utime - children0.ru_utime)
+                                + (children1.ru_stime - children0.ru_stime), 3),
+        # Linux 上 ru_maxrss 单位是 KB
+        "peak_rss_mb": round(usage1.ru_maxrss / 1024, 1),
+        "synthetic_video": synthetic_video,
+    }
+    if error:
+        result["error"] = error
+    with open(out_path, "w") as f:
+        json.dump(result, f)
+
+
+# ------------------ 父进程：依次跑所有屏幕 ------------------
+def bench(screens, frames, warmup, timeout):
+    results = []
+    with tempfile.TemporaryDirectory(prefix="screentest-bench-") as tmp:
+        has_ffmpeg = make_test_clip(os.path.join(tmp, "videos"))
+        # 只测菜单的屏幕用一个多页的视频库（都链接到同一个测试片），基准测的是滚动重画
+        menu_dir = os.path.join(tmp, "menu")
+        os.makedirs(os.path.join(menu_dir, "videos"))
+        for i in range(MENU_CLIPS):
+            os.symlink(os.path.join(tmp, "videos", "bench.mp4"),
+                       os.path.join(menu_dir, "videos", f"bench{i:02d}.mp4"))
+        for screen in screens:
+            env = dict(os.environ, SDL_AUDIODRIVER="dummy", SDL_VIDEODRIVER="dummy",
+                       # 缩略图缓存放在临时目录里，每次都从冷缓存测起，也不写用户目录
+                       THUMBNAIL_DIR=os.path.join(tmp, "thumbnails"))
+            if screen in GL_SCREENS:
+                env.update(SDL_VIDEODRIVER="offscreen", PYOPENGL_PLATFORM="egl")
+            video = screen in VIDEO_SCREENS
+            out_path = os.path.join(tmp, screen + ".json")
+            cmd = [sys.executable, os.path.abspath(__file__), "--child", screen,
+                   "--frames", str(frames), "--warmup", str(warmup), "--result", out_path,
+                   "--deadline", str(timeout * 0.8)]
+            cwd = tmp if video else ROOT
+            if screen in EXTERNAL_PLAYER:
+                cmd.append("--scroll")
+                cwd = menu_dir
+            elif video:
+                cmd += ["--tap", "60,60"]
+                if not has_ffmpeg:
+                    cmd.append("--synthetic-video")
+            try:
+                subprocess.run(cmd, cwd=cwd, env=env, timeout=timeout,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=False)
+                with open(out_path) as f:
+                    result = json.load(f)
+            except subprocess.TimeoutExpired:
+                result = {"screen": screen, "error": f"timeout after {timeout}s"}
+            except (OSError, ValueError) as e:
+                result = {"screen": screen, "error": f"no result: {e}"}
+            print(json.dumps(result, ensure_ascii=False), file=sys.stderr)
+            results.append(result)
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "frames": frames,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="screenTest 无头帧时间基准")
+    parser.add_argument("screens", nargs="*", default=SCREENS)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--out", help="结果写入文件，默认打印到标准输出")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    parser.add_argument("--tap", help=argparse.SUPPRESS)
+    parser.add_argument("--scroll", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--synthetic-video", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--deadline", type=float, default=60, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        tap = tuple(int(v) for v in args.tap.split(",")) if args.tap else None
+        run_child(args.child, args.frames, args.warmup, args.result, tap, args.scroll, args.synthetic_video,
+                  args.deadline)
+        return
+
+    report = bench(args.screens, args.frames, args.warmup, args.timeout)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
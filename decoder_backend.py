@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+ffmpeg 解码后端的发现、测速和自动选择
+- 发现：从 `ffmpeg -decoders` / `-hwaccels` 里找出本机可用的硬解码器和硬件加速
+- 测速：每个候选解码一小段（默认 120 帧）输出 NV12 到空设备，记录解码帧率和 CPU 占用（ffmpeg 子进程）
+- 选择：能跑满片源帧率的候选里挑 CPU 最省的，硬件后端要比软件明显省 CPU 才用；
+  结果按 编码:宽x高 缓存到磁盘，以后直接用；全部失败时用多线程软件解码。
+  缓存里没有时不在点击播放时同步测速：这一次先用软件解码，后台线程测完写进缓存，下次播放生效
+用法（部署前在目标机器上验证，结果写进缓存）:
+    python decoder_backend.py                       # 用 lavfi 生成 720p30 H.264 测试片测速
+    python decoder_backend.py --size 1920x1080 --codec hevc --save
+    python decoder_backend.py --clip videos/a.mp4
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import video_probe
+
+SOFTWARE = "software"
+CACHE_PATH = os.environ.get("DECODER_CACHE",
+                            os.path.expanduser("~/.cache/screentest/decoders.json"))
+BENCH_FRAMES = 120
+# 硬件后端的 CPU 占用要低于软件解码的这个比例才选它：
+# 有些 -hwaccel 初始化失败时 ffmpeg 会悄悄退回软件解码，测出来和软件差不多
+HW_CPU_RATIO = 0.8
+HWACCELS = ("drm", "vaapi", "vdpau", "cuda")
+
+
+def _ffmpeg_list(flag):
+    try:
+        return subprocess.run(["ffmpeg", "-hide_banner", flag],
+                              capture_output=True, text=True, timeout=10).stdout
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def discover(codec):
+    """返回本机 ffmpeg 支持的候选后端名，软件解码总在最后"""
+    decoders = {line.split()[1] for line in _ffmpeg_list("-decoders").splitlines()
+                if len(line.split()) > 1 and line.startswith(" V")}
+    hwaccels = set(_ffmpeg_list("-hwaccels").split()[3:])  # 跳过标题 "Hardware acceleration methods:"
+    found = []
+    if f"{codec}_v4l2m2m" in decoders:
+        found.append("v4l2m2m")
+    found += [name for name in HWACCELS if name in hwaccels]
+    return found + [SOFTWARE]
+
+
+def input_args(backend, codec, threads=0):
+    """放在 -i 之前的解码参数；threads 是软件解码线程数，0 为按核数自动"""
+    if backend == "v4l2m2m":
+        return ["-c:v", f"{codec}_v4l2m2m"]
+    if backend in HWACCELS:
+        return ["-hwaccel", backend]
+    return ["-threads", str(threads)]
+
+
+def command(path, backend, codec, output_args, threads=0, start=0.0):
+    """
+    组装 ffmpeg 命令：解码参数 + 输入 + 输出参数（如 -f rawvideo -pix_fmt nv12 -）。
+    start 是起播位置(秒)，放在 -i 之前按输入定位；取关键帧时间时不用先解码前面的帧，输出时间戳从 0 开始
+    """
+    seek = ["-ss", f"{start:.3f}"] if start else []
+    return (["ffmpeg", "-loglevel", "error"] + input_args(backend, codec, threads)
+            + seek + ["-i", path] + output_args)
+
+
+def benchmark(path, backend, codec, frames=BENCH_FRAMES, timeout=30):
+    """解码 frames 帧，返回 {"backend", "ok", "frames", "fps", "cpu"}；cpu 是单核百分比，可超过 100"""
+    cmd = (["ffmpeg", "-nostats", "-progress", "pipe:1", "-loglevel", "error"]
+           + input_args(backend, codec)
+           + ["-i", path, "-frames:v", str(frames), "-pix_fmt", "nv12", "-f", "null", "-"])
+    t0 = time.monotonic()
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    except OSError:
+        return {"backend": backend, "ok": False, "frames": 0, "fps": 0.0, "cpu": 0.0}
+    timer = threading.Timer(timeout, proc.kill)
+    timer.start()
+    output = proc.stdout.read()
+    # 用 wait4 取这一个 ffmpeg 的 CPU 时间：后台测速时别的子进程（播放的解码器、缩略图）也在退出，
+    # RUSAGE_CHILDREN 的差值会把它们算进来
+    _, status, usage = os.wait4(proc.pid, 0)
+    timer.cancel()
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    proc.stdout.close()
+    wall = max(time.monotonic() - t0, 1e-6)
+    cpu = usage.ru_utime + usage.ru_stime
+    # -progress 每次输出一组 key=value，最后一组的 frame 就是总帧数
+    decoded = 0
+    for line in output.splitlines():
+        if line.startswith("frame="):
+            decoded = int(line[6:] or 0)
+    return {"backend": backend, "ok": proc.returncode == 0 and decoded > 0, "frames": decoded,
+            "fps": round(decoded / wall, 1), "cpu": round(cpu / wall * 100, 1)}
+
+
+def choose(results, target_fps):
+    """从测速结果里挑后端：跑得满 target_fps 的里面挑 CPU 最省的，都跑不满时挑最快的"""
+    ok = [r for r in results if r["ok"]]
+    if not ok:
+        return SOFTWARE
+    software = next((r for r in ok if r["backend"] == SOFTWARE), None)
+    if software is not None:
+        # 硬件后端不比软件明显省 CPU 时不用它
+        ok = [r for r in ok if r is software or r["cpu"] < software["cpu"] * HW_CPU_RATIO]
+    realtime = [r for r in ok if r["fps"] >= target_fps]
+    if realtime:
+        return min(realtime, key=lambda r: r["cpu"])["backend"]
+    return max(ok, key=lambda r: r["fps"])["backend"]
+
+
+# ------------------ 磁盘缓存 ------------------
+def _cache_key(codec, width, height):
+    return f"{codec}:{width}x{height}"
+
+
+def load_cache():
+    try:
+        with open(CACHE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache):
+    os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+    tmp = CACHE_PATH + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp, CACHE_PATH)
+
+
+_cache_lock = threading.Lock()  # 后台测速线程和播放线程都会改缓存文件
+_measuring = set()              # 正在后台测速的缓存键
+
+
+def remember(info, backend, results):
+    with _cache_lock:
+        cache = load_cache()
+        cache[_cache_key(info.codec, info.width, info.height)] = {"backend": backend, "results": results}
+        save_cache(cache)
+
+
+def forget(info):
+    """播放时发现缓存的后端解不出帧，删掉这条记录，下次重新测速"""
+    with _cache_lock:
+        cache = load_cache()
+        if cache.pop(_cache_key(info.codec, info.width, info.height), None) is not None:
+            save_cache(cache)
+
+
+def measure(path, info):
+    """在 path 上逐个测速候选后端，选出结果写进缓存，返回选中的后端"""
+    results = [benchmark(path, backend, info.codec) for backend in discover(info.codec)]
+    backend = choose(results, info.fps)
+    if any(r["ok"] for r in results):
+        # 全部失败多半是文件本身坏了，不缓存
+        remember(info, backend, results)
+    return backend
+
+
+def _measure_in_background(path, info, key):
+    try:
+        measure(path, info)
+    except OSError:
+        pass
+    finally:
+        with _cache_lock:
+            _measuring.discard(key)
+
+
+def select(path, info):
+    """
+    返回 path（探测结果 info）该用的后端名。
+    同编码同分辨率测过就直接用缓存，不再启动 ffmpeg 查询（缓存的后端解不出帧时播放器会 forget 并改用软件解码）；
+    没测过时在后台线程里测速，这一次先用软件解码，不让第一次点击等几秒。
+    """
+    if not shutil.which("ffmpeg"):
+        return SOFTWARE
+    key = _cache_key(info.codec, info.width, info.height)
+    entry = load_cache().get(key)
+    if entry and entry.get("backend"):
+        return entry["backend"]
+    with _cache_lock:
+        if key not in _measuring:
+            _measuring.add(key)
+            threading.Thread(target=_measure_in_background, args=(path, info, key),
+                             name="decoder-benchmark", daemon=True).start()
+    return SOFTWARE
+
+
+# ------------------ 命令行 ------------------
+ENCODERS = {"h264": "libx264", "hevc": "libx265"}
+
+
+def make_clip(folder, size, rate, codec, seconds):
+    """用 lavfi testsrc2 生成测试片"""
+    path = os.path.join(folder, f"decoder-test.{codec}.mp4")
+    subprocess.run(["ffmpeg", "-loglevel", "error", "-y", "-f", "lavfi",
+                    "-i", f"testsrc2=size={size}:rate={rate}:duration={seconds}",
+                    "-c:v", ENCODERS[codec], "-pix_fmt", "yuv420p", path], check=True)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ffmpeg 解码后端测速")
+    parser.add_argument("--clip", help="用已有视频测速，不生成测试片")
+    parser.add_argument("--size", default="1280x720")
+    parser.add_argument("--rate", type=int, default=30)
+    parser.add_argument("--codec", default="h264", choices=sorted(ENCODERS))
+    parser.add_argument("--seconds", type=int, default=10)
+    parser.add_argument("--frames", type=int, default=BENCH_FRAMES)
+    parser.add_argument("--save", action="store_true", help="把选中的后端写进缓存")
+    args = parser.parse_args()
+
+    if not shutil.which("ffmpeg"):
+        sys.exit("找不到 ffmpeg")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.clip or make_clip(tmp, args.size, args.rate, args.codec, args.seconds)
+        info = video_probe.probe(path)
+        print(f"{path}: {info.codec} {info.width}x{info.height} {info.fps:g}fps")
+        results = [benchmark(path, backend, info.codec, frames=args.frames)
+                   for backend in discover(info.codec)]
+    print(f"{'backend':<12}{'result':<8}{'frames':>7}{'fps':>9}{'cpu%':>8}")
+    for r in results:
+        print(f"{r['backend']:<12}{'ok' if r['ok'] else 'FAIL':<8}{r['frames']:>7}{r['fps']:>9}{r['cpu']:>8}")
+    backend = choose(results, info.fps)
+    print("选择:", backend)
+    if args.save:
+        remember(info, backend, results)
+        print("已写入", CACHE_PATH)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+脏矩形刷新
+只把本帧变化的区域（指针包围盒、数值标签）用 pygame.display.update(rects) 推到屏幕，
+首帧或布局变化后才整屏 flip。
+传入 draw_static 时会把静态部分缓存成背景，每帧只用背景擦除上一帧画过的区域；
+erase_prev=False 时由调用方自己用 erase() 擦除，只刷新本帧登记的区域。
+"""
+import pygame
+
+# 这些事件意味着屏幕内容需要整屏重画
+LAYOUT_EVENTS = (pygame.VIDEORESIZE, pygame.VIDEOEXPOSE,
+                 pygame.WINDOWEXPOSED, pygame.WINDOWSIZECHANGED, pygame.WINDOWRESTORED)
+
+
+class DirtyRectPresenter:
+    def __init__(self, screen, draw_static=None, erase_prev=True):
+        self.screen = screen
+        self.draw_static = draw_static
+        self.erase_prev = erase_prev
+        self.background = None
+        self.full = True      # 下一帧是否整屏刷新
+        self.prev = []        # 上一帧画过的区域，本帧要擦除并刷新
+        self.cur = []
+
+    def invalidate(self):
+        """布局变化后调用，下一帧整屏重画"""
+        self.full = True
+
+    def handle_event(self, event):
+        if event.type in LAYOUT_EVENTS:
+            self.invalidate()
+
+    def begin(self):
+        """开始一帧：整屏时重建背景，否则只擦除上一帧的脏区域。返回本帧是否整屏重画"""
+        if self.draw_static is None:
+            return self.full
+        if self.full or self.background is None or \
+                self.background.get_size() != self.screen.get_size():
+            self.background = pygame.Surface(self.screen.get_size()).convert()
+            self.draw_static(self.background)
+            self.screen.blit(self.background, (0, 0))
+            self.full = True
+        elif self.erase_prev:
+            for rect in self.prev:
+                self.screen.blit(self.background, rect, rect)
+        return self.full
+
+    def erase(self, rect):
+        """用背景擦除 rect 区域"""
+        self.screen.blit(self.background, rect, rect)
+
+    def mark(self, rect):
+        """登记本帧画过的区域，draw.line / blit 的返回值可直接传入"""
+        self.cur.append(pygame.Rect(rect).inflate(2, 2))
+        return rect
+
+    def present(self):
+        if self.full:
+            pygame.display.flip()
+            self.full = False
+        else:
+            rects = self.prev + self.cur if self.erase_prev else self.cur
+            # 空闲帧没有任何变化，不调用 update
+            if rects:
+                pygame.display.update(rects)
+        self.prev, self.cur = self.cur, []
@@ -0,0 +1,96 @@
+"""
+可复用的视频帧缓冲池
+解码读线程用 readinto 把 ffmpeg 输出直接读进预先分配的 bytearray，
+读线程和渲染线程之间只传缓冲的索引，渲染用完后归还，播放过程中不再分配帧内存。
+缓冲都被占用时读线程阻塞在 acquire 上，ffmpeg 写满管道后也会停下来等待。
+"""
+import ctypes
+import queue
+
+END = object()  # 读到文件尾时放进就绪队列的标记
+
+
+def skip_frames(stream, frame_size, count):
+    """从 stream 读出并丢弃 count 帧，读到文件尾返回 False"""
+    view = memoryview(bytearray(frame_size)) if count else None
+    for _ in range(count):
+        filled = 0
+        while filled < frame_size:
+            n = stream.readinto(view[filled:])
+            if not n:
+                return False
+            filled += n
+    return True
+
+
+class FramePool:
+    def __init__(self, frame_size, count=4):
+        self.frame_size = frame_size
+        self.buffers = [bytearray(frame_size) for _ in range(count)]
+        self.views = [memoryview(b) for b in self.buffers]
+        # ctypes 数组和缓冲共享内存，可直接作为 memmove/OpenGL 的源地址
+        self.arrays = [(ctypes.c_char * frame_size).from_buffer(b) for b in self.buffers]
+        self.free = queue.Queue()
+        self.ready = queue.Queue()
+        self.published = 0       # 累计交给渲染端的帧数（含预热帧）
+        self.exit_code = None    # 读线程结束时记下的 ffmpeg 退出码
+        for i in range(count):
+            self.free.put(i)
+
+    # ---------- 读线程 ----------
+    def acquire(self, timeout=None):
+        """取一个空闲缓冲的索引，超时返回 None"""
+        try:
+            return self.free.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def fill(self, stream, index):
+        """从 stream 读满一帧到缓冲 index，读到文件尾返回 False"""
+        view = self.views[index]
+        filled = 0
+        while filled < self.frame_size:
+            n = stream.readinto(view[filled:])
+            if not n:
+                return False
+            filled += n
+        return True
+
+    def publish(self, index, pts):
+        """把读好的缓冲连同时间戳(秒)交给渲染线程"""
+        self.published += 1
+        self.ready.put((index, pts))
+
+    def preload(self, frames, fps):
+        """把预先解好的开头几帧（时间戳 0, 1/fps, ...）直接放进就绪队列，要在读线程启动前调用"""
+        for n, frame in enumerate(frames):
+            index = self.free.get_nowait()
+            self.views[index][:] = frame
+            self.ready.put((index, n / fps))
+        self.published += len(frames)
+
+    def close(self, exit_code=None):
+        """读线程结束时调用，渲染端据此知道没有更多帧；exit_code 是 ffmpeg 的退出码"""
+        self.exit_code = exit_code
+        self.ready.put(END)
+
+    # ---------- 渲染线程 ----------
+    def next_ready(self):
+        """取一个 (缓冲索引, 时间戳) 或 END，没有时返回 None"""
+        try:
+            return self.ready.get_nowait()
+        except queue.Empty:
+            return None
+
+    def release(self, index):
+        """渲染用完后归还缓冲"""
+        self.free.put(index)
+
+    # ---------- 遥测 ----------
+    def produced(self):
+        """累计解出的帧数"""
+        return self.published
+
+    def depth(self):
+        """已解出、渲染端还没取走的帧数"""
+        return self.ready.qsize()
@@ -0,0 +1,212 @@
+"""
+帧性能分析浮层
+按 F3 打开/关闭，显示滚动帧时间曲线、各阶段（采样、绘制、上传、flip 等）平均耗时，
+以及 tracemalloc 统计的每帧内存分配；按 F4 把环形缓冲里的记录导出为 CSV。
+关闭时 stage() 返回空的上下文管理器，主循环里的计时钩子几乎没有开销。
+"""
+import csv
+import time
+import tracemalloc
+
+import numpy as np
+import pygame
+
+import text_cache
+
+HUD_SIZE = (380, 170)
+GRAPH_MS = 50.0     # 曲线纵轴满格对应的毫秒数
+REFRESH_FRAMES = 6  # 浮层 Surface 每隔几帧重画一次
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.t0 = 0.0
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler._add(self.name, time.perf_counter() - self.t0)
+        return False
+
+
+class FrameProfiler:
+    def __init__(self, capacity=600, toggle_key=pygame.K_F3, dump_key=pygame.K_F4,
+                 alloc_sample_every=30):
+        self.capacity = capacity
+        self.toggle_key = toggle_key
+        self.dump_key = dump_key
+        self.alloc_sample_every = alloc_sample_every
+        self.enabled = False
+        self.frame_ms = np.zeros(capacity, dtype=np.float32)
+        self.alloc_bytes = np.zeros(capacity, dtype=np.float32)
+        self.alloc_blocks = np.zeros(capacity, dtype=np.float32)
+        self.stage_ms = {}
+        self.stages = {}
+        self.index = 0
+        self.count = 0
+        self.frame_start = None
+        self.last_traced = 0
+        self.last_snapshot = None
+        self.blocks_per_frame = 0.0
+        self.hud = None
+        self.hud_age = 0
+
+    # ---------- 开关 ----------
+    def handle_event(self, event):
+        """处理 F3/F4，返回浮层显示状态是否改变"""
+        if event.type != pygame.KEYDOWN:
+            return False
+        if event.key == self.toggle_key:
+            self.set_enabled(not self.enabled)
+            return True
+        if event.key == self.dump_key and self.count:
+            self.dump_csv(time.strftime("profile-%Y%m%d-%H%M%S.csv"))
+        return False
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        self.frame_start = None
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start(1)
+            self.last_traced = tracemalloc.get_traced_memory()[0]
+            self.last_snapshot = None
+        elif not enabled and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    # ---------- 计时钩子 ----------
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = _Stage(self, name)
+            self.stage_ms[name] = np.zeros(self.capacity, dtype=np.float32)
+        return stage
+
+    def _add(self, name, seconds):
+        self.stage_ms[name][self.index] += seconds * 1000
+
+    def end_frame(self):
+        """每帧 present 之后调用一次：记录帧间隔和内存分配，推进环形缓冲"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        i = self.index
+        if self.frame_start is not None:
+            self.frame_ms[i] = (now - self.frame_start) * 1000
+        self.frame_start = now
+
+        traced = tracemalloc.get_traced_memory()[0]
+        self.alloc_bytes[i] = traced - self.last_traced
+        self.last_traced = traced
+        # 分配块数靠快照对比，开销较大，只每隔 alloc_sample_every 帧采一次
+        if self.count % self.alloc_sample_every == 0:
+            snapshot = tracemalloc.take_snapshot()
+            if self.last_snapshot is not None:
+                new_blocks = sum(max(0, s.count_diff) for s in
+                                 snapshot.compare_to(self.last_snapshot, "filename"))
+                self.blocks_per_frame = new_blocks / self.alloc_sample_every
+            self.last_snapshot = snapshot
+        self.alloc_blocks[i] = self.blocks_per_frame
+
+        self.index = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        for ring in self.stage_ms.values():
+            ring[self.index] = 0.0
+
+    # ---------- 导出 ----------
+    def _ordered(self, ring):
+        if self.count < self.capacity:
+            return ring[:self.count]
+        return np.concatenate((ring[self.index:], ring[:self.index]))
+
+    def _recent_mean(self, ring, n=60):
+        recent = self._ordered(ring)[-n:]
+        return float(recent.mean()) if len(recent) else 0.0
+
+    def dump_csv(self, path):
+        names = sorted(self.stage_ms)
+        columns = [self._ordered(self.frame_ms)] + [self._ordered(self.stage_ms[n]) for n in names] \
+            + [self._ordered(self.alloc_bytes), self._ordered(self.alloc_blocks)]
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame", "frame_ms"] + [f"{n}_ms" for n in names]
+                            + ["alloc_bytes", "alloc_blocks"])
+            for k, row in enumerate(zip(*(c.tolist() for c in columns))):
+                writer.writerow([k] + [round(v, 4) for v in row])
+        return path
+
+    # ---------- 浮层 ----------
+    def render_hud(self):
+        """重画浮层 Surface：帧时间曲线 + 各阶段平均耗时 + 每帧分配"""
+        # 不透明背景：脏矩形模式下浮层下面的内容不会重画，半透明会越叠越深
+        hud = pygame.Surface(HUD_SIZE, pygame.SRCALPHA)
+        hud.fill((16, 16, 16, 255))
+        w, h = HUD_SIZE
+        graph = pygame.Rect(8, 8, w - 16, 60)
+        pygame.draw.rect(hud, (80, 80, 80), graph, 1)
+        budget_y = graph.bottom - int(16.7 / GRAPH_MS * graph.height)
+        pygame.draw.line(hud, (0, 120, 0), (graph.x, budget_y), (graph.right - 1, budget_y))
+        frames = self._ordered(self.frame_ms)[-graph.width:]
+        if len(frames) > 1:
+            xs = graph.x + np.arange(len(frames))
+            ys = graph.bottom - 1 - np.clip(frames / GRAPH_MS, 0, 1) * (graph.height - 2)
+            pygame.draw.lines(hud, (255, 165, 0), False, np.column_stack((xs, ys)).tolist())
+
+        lines = [f"frame {self._recent_mean(self.frame_ms):6.2f} ms"
+                 f"   max {self.frame_ms.max():6.2f} ms"]
+        for name in sorted(self.stage_ms):
+            lines.append(f"{name:<10} {self._recent_mean(self.stage_ms[name]):6.2f} ms")
+        lines.append(f"alloc {self._recent_mean(self.alloc_bytes) / 1024:7.1f} KB/frame"
+                     f"  {self.blocks_per_frame:6.0f} blocks/frame")
+        y = graph.bottom + 6
+        for line in lines:
+            text = text_cache.render(line, 18, (255, 255, 255), face="monospace")
+            hud.blit(text, (8, y))
+            y += text.get_height()
+        return hud
+
+    def _current_hud(self):
+        self.hud_age += 1
+        if self.hud is None or self.hud_age >= REFRESH_FRAMES:
+            self.hud = self.render_hud()
+            self.hud_age = 0
+        return self.hud
+
+    def draw(self, surface, topleft=(10, 10)):
+        """把浮层画到 pygame Surface 上，返回画过的区域（未启用时返回 None）"""
+        if not self.enabled:
+            return None
+        return surface.blit(self._current_hud(), topleft)
+
+    def draw_gl(self, screen_size, topleft=(10, 10)):
+        """OpenGL 显示上用 glDrawPixels 叠加浮层"""
+        if not self.enabled:
+            return
+        from OpenGL import GL
+        hud = self._current_hud()
+        w, h = hud.get_size()
+        data = pygame.image.tobytes(hud, "RGBA", True)
+        program = GL.glGetIntegerv(GL.GL_CURRENT_PROGRAM)
+        GL.glUseProgram(0)
+        GL.glEnable(GL.GL_BLEND)
+        GL.glBlendFunc(GL.GL_SRC_ALPHA, GL.GL_ONE_MINUS_SRC_ALPHA)
+        GL.glWindowPos2i(topleft[0], screen_size[1] - topleft[1] - h)
+        GL.glDrawPixels(w, h, GL.GL_RGBA, GL.GL_UNSIGNED_BYTE, data)
+        GL.glDisable(GL.GL_BLEND)
+        GL.glUseProgram(program)
@@ -0,0 +1,211 @@
+"""
+按时间戳显示视频帧
+读线程给每帧打上时间戳(秒)，渲染循环每次刷新前问调度器该显示哪一帧：
+- 已经过时、后面还有更新帧的，在上传前直接丢弃并归还缓冲
+- 解码跟不上时重复显示上一帧，并把时钟往后顺延，等新帧到了接着播，不会一口气丢掉积压
+- 缓冲池满时读线程阻塞，ffmpeg 跟着停，不再解码出来又扔掉
+- 给出显示刷新率时按 vsync 网格排帧：每帧的时间戳取整到最近的 vsync，24p 在 60Hz 上就是稳定的 3:2 交替，
+  不会因为几毫秒的抖动时而 3:3 时而 2:2；实际间隔和理想节奏不符的次数记为 cadence_errors
+- prefetch=True 时（上传经 PBO、隔一次刷新才进纹理）PBO 空着就提前取下一帧，记为 staged；
+  它到时的那次刷新由再下一帧的上传搬进纹理，没有再下一帧时 present_due() 返回真，由调用方搬
+计数器 dropped / repeated / late / presented / cadence_errors 由 stats() 返回。
+RefreshMeter 从 flip 返回的时刻估计显示器的实际刷新率。
+"""
+import math
+import os
+from collections import deque
+
+from frame_pool import END
+
+# 标称刷新率（Hz）；pygame 查不到刷新率，接非 60Hz 屏时用 DISPLAY_HZ 指定
+NOMINAL_REFRESH = float(os.environ.get("DISPLAY_HZ", "60"))
+
+
+class FrameScheduler:
+    def __init__(self, pool, fps, refresh=None, prefetch=False):
+        self.pool = pool
+        self.frame_time = 1.0 / fps
+        self.refresh = refresh   # 显示刷新率(Hz)，None 时不按 vsync 取整
+        self.prefetch = prefetch
+        self.staged = None       # 提前取出、还没上屏的帧的时间戳
+        self.pending = deque()   # (缓冲索引, 时间戳)，按时间戳排序
+        self.t0 = None           # 单调时钟上时间戳 0 对应的时刻
+        self.next_pts = 0.0      # 下一帧应有的时间戳，用来判断解码是否欠载
+        self.ended = False
+        self.presented = 0
+        self.dropped = 0
+        self.repeated = 0
+        self.late = 0
+        self.cadence_errors = 0
+        self.last_slot = None    # 上一帧实际显示 / 理想显示的 vsync 序号
+        self.last_ideal = None
+
+    def _slot(self, seconds):
+        """时间(秒) → 最近的 vsync 序号"""
+        return math.floor(seconds * self.refresh + 0.5)
+
+    def _due(self, pts, position):
+        """时间戳 pts 的帧在 position 时是否该显示了"""
+        if self.refresh:
+            return self._slot(pts) <= self._slot(position)
+        return pts <= position + self.frame_time / 2
+
+    def _overdue(self, pts, position):
+        """时间戳 pts 的帧在 position 时是否已经错过了它该显示的那次刷新"""
+        if self.refresh:
+            return self._slot(pts) < self._slot(position)
+        return pts + self.frame_time / 2 < position
+
+    def _collect(self):
+        while True:
+            item = self.pool.next_ready()
+            if item is None:
+                return
+            if item is END:
+                self.ended = True
+                return
+            self.pending.append(item)
+
+    def clock(self, now):
+        """当前播放位置(秒)"""
+        return 0.0 if self.t0 is None else now - self.t0
+
+    def _due_at(self, pts):
+        """时间戳 pts 的帧从哪个时刻（单调时钟）起算到时"""
+        if self.refresh:
+            # 所在 vsync 的前半个周期起就算到时
+            return self.t0 + (self._slot(pts) - 0.5) / self.refresh
+        return self.t0 + pts - self.frame_time / 2
+
+    def _shown(self, pts, position):
+        """时间戳 pts 的帧在 position 处上屏：统计迟到和节奏"""
+        self.presented += 1
+        if position - pts > self.frame_time:
+            self.late += 1
+        if self.refresh:
+            # 和上一帧相隔的 vsync 数应当等于两帧理想位置之差（24p@60Hz 是 3、2、3、2…）
+            slot, ideal = self._slot(position), self._slot(pts)
+            if self.last_slot is not None and slot - self.last_slot != ideal - self.last_ideal:
+                self.cadence_errors += 1
+            self.last_slot, self.last_ideal = slot, ideal
+
+    def next_frame(self, now):
+        """
+        返回本次刷新要上传的缓冲索引；没有到时的新帧时返回 None（调用方重复显示上一帧）。
+        返回的缓冲用完后由调用方 release。prefetch 时返回的可能是下一帧，上传后由 present_due 决定何时上屏。
+        """
+        self._collect()
+        if self.t0 is None:
+            if not self.pending:
+                return None
+            self.t0 = now - self.pending[0][1]
+        position = now - self.t0
+        staged = self.staged
+        if staged is not None and not self._due(staged, position):
+            return None  # 上次提前取的帧还在 PBO 里等着
+
+        chosen = None
+        while self.pending and self._due(self.pending[0][1], position):
+            if chosen is not None:
+                # 有更新的帧已经到时，这一帧来不及显示，不上传直接丢弃
+                self.pool.release(chosen[0])
+                self.dropped += 1
+            chosen = self.pending.popleft()
+        caught_up = chosen is not None
+        if chosen is None and self.prefetch and self.pending:
+            # PBO 空着（或里面的帧这次上屏，随后的上传先把它搬进纹理）：提前取出下一帧
+            chosen = self.pending.popleft()
+
+        if chosen is None:
+            if not self.pending and not self.ended and self._overdue(self.next_pts, position):
+                # 解码欠载：重复上一帧，时钟顺延一帧（按 vsync 排帧时顺延一个刷新周期，不打乱节奏相位）等它
+                self.repeated += 1
+                self.t0 += 1.0 / self.refresh if self.refresh else self.frame_time
+            return None
+
+        index, pts = chosen
+        if staged is not None:
+            self.staged = None
+            if caught_up:
+                # 更新的帧也已经到时：PBO 里这一帧搬进纹理后马上被盖掉，来不及上屏
+                self.dropped += 1
+            else:
+                self._shown(staged, position)
+        if self.prefetch:
+            self.staged = pts
+        else:
+            self._shown(pts, position)
+        self.next_pts = pts + self.frame_time
+        return index
+
+    def present_due(self, now):
+        """
+        prefetch 时每次刷新在上传之后调用：取出的帧已经到时却还在 PBO 里（没有下一帧把它顶进纹理，
+        或者取到时就已经到时）时返回 True（只返回一次），调用方把它搬进纹理后可以再取下一帧
+        """
+        if self.staged is None or not self._due(self.staged, now - self.t0):
+            return False
+        self._shown(self.staged, now - self.t0)
+        self.staged = None
+        return True
+
+    def wait_time(self, now):
+        """距离下一帧到时（prefetch 时是提前取的帧该上屏）还有多久，渲染循环据此睡眠"""
+        if self.t0 is None:
+            return self.frame_time / 4
+        if self.staged is not None:
+            due = self._due_at(self.staged)
+        elif self.pending:
+            due = self._due_at(self.pending[0][1])
+        else:
+            return self.frame_time / 4
+        return min(max(0.0, due - now), self.frame_time)
+
+    def finished(self):
+        """文件已读完，没有待显示的帧，提前取的帧也已经上屏"""
+        self._collect()
+        return self.ended and not self.pending and self.staged is None
+
+    def discard(self):
+        """停止播放时把没显示的帧还给缓冲池"""
+        self._collect()
+        while self.pending:
+            self.pool.release(self.pending.popleft()[0])
+
+    def stats(self):
+        return {"presented": self.presented, "dropped": self.dropped,
+                "repeated": self.repeated, "late": self.late, "cadence_errors": self.cadence_errors}
+
+
+class RefreshMeter:
+    """
+    从 flip 返回的时刻估计显示刷新率。开了 vsync 时 flip 阻塞到垂直同步，相邻两次的间隔是刷新周期的整数倍：
+    按标称刷新率把每个间隔折算成周期数，总时长除以总周期数就是实际周期（比如 59.94Hz 而不是 60Hz）。
+    大部分间隔对不上整数倍（没开 vsync、离屏渲染）时认为量不出来，用标称值。
+    """
+    def __init__(self, nominal=NOMINAL_REFRESH, window=240):
+        self.nominal = nominal
+        self.intervals = deque(maxlen=window)
+        self.last = None
+
+    def flipped(self, now):
+        """每次 flip 返回后调用"""
+        if self.last is not None and now - self.last < 4 / self.nominal:
+            self.intervals.append(now - self.last)  # 更长的间隔是菜单或换片，不算
+        self.last = now
+
+    def measured(self):
+        """实测刷新率(Hz)，样本不够或 flip 不跟 vsync 走时返回 None"""
+        period = 1.0 / self.nominal
+        total = cycles = 0
+        for dt in self.intervals:
+            m = round(dt / period)
+            if m >= 1 and abs(dt - m * period) < 0.02 * period:
+                total += dt
+                cycles += m
+        if len(self.intervals) < 60 or total < 0.9 * sum(self.intervals):
+            return None
+        return cycles / total
+
+    def rate(self):
+        return self.measured() or self.nominal
@@ -1,6 +1,7 @@
 import os 
 import pygame 
 import subprocess
+import video_menu
 
 
 WIDTH, HEIGHT = 1280, 720
@@ -25,33 +26,8 @@ screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.FULLSCREEN)
 pygame.display.set_caption("Pi5 视频小游戏")
 clock = pygame.time.Clock()
 
-BUTTONS = len(video_paths)
-COLS = (BUTTONS + ROWS - 1) // ROWS 
-margin = 20 
-usable_w = WIDTH - 2 * margin
-usable_h = HEIGHT - 2 * margin
-btn_w = usable_w // COLS - 10 
-btn_h = usable_h // ROWS - 10 
-
-buttons = [] 
-for idx, path in enumerate(video_paths):
-    row = idx // COLS
-    col = idx % COLS
-    left = margin + col * (btn_w + 10) 
-    top = margin + row * (btn_h + 10) 
-    rect = pygame.Rect(left, top, btn_w, btn_h) 
-    buttons.append((rect, path))
-
-font = pygame.font.SysFont('arial', 28, bold=True)
-
-def draw_ui():
-    screen.fill((30,30,30))
-    for rect, path in buttons:
-        pygame.draw.rect(screen, (0, 150, 255), rect, border_radius=12)
-        txt = os.path.basename(path)
-        surf = font.render(txt, True, (255,255,255))
-        screen.blit(surf, surf.get_rect(center=rect.center))
-    pygame.display.flip()
+# 按钮大小固定，视频多了往下滚动翻页；只渲染可见的按钮，缩略图后台抽帧、磁盘缓存
+menu = video_menu.VideoMenu(video_paths, (WIDTH, HEIGHT), ROWS, font_size=28)
 
 
 def play_video(path):
@@ -66,19 +42,17 @@ def play_video(path):
 
 running = True
 while running:
-    draw_ui()
+    menu.draw(screen)
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             running = False 
         elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
             running = False 
-        elif event.type in (pygame.FINGERDOWN, pygame.MOUSEBUTTONDOWN):
-            pos = (int(event.x * WIDTH), int(event.y * HEIGHT)) \
-                  if event.type == pygame.FINGERDOWN else event.pos 
-            for rect, path in buttons:
-                if rect.collidepoint(pos):
-                    play_video(path)
-                    break 
+        else:
+            path = menu.handle(event)
+            if path is not None:
+                play_video(path)
+                menu.invalidate()
     clock.tick(FPS)
+menu.close()
 pygame.quit()
-
@@ -2,21 +2,37 @@
 """
 Raspberry Pi 5 触摸屏 3 排按钮小游戏
 1280×720 分辨率，3 排按钮，点击按钮播放 MP4
-使用 FFmpeg 把 MP4 逐帧解码到 pygame Surface，不跳出窗口
+使用 FFmpeg 把 MP4 逐帧解码到 pygame Surface，不跳出窗口（不依赖 OpenGL 的软件渲染版本）
+播放中按住屏幕底部拖动预览、松手跳转，左右键按章节跳转（seek.py）
+默认由 ffmpeg 输出 RGB24；SOFTWARE_NV12=1 时 ffmpeg 输出 NV12，由 yuv_convert 的 NumPy 转换器转成 RGB
 """
 import os
 import sys
+import time
 import subprocess
 import threading
-import queue
+from collections import Counter
 import pygame
-import numpy as np
+import video_menu
+import video_probe
+import decoder_backend
+import prewarm
+import seek
+import telemetry
+from frame_pool import FramePool, skip_frames
+from frame_scheduler import FrameScheduler, NOMINAL_REFRESH
+from frame_profiler import FrameProfiler
+from yuv_convert import NV12Converter
 
 # ------------------ 1. 基础配置 ------------------
 WIDTH, HEIGHT = 1280, 720
 FPS = 30
 ROWS = 3
 VIDEOS_DIR = "videos"
+SOFTWARE_NV12 = os.environ.get("SOFTWARE_NV12") == "1"
+FRAME_SIZE = WIDTH * HEIGHT * 3 // 2 if SOFTWARE_NV12 else WIDTH * HEIGHT * 3
+# 设为 1 时后台预解码菜单里各视频的开头几帧（prewarm.py），点击后立刻出画面
+PREWARM = os.environ.get("PREWARM") == "1"
 
 # ------------------ 2. 扫描视频 ------------------
 def scan_videos(folder):
@@ -34,133 +50,289 @@ pygame.mouse.set_visible(True)
 screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.FULLSCREEN)
 pygame.display.set_caption("Pi 视频按钮小游戏")
 clock = pygame.time.Clock()
-font = pygame.font.SysFont('arial', 28, bold=True)
+profiler = FrameProfiler()  # F3 显示帧性能浮层，F4 导出 CSV
 
 # ------------------ 4. 按钮布局 ------------------
-BUTTONS = len(video_paths)
-COLS = (BUTTONS + ROWS - 1) // ROWS
-margin = 20
-usable_w = WIDTH - 2 * margin
-usable_h = HEIGHT - 2 * margin
-btn_w = usable_w // COLS - 10
-btn_h = usable_h // ROWS - 10
-
-buttons = []
-for idx, path in enumerate(video_paths):
-    row = idx // COLS
-    col = idx % COLS
-    left = margin + col * (btn_w + 10)
-    top = margin + row * (btn_h + 10)
-    rect = pygame.Rect(left, top, btn_w, btn_h)
-    buttons.append((rect, path))
+# 按钮大小固定，视频多了往下滚动翻页；只渲染可见的按钮，缩略图后台抽帧、磁盘缓存
+menu = video_menu.VideoMenu(video_paths, (WIDTH, HEIGHT), ROWS, font_size=28)
 
 # ------------------ 5. 视频播放逻辑 ------------------
+def decode_command(path, backend, codec, frames=None, start=0.0):
+    """
+    FFmpeg 子进程：输出原始 RGB24（或 NV12）数据；frames 限制只解开头几帧，start 是起播位置(秒)
+    """
+    limit = ["-frames:v", str(frames)] if frames else []
+    return decoder_backend.command(path, backend, codec, limit + [
+        "-f", "rawvideo",
+        "-pix_fmt", "nv12" if SOFTWARE_NV12 else "rgb24",
+        "-s", f"{WIDTH}x{HEIGHT}",   # 不指定 -r：按源帧率输出，不让 ffmpeg 补帧/丢帧
+        "-"                      # 输出到 stdout
+    ], start=start)
+
+def event_pos(event):
+    """触摸/鼠标事件的屏幕坐标"""
+    if event.type in (pygame.FINGERDOWN, pygame.FINGERMOTION, pygame.FINGERUP):
+        return int(event.x * WIDTH), int(event.y * HEIGHT)
+    return event.pos
+
 class VideoPlayer:
     """
     用 FFmpeg 解码，线程读取帧，主线程 blit 到 pygame
     """
-    def __init__(self, filepath, target_surface):
+    def __init__(self, filepath, target_surface, entry=None):
+        """entry 是预热（或按下即预热）得到的 prewarm.Entry"""
         self.path = filepath
         self.surface = target_surface
-        self.q = queue.Queue(maxsize=3)   # 缓冲 3 帧，防止卡顿
-        self.running = False
+        if entry is None and PREWARM:
+            entry = first_frames.get(filepath)
+        if entry is not None:
+            # 预热过：探测结果、解码后端和开头几帧都现成
+            self.info, self.backend, self.preroll = entry
+        else:
+            self.info = video_probe.probe(filepath, default_size=(WIDTH, HEIGHT))
+            self.backend = decoder_backend.select(filepath, self.info)
+            self.preroll = ()
+        self.start_time = 0.0
+        self.halt = None   # 每次启动读线程一个新的 Event，跳转后旧的读线程不会接着往新缓冲池里写
+        self.interrupted = False
         self.thread = None
+        self.totals = Counter()  # 跳转前各段的计数，stop 时累加
+        self.telemetry = telemetry.NULL  # play() 时开会话
+        self.index = None        # 关键帧索引和拖动预览，第一次跳转时才建
+        self.preview = None
+        self.timeline = None
+        if SOFTWARE_NV12:
+            # NV12 转换结果写进这张常驻的显示格式 Surface，再整张 blit
+            self.converter = NV12Converter(WIDTH, HEIGHT, self.info.matrix, self.info.full_range)
+            self.frame = pygame.Surface((WIDTH, HEIGHT)).convert()
 
-    def _reader(self):
-        """
-        FFmpeg 子进程：输出原始 RGB24 数据
-        """
-        cmd = [
-            "ffmpeg",
-            "-loglevel", "error",
-            "-hwaccel", "drm",
-            "-c:v", "h254_v4l2m2m",
-            "-f", "rawvideo",
-            "-pix_fmt", "NV12",
-            "-s", f"{WIDTH}x{HEIGHT}", 
-            "-r", str(FPS),
-            "-"                      # 输出到 stdout
-        ]
-        pipe = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=10**8)
-
-        w, h = WIDTH, HEIGHT
-        frame_size = w * h * 3
-
-        while self.running:
-            raw = pipe.stdout.read(frame_size)
-            if not raw:
+    @staticmethod
+    def warm_up(path, cancel=None):
+        """预热线程里调用：探测、选后端并解出开头几帧（不创建 Surface）"""
+        info = video_probe.probe(path, default_size=(WIDTH, HEIGHT))
+        backend = decoder_backend.select(path, info)
+        frames = prewarm.read_frames(decode_command(path, backend, info.codec, prewarm.PREWARM_FRAMES),
+                                     FRAME_SIZE, prewarm.PREWARM_FRAMES, cancel)
+        return prewarm.Entry(info, backend, frames)
+
+    def _reader(self, pool, halt, start, n):
+        # bufsize=0：readinto 直接从管道读进缓冲池，不经过 BufferedReader 再拷一次
+        cmd = decode_command(self.path, self.backend, self.info.codec, start=start)
+        pipe = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0)
+        # 预热的开头 n 帧已经在缓冲池里，ffmpeg 输出的对应帧丢掉
+        if not skip_frames(pipe.stdout, FRAME_SIZE, n):
+            halt.set()
+        while not halt.is_set():
+            index = pool.acquire(timeout=1)
+            if index is None:
+                continue   # 主线程来不及消费，等它归还缓冲
+            if not pool.fill(pipe.stdout, index):
+                pool.release(index)
                 break
-            frame = np.frombuffer(raw, dtype=np.uint8).reshape((h, w, 3))
-            frame = np.swapaxes(frame, 0, 1)  # (w,h,3) -> 方便 pygame
-            try:
-                self.q.put(frame, timeout=1)
-            except queue.Full:
-                pass   # 主线程来不及消费，丢弃
+            # 按源帧率输出恒定帧率，第 n 帧的时间戳就是 start + n / fps
+            pool.publish(index, start + n / self.info.fps)
+            n += 1
         pipe.kill()
+        pool.close(pipe.wait())  # 退出码随文件尾标记一起交给渲染端
 
     def play(self):
-        """阻塞播放，直到视频结束或用户退出"""
-        self.running = True
-        self.thread = threading.Thread(target=self._reader, daemon=True)
+        """阻塞播放，直到视频结束或用户退出，返回显示/丢帧/重复/迟到计数"""
+        self.telemetry = telemetry.session(self.path, self.info, self.backend)
+        stats = self._play()
+        if stats["presented"] == 0 and not self.interrupted and self.backend != decoder_backend.SOFTWARE:
+            # 选中的硬件后端一帧也没解出来（ffmpeg 的错误输出被丢弃），换软件解码重播
+            print(f"{self.backend} 解码 {self.path} 失败，改用软件解码", file=sys.stderr)
+            decoder_backend.forget(self.info)
+            self.telemetry.restart("fallback", backend=decoder_backend.SOFTWARE)
+            self.backend = decoder_backend.SOFTWARE
+            stats = self._play()
+        self.telemetry.end("user" if self.interrupted else "eof")
+        return stats
+
+    def _start(self, start=0.0):
+        """从 start 秒（要是关键帧）开始：分配缓冲池、启动读线程"""
+        self.start_time = start
+        self.halt = threading.Event()
+        # 预热的开头几帧只在从头播放时用得上
+        preroll = self.preroll if start == 0 else ()
+        # 缓冲 3 帧防止卡顿，外加 1 帧正在读，另加放预热帧的缓冲
+        self.pool = FramePool(FRAME_SIZE, count=4 + len(preroll))
+        if not SOFTWARE_NV12:
+            # 每个缓冲包一张 Surface（共享内存，不拷贝像素），播放时不再创建 Surface
+            self.frames = [pygame.image.frombuffer(view, (WIDTH, HEIGHT), "RGB")
+                           for view in self.pool.views]
+        self.pool.preload(preroll, self.info.fps)
+        self.thread = threading.Thread(target=self._reader, args=(self.pool, self.halt, start, len(preroll)),
+                                       daemon=True)
         self.thread.start()
+        # 软件渲染只在有新帧时 flip，量不出刷新率，按标称值（DISPLAY_HZ）排帧
+        self.scheduler = FrameScheduler(self.pool, self.info.fps, NOMINAL_REFRESH)
+        self.telemetry.attach(self.pool, self.scheduler)
+
+    def position(self):
+        """当前播放位置(秒)；跳转后第一帧出来之前是跳转目标"""
+        if self.scheduler.t0 is None:
+            return self.start_time
+        return self.scheduler.clock(time.monotonic())
+
+    def _seeking(self):
+        """第一次拖动或按方向键时建关键帧索引和进度条"""
+        if self.index is None:
+            self.index = seek.load_index(self.path, self.info.duration)
+            self.timeline = seek.Timeline((WIDTH, HEIGHT), self.index.duration)
+        return self.index
 
-        black = pygame.Surface((WIDTH, HEIGHT))
-        black.fill((0, 0, 0))
+    def _show_preview(self, t):
+        """拖动中：把离 t 最近的关键帧小图放大铺满屏幕，不等解码"""
+        if self.preview is None:
+            size = seek.preview_size(self.info.width, self.info.height)
+            self.preview = seek.PreviewStrip(self.path, self.index, size, "rgb24")
+            self.preview.start()
+        frame = self.preview.nearest(t)
+        if frame is not None and frame is not self.shown:
+            self.shown = frame
+            small = pygame.image.frombuffer(frame, self.preview.size, "RGB")
+            self.shown_surface = pygame.transform.scale(small, (WIDTH, HEIGHT))
+        # 每次都整张重画：进度条是半透明的，直接叠在上一次的画面上会越叠越深
+        if self.shown is not None:
+            screen.blit(self.shown_surface, (0, 0))
 
-        while True:
+    def _play(self):
+        self.totals = Counter()
+        self._start()
+
+        screen.fill((0, 0, 0))  # 第一帧到来前保持黑屏，防止花屏
+        pygame.display.flip()
+
+        scrub = None       # 拖动中手指所在的时间
+        self.shown = None  # 拖动中正在显示的预览帧
+        bar_until = 0.0    # 跳转后进度条再显示到这个时刻
+        while scrub is not None or not self.scheduler.finished():
             for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.stop()
-                    return
-                elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
-                    self.stop()
-                    return
-                elif event.type in (pygame.FINGERDOWN, pygame.MOUSEBUTTONDOWN):
-                    self.stop()
-                    return
-
-            try:
-                frame = self.q.get_nowait()
-                img = pygame.surfarray.make_surface(frame)
-                screen.blit(img, (0, 0))
-            except queue.Empty:
-                screen.blit(black, (0, 0))  # 防止花屏
-            pygame.display.flip()
-            clock.tick(FPS)
+                if profiler.handle_event(event):
+                    continue
+                if event.type in (pygame.FINGERDOWN, pygame.MOUSEBUTTONDOWN) and \
+                        (scrub is not None or seek.on_bar(event_pos(event), (WIDTH, HEIGHT))):
+                    # 按在底部进度条上：停掉解码，开始拖动（触摸时 SDL 还会补发一个鼠标事件）
+                    if scrub is None:
+                        self._seeking()
+                        self.stop()
+                    scrub = self.timeline.time_at(event_pos(event)[0])
+                elif event.type in (pygame.FINGERMOTION, pygame.MOUSEMOTION) and scrub is not None:
+                    scrub = self.timeline.time_at(event_pos(event)[0])
+                elif event.type in (pygame.FINGERUP, pygame.MOUSEBUTTONUP) and scrub is not None:
+                    start = self.index.before(scrub)
+                    self.telemetry.restart("seek", to=start)
+                    self._start(start)
+                    scrub = self.shown = None
+                    bar_until = time.monotonic() + seek.BAR_SECONDS
+                elif event.type == pygame.KEYDOWN and event.key in (pygame.K_LEFT, pygame.K_RIGHT):
+                    # 左右键按章节跳转，拖动中不理会
+                    t = None
+                    if scrub is None:
+                        t = self._seeking().chapter(self.position(), 1 if event.key == pygame.K_RIGHT else -1)
+                    if t is not None:
+                        self.stop()
+                        start = self.index.before(t)
+                        self.telemetry.restart("seek", to=start)
+                        self._start(start)
+                        bar_until = time.monotonic() + seek.BAR_SECONDS
+                elif event.type == pygame.QUIT or \
+                        (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE) or \
+                        event.type in (pygame.FINGERDOWN, pygame.MOUSEBUTTONDOWN):
+                    self.interrupted = True
+                    if scrub is None:
+                        self.stop()
+                    return self._finish()
+
+            if scrub is not None:
+                # 拖动中：预览帧 + 进度条，按界面刷新率重画
+                self._show_preview(scrub)
+                self.timeline.draw(screen, scrub, self.index.chapters)
+                pygame.display.flip()
+                clock.tick(FPS)
+                continue
+
+            # 没有到时的新帧时屏幕上保留上一帧，不用重画也不用 flip
+            index = self.scheduler.next_frame(time.monotonic())
+            if index is not None or profiler.enabled:
+                # 软件渲染：上传 = NV12 转换 + blit 到屏幕 Surface，绘制 = 叠加层，交换 = flip
+                t0 = time.perf_counter()
+                upload = None
+                with profiler.stage("blit"):
+                    if index is not None:
+                        screen.blit(self._surface(index), (0, 0))
+                        self.pool.release(index)
+                        upload = time.perf_counter() - t0
+                t1 = time.perf_counter()
+                if index is not None and time.monotonic() < bar_until:
+                    self.timeline.draw(screen, self.position(), self.index.chapters)
+                profiler.draw(screen)
+                t2 = time.perf_counter()
+                with profiler.stage("flip"):
+                    pygame.display.flip()
+                self.telemetry.frame(upload, t2 - t1, time.perf_counter() - t2)
+                profiler.end_frame()
+            self.telemetry.poll(time.monotonic())
+            time.sleep(self.scheduler.wait_time(time.monotonic()))
 
         self.stop()
+        return self._finish()
+
+    def _finish(self):
+        """播放结束：关掉预览解码，返回各段累计的计数"""
+        if self.preview is not None:
+            self.preview.close()
+            self.preview = None
+        return dict(self.totals)
+
+    def _surface(self, index):
+        """返回缓冲 index 对应的可 blit 的 Surface"""
+        if not SOFTWARE_NV12:
+            return self.frames[index]
+        # pixels3d 是 (宽, 高, 3) 的像素视图，转置后按行写入；用完立刻释放，解除 Surface 锁定
+        pixels = pygame.surfarray.pixels3d(self.frame)
+        self.converter.convert(self.pool.views[index], pixels.transpose(1, 0, 2))
+        del pixels
+        return self.frame
 
     def stop(self):
-        self.running = False
+        self.halt.set()
+        self.scheduler.discard()
+        self.totals.update(self.scheduler.stats())
+        self.telemetry.detach()
         if self.thread and self.thread.is_alive():
             self.thread.join(timeout=0.5)
 
 # ------------------ 6. 主菜单循环 ------------------
-def draw_ui():
-    screen.fill((30, 30, 30))
-    for rect, path in buttons:
-        pygame.draw.rect(screen, (0, 150, 255), rect, border_radius=12)
-        txt = os.path.basename(path)
-        surf = font.render(txt, True, (255, 255, 255))
-        screen.blit(surf, surf.get_rect(center=rect.center))
-    pygame.display.flip()
+# 手指按下时就在后台探测、选后端、解开头几帧，松手播放时接着用
+tap_warmer = prewarm.TapWarmer(VideoPlayer.warm_up)
+menu.on_press, menu.on_cancel = tap_warmer.press, tap_warmer.cancel
+
+if PREWARM:
+    first_frames = prewarm.FirstFrameCache()
+    prewarmer = prewarm.Prewarmer(video_paths, VideoPlayer.warm_up, first_frames)
+    tap_warmer.cache = first_frames
 
 running = True
 while running:
-    draw_ui()
+    menu.draw(screen)
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             running = False
         elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
             running = False
-        elif event.type in (pygame.FINGERDOWN, pygame.MOUSEBUTTONDOWN):
-            pos = (int(event.x * WIDTH), int(event.y * HEIGHT)) \
-                  if event.type == pygame.FINGERDOWN else event.pos
-            for rect, path in buttons:
-                if rect.collidepoint(pos):
-                    player = VideoPlayer(path, screen)
-                    player.play()          # 阻塞到播完或用户退出
-                    break
+        else:
+            path = menu.handle(event)
+            if path is not None:
+                player = VideoPlayer(path, screen, tap_warmer.take(path))
+                player.play()          # 阻塞到播完或用户退出
+                menu.invalidate()
+                if PREWARM:
+                    prewarmer.request(path)  # 没预热过的放进缓存，下次立刻出画面
     clock.tick(FPS)
 
+if PREWARM:
+    prewarmer.stop()
+menu.close()
 pygame.quit()
@@ -1,11 +1,26 @@
 #!/usr/bin/env python3
 """
-Pi 5 GPU 硬解(OpenGL 2.1) + NV12→RGB 渲染 720p MP4
+Pi 5 GPU 硬解(OpenGL 2.1) + NV12→RGB 渲染 MP4
 菜单 3 排按钮，点击播放，播完返回菜单，不跳出窗口
+解码器按视频原始分辨率和帧率输出，缩放/黑边在顶点着色器里做，色彩矩阵按探测到的元数据选
+VIDEO_WALL=2/3 时启动后先进入视频墙：2x2 / 3x3 个视频同时播放，拼在一张纹理里一次画完
+PLAYLIST=1 时启动后先循环轮播所有视频，下一段的解码器提前启动，段与段之间不空帧
 """
-import os, sys, threading, queue, subprocess, ctypes
+import os, sys, time, threading, subprocess, ctypes
+from collections import Counter
 import pygame
 import numpy as np
+import video_menu
+import video_probe
+import decoder_backend
+import prewarm
+import seek
+import telemetry
+from yuv_convert import yuv_coefficients
+from frame_pool import FramePool, skip_frames
+from frame_scheduler import FrameScheduler, RefreshMeter
+from shm_decoder import ShmFrameRing, start_decoder
+from frame_profiler import FrameProfiler
 from OpenGL.GL import *
 from OpenGL.GL import shaders
 from OpenGL.arrays import vbo
@@ -15,6 +30,17 @@ WIDTH, HEIGHT = 1280, 720
 FPS = 30
 ROWS = 3
 VIDEOS_DIR = "videos"
+# 设为 1 时用独立解码进程 + 共享内存帧环（shm_decoder.py），解码不占渲染进程的 GIL
+SHM_DECODER = os.environ.get("SHM_DECODER") == "1"
+# 设为 1 时后台预解码菜单里各视频的开头几帧（prewarm.py），点击后立刻出画面
+PREWARM = os.environ.get("PREWARM") == "1"
+# 视频墙每边的格数，0 为不启用；WALL_POLICY 是解码跟不上时的策略：
+# drop  每块按自己的时钟播放，来不及显示的帧丢掉（默认）
+# half  每块只输出一半帧率，缩放、转换和上传的开销减半
+VIDEO_WALL = int(os.environ.get("VIDEO_WALL", "0"))
+WALL_POLICY = os.environ.get("WALL_POLICY", "drop")
+# 设为 1 时启动后先按文件名顺序无缝循环播放所有视频（无人值守轮播），点击回到菜单
+PLAYLIST = os.environ.get("PLAYLIST") == "1"
 
 def scan_videos(folder):
     files = [f for f in os.listdir(folder) if f.lower().endswith('.mp4')]
@@ -30,10 +56,16 @@ pygame.init()
 pygame.display.gl_set_attribute(pygame.GL_CONTEXT_MAJOR_VERSION, 2)
 pygame.display.gl_set_attribute(pygame.GL_CONTEXT_MINOR_VERSION, 1)
 pygame.display.gl_set_attribute(pygame.GL_DOUBLEBUFFER, 1)
-screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.OPENGL | pygame.DOUBLEBUF | pygame.FULLSCREEN)
+try:
+    # 开 vsync：flip 阻塞到垂直同步，调度器按刷新周期排帧（24p 在 60Hz 上 3:2），RefreshMeter 据此量实际刷新率
+    screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.OPENGL | pygame.DOUBLEBUF | pygame.FULLSCREEN,
+                                     vsync=1)
+except pygame.error:
+    screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.OPENGL | pygame.DOUBLEBUF | pygame.FULLSCREEN)
 pygame.mouse.set_visible(True)
 clock = pygame.time.Clock()
-font = pygame.font.SysFont('arial', 32, bold=True)
+profiler = FrameProfiler()  # F3 显示帧性能浮层，F4 导出 CSV
+refresh = RefreshMeter()    # 播放时每次 flip 后记时刻，估计实际刷新率
 
 # ------------------ 3. OpenGL 2.1 资源 ------------------
 # 3.1 全屏三角形
@@ -51,9 +83,10 @@ VS = """
 #version 110
 attribute vec3 pos;
 attribute vec2 uv;
+uniform vec2 scale;
 varying vec2 vUv;
 void main(){
-    gl_Position = vec4(pos, 1.0);
+    gl_Position = vec4(pos.xy * scale, 0.0, 1.0);
     vUv = uv;
 }
 """
@@ -61,17 +94,19 @@ FS_NV12 = """
 #version 110
 uniform sampler2D texY;
 uniform sampler2D texUV;
+uniform mat3 yuv2rgb;
+uniform vec3 yuvOffset;
 varying vec2 vUv;
-const mat3 YUV2RGB = mat3(
-    1.164,  1.164,  1.164,
-    0.0,   -0.392,  2.017,
-    1.596, -0.813,  0.0
-);
 void main(){
-    float y  = texture2D(texY,  vUv).r - 0.0625;
-    vec2  uv = texture2D(texUV, vUv).rg - vec2(0.5);
-    vec3 rgb = YUV2RGB * vec3(y, uv);
-    gl_FragColor = vec4(rgb, 1.0);
+    // 缩放后的三角形盖住整个屏幕，画面以外(纹理坐标出了 0..1)涂黑当作黑边
+    if (any(lessThan(vUv, vec2(0.0))) || any(greaterThan(vUv, vec2(1.0)))) {
+        gl_FragColor = vec4(0.0, 0.0, 0.0, 1.0);
+        return;
+    }
+    // LUMINANCE_ALPHA 纹理：U 在 .r，V 在 .a
+    vec4 uv  = texture2D(texUV, vUv);
+    vec3 yuv = vec3(texture2D(texY, vUv).r, uv.r, uv.a) - yuvOffset;
+    gl_FragColor = vec4(yuv2rgb * yuv, 1.0);
 }
 """
 program = shaders.compileProgram(
@@ -85,6 +120,26 @@ texY_loc  = glGetUniformLocation(program, "texY")
 texUV_loc = glGetUniformLocation(program, "texUV")
 glUniform1i(texY_loc, 0)
 glUniform1i(texUV_loc, 1)
+scale_loc = glGetUniformLocation(program, "scale")
+yuv2rgb_loc = glGetUniformLocation(program, "yuv2rgb")
+yuv_offset_loc = glGetUniformLocation(program, "yuvOffset")
+
+def set_video_uniforms(info):
+    """按视频宽高比算黑边缩放，按色彩矩阵/范围设置 YUV→RGB 系数"""
+    video_aspect = info.width / info.height
+    screen_aspect = WIDTH / HEIGHT
+    if video_aspect > screen_aspect:
+        glUniform2f(scale_loc, 1.0, screen_aspect / video_aspect)
+    else:
+        glUniform2f(scale_loc, video_aspect / screen_aspect, 1.0)
+    y_scale, y_offset, c_scale, rv, gu, gv, bu = yuv_coefficients(info.matrix, info.full_range)
+    # 纹理采样值在 0..1，偏移也换算到 0..1；GLSL 的 mat3 按列给出
+    columns = np.array([
+        y_scale, y_scale, y_scale,
+        0.0, c_scale * gu, c_scale * bu,
+        c_scale * rv, c_scale * gv, 0.0], dtype=np.float32)
+    glUniformMatrix3fv(yuv2rgb_loc, 1, GL_FALSE, columns)
+    glUniform3f(yuv_offset_loc, y_offset / 255.0, 128.0 / 255.0, 128.0 / 255.0)
 
 # 3.4 VAO (OpenGL 2.1 手动绑定)
 vao = glGenVertexArrays(1) if glGenVertexArrays else None
@@ -105,107 +160,654 @@ for t in (texY, texUV):
     glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
     glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
 
+# 3.6 纹理流式上传
+PBO_COUNT = 3
+
+def nv12_layout(width, height):
+    """返回 (Y 平面字节数, UV 平面宽, UV 平面高, 整帧字节数)；奇数宽高时色度向上取整"""
+    cw, ch = (width + 1) // 2, (height + 1) // 2
+    y_size = width * height
+    return y_size, cw, ch, y_size + cw * ch * 2
+
+class TextureStreamer:
+    """
+    Y/UV 纹理存储按视频尺寸分配，尺寸不变时跨视频复用，之后每帧用 glTexSubImage2D 更新。
+    帧数据先拷进像素缓冲对象(PBO)环里：第 N 帧写进一个 PBO 时，
+    GPU 还在从上一个 PBO 往纹理搬第 N-1 帧，CPU 拷贝和 GPU 传输重叠。
+    为了不因此晚一帧显示，调度器提前一帧取帧（prefetch）：写进 PBO 的总是下一帧，
+    它到时的那次刷新由再下一帧的 upload 搬进纹理；没有再下一帧（欠载、播完）时由 flush() 搬，
+    见 upload_frames。
+    """
+    def __init__(self, count=PBO_COUNT):
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        self.pbos = list(np.atleast_1d(glGenBuffers(count)))
+        self.size = None
+        self.index = 0
+        self.filled = None  # 已写入、还没搬进纹理的 PBO
+        self.has_frame = False  # 纹理里是否已有当前视频的画面
+
+    def reset(self, width, height, keep=False):
+        """
+        换视频时丢掉上一段视频留在 PBO 里的帧，尺寸变了才重新分配纹理和 PBO。
+        keep=True 且尺寸不变时保留纹理里的画面和还没搬进纹理的帧（播放列表无缝衔接用）
+        """
+        if keep and self.size == (width, height):
+            return
+        self.filled = None
+        self.has_frame = False
+        if self.size == (width, height):
+            return
+        self.size = width, height
+        self.y_size, self.cw, self.ch, self.frame_size = nv12_layout(width, height)
+        glActiveTexture(GL_TEXTURE0)
+        glBindTexture(GL_TEXTURE_2D, texY)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_LUMINANCE, width, height, 0,
+                     GL_LUMINANCE, GL_UNSIGNED_BYTE, None)
+        glActiveTexture(GL_TEXTURE1)
+        glBindTexture(GL_TEXTURE_2D, texUV)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_LUMINANCE_ALPHA, self.cw, self.ch, 0,
+                     GL_LUMINANCE_ALPHA, GL_UNSIGNED_BYTE, None)
+        for pbo in self.pbos:
+            glBindBuffer(GL_PIXEL_UNPACK_BUFFER, pbo)
+            glBufferData(GL_PIXEL_UNPACK_BUFFER, self.frame_size, None, GL_STREAM_DRAW)
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+
+    def _transfer(self, pbo):
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, pbo)
+        glActiveTexture(GL_TEXTURE0)
+        glBindTexture(GL_TEXTURE_2D, texY)
+        glTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, self.size[0], self.size[1],
+                        GL_LUMINANCE, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        glActiveTexture(GL_TEXTURE1)
+        glBindTexture(GL_TEXTURE_2D, texUV)
+        glTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, self.cw, self.ch,
+                        GL_LUMINANCE_ALPHA, GL_UNSIGNED_BYTE, ctypes.c_void_p(self.y_size))
+        self.has_frame = True
+
+    def flush(self):
+        """没有新帧上传时，把 PBO 里等着的那一帧搬进纹理"""
+        if self.filled is not None:
+            self._transfer(self.filled)
+            self.filled = None
+            # 解绑，否则进度条的 glDrawPixels 会把数据指针当成 PBO 里的偏移
+            glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+
+    def upload(self, nv12):
+        # 先让 GPU 从上一帧写好的 PBO 异步更新纹理
+        if self.filled is not None:
+            self._transfer(self.filled)
+        # 再把新帧拷进环里的下一个 PBO；先用 glBufferData(None) 丢弃旧存储，避免等 GPU 用完
+        pbo = self.pbos[self.index]
+        self.index = (self.index + 1) % len(self.pbos)
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, pbo)
+        glBufferData(GL_PIXEL_UNPACK_BUFFER, self.frame_size, None, GL_STREAM_DRAW)
+        ptr = glMapBuffer(GL_PIXEL_UNPACK_BUFFER, GL_WRITE_ONLY)
+        if ptr:
+            ctypes.memmove(ptr, nv12, self.frame_size)
+            glUnmapBuffer(GL_PIXEL_UNPACK_BUFFER)
+            self.filled = pbo
+            if not self.has_frame:
+                # 第一帧不等下一次上传，马上搬进纹理，点击后早一帧出画面
+                self._transfer(pbo)
+                self.filled = None
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+
+    def upload_region(self, nv12, x, y, w, h):
+        """
+        视频墙：把一块 w×h 的 NV12 拼块写进纹理的 (x, y) 处（都是偶数）。
+        拼块经 PBO 环立即用 glTexSubImage2D 更新纹理的这一块，不等下一帧。
+        """
+        size = w * h * 3 // 2
+        pbo = self.pbos[self.index]
+        self.index = (self.index + 1) % len(self.pbos)
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, pbo)
+        glBufferData(GL_PIXEL_UNPACK_BUFFER, size, None, GL_STREAM_DRAW)
+        ptr = glMapBuffer(GL_PIXEL_UNPACK_BUFFER, GL_WRITE_ONLY)
+        if ptr:
+            ctypes.memmove(ptr, nv12, size)
+            glUnmapBuffer(GL_PIXEL_UNPACK_BUFFER)
+            glActiveTexture(GL_TEXTURE0)
+            glBindTexture(GL_TEXTURE_2D, texY)
+            glTexSubImage2D(GL_TEXTURE_2D, 0, x, y, w, h,
+                            GL_LUMINANCE, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+            glActiveTexture(GL_TEXTURE1)
+            glBindTexture(GL_TEXTURE_2D, texUV)
+            glTexSubImage2D(GL_TEXTURE_2D, 0, x // 2, y // 2, w // 2, h // 2,
+                            GL_LUMINANCE_ALPHA, GL_UNSIGNED_BYTE, ctypes.c_void_p(w * h))
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+
+streamer = TextureStreamer()
+
+
+def upload_frames(scheduler, pool, now):
+    """
+    本次刷新的上传（调度器要开 prefetch）：取出的帧写进 PBO，同时把到时的上一帧搬进纹理；
+    PBO 里的帧到时了却没有下一帧顶它时 flush，然后再取一次，让 PBO 里总是提前放着下一帧。
+    返回是否上传了新帧
+    """
+    uploaded = False
+    for _ in range(2):
+        index = scheduler.next_frame(now)
+        if index is not None:
+            streamer.upload(pool.arrays[index])
+            # 帧已拷进 PBO，缓冲马上还给解码端
+            pool.release(index)
+            uploaded = True
+        if not scheduler.present_due(now):
+            break
+        streamer.flush()
+    return uploaded
+
 # ------------------ 4. 解码线程 ------------------
+def decode_command(path, backend, codec, frames=None, start=0.0):
+    # 不缩放、不指定 -r：按源分辨率和源帧率输出，缩放交给 GPU；frames 限制只解开头几帧
+    limit = ["-frames:v", str(frames)] if frames else []
+    return decoder_backend.command(path, backend, codec,
+                                   limit + ["-f", "rawvideo", "-pix_fmt", "nv12", "-"], start=start)
+
+def event_pos(e):
+    """触摸/鼠标事件的屏幕坐标"""
+    if e.type in (pygame.FINGERDOWN, pygame.FINGERMOTION, pygame.FINGERUP):
+        return int(e.x * WIDTH), int(e.y * HEIGHT)
+    return e.pos
+
 class VideoPlayer:
-    def __init__(self, path):
+    # 帧经 PBO 要到下一次上传才搬进纹理，调度器提前一帧取帧
+    prefetch = True
+
+    def __init__(self, path, entry=None):
+        """entry 是预热（或按下即预热）得到的 prewarm.Entry"""
         self.path = path
-        self.q = queue.Queue(maxsize=3)
-        self.running = False
-
-    def _decode(self):
-        cmd = [
-            "ffmpeg",
-            "-loglevel", "error",
-            "-hwaccel", "drm",
-            "-c:v", "h264_v4l2m2m",
-            "-i", self.path,
-            "-f", "rawvideo",
-            "-pix_fmt", "nv12",
-            "-s", f"{WIDTH}x{HEIGHT}",
-            "-r", str(FPS),
-            "-"
-        ]
-        pipe = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=10**8)
-        frame_size = int(WIDTH * HEIGHT * 1.5)
-        while self.running:
-            buf = pipe.stdout.read(frame_size)
-            if not buf:
+        if entry is None and PREWARM:
+            entry = first_frames.get(path)
+        if entry is not None:
+            # 预热过：探测结果、解码后端和开头几帧都现成
+            self.info, self.backend, self.preroll = entry
+        else:
+            self.info = video_probe.probe(path, default_size=(WIDTH, HEIGHT))
+            self.backend = decoder_backend.select(path, self.info)
+            self.preroll = ()
+        self.frame_size = nv12_layout(self.info.width, self.info.height)[3]
+        self.cores = None  # 不为空时把 ffmpeg 绑到这些 CPU 核上（视频墙用）
+        self.start_time = 0.0
+        self.halt = None   # 每次启动解码一个新的 Event，跳转后旧的读线程不会接着往新缓冲池里写
+        self.interrupted = False
+        self.decoder = None
+        self.totals = Counter()  # 跳转前各段的计数，stop 时累加
+        self.telemetry = telemetry.NULL  # play() 时开会话；视频墙的拼块不输出遥测
+        self.index = None    # 关键帧索引和拖动预览，第一次跳转时才建
+        self.preview = None
+        self.timeline = None
+
+    def _command(self):
+        return decode_command(self.path, self.backend, self.info.codec, start=self.start_time)
+
+    @staticmethod
+    def warm_up(path, cancel=None):
+        """预热线程里调用：探测、选后端并解出开头几帧"""
+        info = video_probe.probe(path, default_size=(WIDTH, HEIGHT))
+        backend = decoder_backend.select(path, info)
+        frames = prewarm.read_frames(decode_command(path, backend, info.codec, prewarm.PREWARM_FRAMES),
+                                     nv12_layout(info.width, info.height)[3], prewarm.PREWARM_FRAMES,
+                                     cancel)
+        return prewarm.Entry(info, backend, frames)
+
+    def _decode(self, cmd, pool, halt, start, n):
+        # bufsize=0：readinto 直接从管道读进缓冲池，不经过 BufferedReader 再拷一次
+        pipe = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0)
+        if self.cores:
+            os.sched_setaffinity(pipe.pid, self.cores)
+        # 预热的开头 n 帧已经在缓冲池里，ffmpeg 输出的对应帧丢掉
+        if not skip_frames(pipe.stdout, self.frame_size, n):
+            halt.set()
+        while not halt.is_set():
+            index = pool.acquire(timeout=1)
+            if index is None:
+                continue
+            if not pool.fill(pipe.stdout, index):
+                pool.release(index)
                 break
-            try:
-                self.q.put(buf, timeout=1)
-            except queue.Full:
-                pass
+            # rawvideo 输出默认按源帧率补帧/丢帧成恒定帧率，第 n 帧的时间戳就是 start + n / fps
+            pool.publish(index, start + n / self.info.fps)
+            n += 1
         pipe.kill()
+        # 回收 ffmpeg（长时间轮播不留僵尸进程），退出码随文件尾标记一起交给渲染端
+        pool.close(pipe.wait())
 
     def play(self):
-        self.running = True
-        threading.Thread(target=self._decode, daemon=True).start()
+        """播放到结束或用户点击，返回显示/丢帧/重复/迟到计数"""
+        self.telemetry = telemetry.session(self.path, self.info, self.backend)
+        stats = self._play()
+        if stats["presented"] == 0 and not self.interrupted and self.backend != decoder_backend.SOFTWARE:
+            # 选中的硬件后端一帧也没解出来（ffmpeg 的错误输出被丢弃），换软件解码重播
+            print(f"{self.backend} 解码 {self.path} 失败，改用软件解码", file=sys.stderr)
+            decoder_backend.forget(self.info)
+            self.telemetry.restart("fallback", backend=decoder_backend.SOFTWARE)
+            self.backend = decoder_backend.SOFTWARE
+            stats = self._play()
+        self.telemetry.end("user" if self.interrupted else "eof")
+        return stats
+
+    def start(self, start=0.0):
+        """从 start 秒（要是关键帧）开始：分配缓冲池、启动解码线程（或进程），返回这一路的调度器"""
+        self.start_time = start
+        self.halt = threading.Event()
+        # 预热的开头几帧只在从头播放时用得上
+        preroll = self.preroll if start == 0 else ()
+        # 最多 3 帧排队 + 1 帧正在读，另加放预热帧的缓冲
+        count = 4 + len(preroll)
+        if SHM_DECODER:
+            self.pool = ShmFrameRing(self.frame_size, slots=count)
+            self.pool.preload(preroll, self.info.fps)
+            self.decoder = start_decoder(self.pool, self._command(), self.info.fps, self.cores, start)
+        else:
+            self.pool = FramePool(self.frame_size, count=count)
+            self.pool.preload(preroll, self.info.fps)
+            threading.Thread(target=self._decode,
+                             args=(self._command(), self.pool, self.halt, start, len(preroll)),
+                             daemon=True).start()
+        self.scheduler = FrameScheduler(self.pool, self.info.fps, refresh.rate(), prefetch=self.prefetch)
+        self.telemetry.attach(self.pool, self.scheduler)
+        return self.scheduler
+
+    def position(self):
+        """当前播放位置(秒)；跳转后第一帧出来之前是跳转目标"""
+        if self.scheduler.t0 is None:
+            return self.start_time
+        return self.scheduler.clock(time.monotonic())
+
+    def _seeking(self):
+        """第一次拖动或按方向键时建关键帧索引和进度条"""
+        if self.index is None:
+            self.index = seek.load_index(self.path, self.info.duration)
+            self.timeline = seek.Timeline((WIDTH, HEIGHT), self.index.duration)
+        return self.index
+
+    def _show_preview(self, t):
+        """拖动中：显示离 t 最近的关键帧小图，不等解码"""
+        if self.preview is None:
+            size = seek.preview_size(self.info.width, self.info.height)
+            self.preview = seek.PreviewStrip(self.path, self.index, size)
+            self.preview.start()
+        frame = self.preview.nearest(t)
+        if frame is not None and frame is not self.shown:
+            self.shown = frame
+            w, h = self.preview.size
+            # reset 后 has_frame 为假，upload 会马上把这一帧搬进纹理
+            streamer.reset(w, h)
+            set_video_uniforms(self.info._replace(width=w, height=h))
+            streamer.upload(frame)
+
+    def seek(self, t):
+        """停掉当前解码，从 t 之前最近的关键帧重新开始"""
+        self.stop()
+        start = self.index.before(t)
+        self.telemetry.restart("seek", to=start)
+        self.start(start)
+        streamer.reset(self.info.width, self.info.height)
+        set_video_uniforms(self.info)
+
+    def _play(self):
+        self.totals = Counter()
+        self.start()
+        streamer.reset(self.info.width, self.info.height)
+        set_video_uniforms(self.info)
         glClearColor(0, 0, 0, 1)
-        while True:
+        scrub = None       # 拖动中手指所在的时间
+        self.shown = None  # 拖动中正在显示的预览帧
+        bar_until = 0.0    # 跳转后进度条再显示到这个时刻
+        while scrub is not None or not self.scheduler.finished():
             for e in pygame.event.get():
-                if e.type in (pygame.QUIT, pygame.KEYDOWN,
-                              pygame.FINGERDOWN, pygame.MOUSEBUTTONDOWN):
-                    self.running = False
-                    return
+                if profiler.handle_event(e):
+                    continue
+                if e.type in (pygame.FINGERDOWN, pygame.MOUSEBUTTONDOWN) and \
+                        (scrub is not None or seek.on_bar(event_pos(e), (WIDTH, HEIGHT))):
+                    # 按在底部进度条上：停掉解码，开始拖动（触摸时 SDL 还会补发一个鼠标事件）
+                    if scrub is None:
+                        self._seeking()
+                        self.stop()
+                    scrub = self.timeline.time_at(event_pos(e)[0])
+                elif e.type in (pygame.FINGERMOTION, pygame.MOUSEMOTION) and scrub is not None:
+                    scrub = self.timeline.time_at(event_pos(e)[0])
+                elif e.type in (pygame.FINGERUP, pygame.MOUSEBUTTONUP) and scrub is not None:
+                    start = self.index.before(scrub)
+                    self.telemetry.restart("seek", to=start)
+                    self.start(start)
+                    streamer.reset(self.info.width, self.info.height)
+                    set_video_uniforms(self.info)
+                    scrub = self.shown = None
+                    bar_until = time.monotonic() + seek.BAR_SECONDS
+                elif e.type == pygame.KEYDOWN and e.key in (pygame.K_LEFT, pygame.K_RIGHT):
+                    # 左右键按章节跳转，拖动中不理会
+                    t = None
+                    if scrub is None:
+                        t = self._seeking().chapter(self.position(), 1 if e.key == pygame.K_RIGHT else -1)
+                    if t is not None:
+                        self.seek(t)
+                        bar_until = time.monotonic() + seek.BAR_SECONDS
+                elif e.type in (pygame.QUIT, pygame.KEYDOWN,
+                                pygame.FINGERDOWN, pygame.MOUSEBUTTONDOWN):
+                    self.interrupted = True
+                    if scrub is None:
+                        self.stop()
+                    return self._finish()
+            upload = None
+            if scrub is not None:
+                self._show_preview(scrub)
+            else:
+                t0 = time.perf_counter()
+                with profiler.stage("upload"):
+                    if upload_frames(self.scheduler, self.pool, time.monotonic()):
+                        upload = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            # 每帧先清屏：缩小的三角形画不到黑边，不清的话进度条和性能浮层会残留在黑边里；
+            # 没有新帧时也重画纹理里的上一帧：双缓冲交换后后台缓冲的内容不确定
+            glClear(GL_COLOR_BUFFER_BIT)
+            if streamer.has_frame:
+                glDrawArrays(GL_TRIANGLES, 0, 3)
+            if scrub is not None or time.monotonic() < bar_until:
+                self.timeline.draw_gl(self.position() if scrub is None else scrub, self.index.chapters)
+            profiler.draw_gl((WIDTH, HEIGHT))
+            t1 = time.perf_counter()
+            with profiler.stage("flip"):
+                pygame.display.flip()
+            refresh.flipped(time.monotonic())
+            self.telemetry.frame(upload, t1 - t0, time.perf_counter() - t1)
+            self.telemetry.poll(time.monotonic())
+            profiler.end_frame()
+            if scrub is None:
+                time.sleep(self.scheduler.wait_time(time.monotonic()))
+            else:
+                clock.tick(FPS)
+        self.stop()
+        return self._finish()
+
+    def _finish(self):
+        """播放结束：关掉预览解码，返回各段累计的计数"""
+        if self.preview is not None:
+            self.preview.close()
+            self.preview = None
+        return dict(self.totals)
+
+    def stop(self):
+        self.halt.set()
+        self.scheduler.discard()
+        self.totals.update(self.scheduler.stats())
+        self.telemetry.detach()
+        if self.decoder is not None:
+            self.pool.close()
             try:
-                nv12 = self.q.get_nowait()
-                self._render(nv12)
-            except queue.Empty:
-                pass
-            pygame.display.flip()
-            clock.tick(FPS)
+                self.decoder.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                self.decoder.kill()
+                self.decoder.wait()
+            self.decoder = None
 
-    def _render(self, nv12):
-        y_plane = nv12[:WIDTH * HEIGHT]
-        uv_plane = nv12[WIDTH * HEIGHT:]
-        # Y texture
-        glActiveTexture(GL_TEXTURE0)
-        glBindTexture(GL_TEXTURE_2D, texY)
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_LUMINANCE, WIDTH, HEIGHT, 0,
-                     GL_LUMINANCE, GL_UNSIGNED_BYTE, y_plane)
-        # UV texture
-        glActiveTexture(GL_TEXTURE1)
-        glBindTexture(GL_TEXTURE_2D, texUV)
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_LUMINANCE_ALPHA, WIDTH // 2, HEIGHT // 2, 0,
-                     GL_LUMINANCE_ALPHA, GL_UNSIGNED_BYTE, uv_plane)
+# ------------------ 5. 视频墙 ------------------
+class WallTile(VideoPlayer):
+    """
+    视频墙里的一块：ffmpeg 直接缩放（保持宽高比、补黑边）到拼块大小，
+    并统一转成 BT.709 有限范围，整面墙共用一组色彩系数。
+    拼块用 upload_region 立即写进纹理，不需要提前取帧。
+    """
+    prefetch = False
+
+    def __init__(self, path, rect, threads, cores):
+        super().__init__(path)
+        self.preroll = ()  # 预热的是全尺寸帧，拼块用不上
+        self.rect = rect
+        self.threads = threads
+        self.cores = cores
+        x, y, w, h = rect
+        self.frame_size = w * h * 3 // 2
+        self.filters = (f"scale={w}:{h}:force_original_aspect_ratio=decrease"
+                        f":out_color_matrix=bt709:out_range=tv,pad={w}:{h}:-1:-1")
+        if WALL_POLICY == "half":
+            self.info = self.info._replace(fps=self.info.fps / 2)
+            self.filters += f",fps={self.info.fps}"
+
+    def _command(self):
+        return decoder_backend.command(self.path, self.backend, self.info.codec,
+                                       ["-vf", self.filters, "-f", "rawvideo", "-pix_fmt", "nv12", "-"],
+                                       threads=self.threads)
+
+
+def tile_cores(i, tiles):
+    """按块均分 CPU 核：核比块多时每块独占几个核，否则几块轮流共用一个核"""
+    cores = sorted(os.sched_getaffinity(0))
+    per = max(1, len(cores) // tiles)
+    start = (i * per) % len(cores)
+    return cores[start:start + per]
+
+
+def play_wall(paths, grid):
+    """grid×grid 个视频同时播放，每块播完从头循环，点击或按键退出；返回每块累计的显示/丢帧计数"""
+    tw, th = (WIDTH // grid) & ~1, (HEIGHT // grid) & ~1
+    wall = video_probe.VideoInfo("wall", tw * grid, th * grid, FPS, "bt709", False, None)
+    streamer.reset(wall.width, wall.height)
+    set_video_uniforms(wall)
+    # 先整面涂黑（NV12 有限范围的黑是 Y=16、UV=128），还没出画面的块不会是花屏
+    black = bytes([16]) * (wall.width * wall.height) + bytes([128]) * (wall.width * wall.height // 2)
+    streamer.upload(black)
+
+    count = grid * grid
+    threads = max(1, len(os.sched_getaffinity(0)) // count)
+    tiles = []
+    for i in range(count):
+        row, col = divmod(i, grid)
+        tile = WallTile(paths[i % len(paths)], (col * tw, row * th, tw, th), threads,
+                        tile_cores(i, count))
+        tile.start()
+        tiles.append(tile)
+
+    glClearColor(0, 0, 0, 1)
+    running = True
+    while running:
+        for e in pygame.event.get():
+            if profiler.handle_event(e):
+                continue
+            if e.type in (pygame.QUIT, pygame.KEYDOWN, pygame.FINGERDOWN, pygame.MOUSEBUTTONDOWN):
+                running = False
+        now = time.monotonic()
+        with profiler.stage("upload"):
+            for tile in tiles:
+                index = tile.scheduler.next_frame(now)
+                if index is not None:
+                    streamer.upload_region(tile.pool.arrays[index], *tile.rect)
+                    tile.pool.release(index)
+                elif tile.scheduler.finished():
+                    tile.stop()  # stop 时把这一轮的计数累加进 tile.totals
+                    tile.start()
+        # 所有块都在同一张纹理里，一次绘制；拼块取整后纹理可能比屏幕略小，先清屏
+        glClear(GL_COLOR_BUFFER_BIT)
         glDrawArrays(GL_TRIANGLES, 0, 3)
+        profiler.draw_gl((WIDTH, HEIGHT))
+        with profiler.stage("flip"):
+            pygame.display.flip()
+        profiler.end_frame()
+        now = time.monotonic()
+        time.sleep(min(tile.scheduler.wait_time(now) for tile in tiles))
+    for tile in tiles:
+        tile.stop()
+    return [dict(tile.totals) for tile in tiles]
+
+# ------------------ 6. 播放列表 ------------------
+PRIME_SECONDS = 3  # 当前视频还剩这么多秒时启动下一段的解码器
+
+class Playlist:
+    """
+    按顺序循环的播放列表。当前视频快播完时在后台线程里建好下一段的播放器（探测、选后端）并启动解码，
+    解码器填满缓冲池后停下等着；切换时直接从它的调度器取帧，不用在切换那一刻等 ffmpeg 启动。
+    某一段打不开（文件坏了、ffmpeg 起不来）时跳过它，接着同步打开后面的。
+    """
+    def __init__(self, paths):
+        self.paths = paths
+        self.position = 0
+        self.next = None
+        self.thread = None
+
+    def prime(self):
+        """在后台准备下一段，重复调用无害"""
+        if self.thread is None:
+            path = self.paths[(self.position + 1) % len(self.paths)]
+            self.thread = threading.Thread(target=self._prime, args=(path,), name="playlist", daemon=True)
+            self.thread.start()
+
+    def open(self, path):
+        """建播放器并启动解码，失败时返回 None"""
+        player = None
+        try:
+            player = VideoPlayer(path)
+            player.telemetry = telemetry.session(path, player.info, player.backend)
+            player.start()
+            return player
+        except Exception as e:  # 后台线程里的异常不能带崩轮播，记下来跳过这一段
+            print(f"播放列表打开 {path} 失败：{e}", file=sys.stderr)
+            if player is not None:
+                player.telemetry.end("error")
+            return None
+
+    def _prime(self, path):
+        self.next = self.open(path)
+
+    def advance(self):
+        """
+        切到下一段，返回 (已启动的播放器, 是否来不及准备、要在这里等)；
+        准备失败的段跳过，整个列表都打不开时播放器为 None
+        """
+        self.prime()
+        waited = self.thread.is_alive()
+        self.thread.join()
+        player, self.next, self.thread = self.next, None, None
+        self.position += 1
+        for _ in range(len(self.paths) - 1):
+            if player is not None:
+                break
+            waited = True
+            self.position += 1
+            player = self.open(self.paths[self.position % len(self.paths)])
+        return player, waited
+
+    def close(self):
+        """退出时停掉已经准备好的下一段"""
+        if self.thread is not None:
+            self.thread.join()
+            if self.next is not None:
+                self.next.stop()
+                self.next.telemetry.end("user")
+            self.next = self.thread = None
+
+
+def play_playlist(paths):
+    """按顺序循环播放 paths，点击或按键退出；返回播放段数、切换时没准备好的次数和累计的显示/丢帧计数"""
+    playlist = Playlist(paths)
+    player = playlist.open(paths[0])
+    if player is None:
+        player, _ = playlist.advance()
+    if player is None:
+        print("播放列表里的视频都打不开，退出轮播", file=sys.stderr)
+        return dict(clips=0, late_switches=0)
+    streamer.reset(player.info.width, player.info.height)
+    set_video_uniforms(player.info)
+    glClearColor(0, 0, 0, 1)
+    totals = Counter()
+    clips = late_switches = failures = 0
+    running = True
+    while running:
+        for e in pygame.event.get():
+            if profiler.handle_event(e):
+                continue
+            if e.type in (pygame.QUIT, pygame.KEYDOWN, pygame.FINGERDOWN, pygame.MOUSEBUTTONDOWN):
+                running = False
+        now = time.monotonic()
+        scheduler = player.scheduler
+        duration = player.info.duration
+        # 时长未知时等当前解码器读到文件尾再准备，至少还有缓冲池里那几帧的时间
+        if scheduler.ended or (duration and duration - player.position() < PRIME_SECONDS):
+            playlist.prime()
+        if scheduler.finished():
+            # 当前段最后一帧已经在上一次刷新显示过：在这次刷新里就换成下一段，不空出一帧
+            player.stop()
+            player.telemetry.end("eof")
+            failures = failures + 1 if player.totals["presented"] == 0 else 0
+            totals.update(player.totals)
+            clips += 1
+            if failures >= len(paths):
+                # 所有视频都解不出帧，不再空转重启 ffmpeg
+                print("播放列表里的视频都解不出帧，退出轮播", file=sys.stderr)
+                playlist.close()
+                return dict(totals, clips=clips, late_switches=late_switches)
+            previous = player.info
+            player, waited = playlist.advance()
+            if player is None:
+                print("播放列表里的视频都打不开，退出轮播", file=sys.stderr)
+                playlist.close()
+                return dict(totals, clips=clips, late_switches=late_switches)
+            late_switches += waited
+            # 格式相同就保留纹理里上一段的最后一帧，下一段第一帧还没解出来时接着显示它；
+            # 尺寸或色彩矩阵不同时重新分配纹理
+            same = (previous.width, previous.height, previous.matrix, previous.full_range) == \
+                   (player.info.width, player.info.height, player.info.matrix, player.info.full_range)
+            streamer.reset(player.info.width, player.info.height, keep=same)
+            set_video_uniforms(player.info)
+        upload = None
+        t0 = time.perf_counter()
+        with profiler.stage("upload"):
+            if upload_frames(player.scheduler, player.pool, now):
+                upload = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        glClear(GL_COLOR_BUFFER_BIT)  # 黑边里不留性能浮层的残影
+        if streamer.has_frame:
+            glDrawArrays(GL_TRIANGLES, 0, 3)
+        profiler.draw_gl((WIDTH, HEIGHT))
+        t1 = time.perf_counter()
+        with profiler.stage("flip"):
+            pygame.display.flip()
+        refresh.flipped(time.monotonic())
+        player.telemetry.frame(upload, t1 - t0, time.perf_counter() - t1)
+        player.telemetry.poll(time.monotonic())
+        profiler.end_frame()
+        time.sleep(player.scheduler.wait_time(time.monotonic()))
+    player.stop()
+    player.telemetry.end("user")
+    totals.update(player.totals)
+    playlist.close()
+    return dict(totals, clips=clips, late_switches=late_switches)
+
+# ------------------ 7. 菜单 ------------------
+# 按钮大小固定，视频多了往下滚动翻页；只渲染可见的按钮，缩略图后台抽帧、磁盘缓存
+# 手指按下时就在后台探测、选后端、解开头几帧，松手播放时接着用
+tap_warmer = prewarm.TapWarmer(VideoPlayer.warm_up)
+menu = video_menu.VideoMenu(video_paths, (WIDTH, HEIGHT), ROWS, font_size=32,
+                            on_press=tap_warmer.press, on_cancel=tap_warmer.cancel)
+
+if PREWARM:
+    first_frames = prewarm.FirstFrameCache()
+    prewarmer = prewarm.Prewarmer(video_paths, VideoPlayer.warm_up, first_frames)
+    tap_warmer.cache = first_frames
+
+if VIDEO_WALL:
+    play_wall(video_paths, VIDEO_WALL)
 
-# ------------------ 5. 菜单 ------------------
-def draw_ui():
-    screen = pygame.display.get_surface()
-    screen.fill((30, 30, 30))
-    for rect, path in buttons:
-        pygame.draw.rect(screen, (0, 150, 255), rect, border_radius=12)
-        txt = font.render(os.path.basename(path), True, (255, 255, 255))
-        screen.blit(txt, txt.get_rect(center=rect.center))
-    pygame.display.flip()
-
-# 计算按钮
-BUTTONS = len(video_paths)
-COLS = (BUTTONS + ROWS - 1) // ROWS
-margin = 20
-uw, uh = WIDTH - 2 * margin, HEIGHT - 2 * margin
-btn_w = uw // COLS - 10
-btn_h = uh // ROWS - 10
-buttons = []
-for idx, path in enumerate(video_paths):
-    row, col = divmod(idx, COLS)
-    left = margin + col * (btn_w + 10)
-    top  = margin + row * (btn_h + 10)
-    buttons.append((pygame.Rect(left, top, btn_w, btn_h), path))
+if PLAYLIST:
+    play_playlist(video_paths)
 
 running = True
 while running:
-    draw_ui()
+    menu.draw(pygame.display.get_surface())
     for e in pygame.event.get():
         if e.type == pygame.QUIT or (e.type == pygame.KEYDOWN and e.key == pygame.K_ESCAPE):
             running = False
-        elif e.type in (pygame.FINGERDOWN, pygame.MOUSEBUTTONDOWN):
-            pos = (int(e.x * WIDTH), int(e.y * HEIGHT)) if e.type == pygame.FINGERDOWN else e.pos
-            for rect, path in buttons:
-                if rect.collidepoint(pos):
-                    VideoPlayer(path).play()
-                    break
+        else:
+            path = menu.handle(e)
+            if path is not None:
+                VideoPlayer(path, tap_warmer.take(path)).play()
+                menu.invalidate()
+                if PREWARM:
+                    prewarmer.request(path)  # 没预热过的放进缓存，下次立刻出画面
     clock.tick(FPS)
 
+if PREWARM:
+    prewarmer.stop()
+menu.close()
 pygame.quit()
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+数据驱动的仪表盘引擎
+仪表盘由 JSON/TOML 配置描述（指标源、量程、样式），引擎负责：
+- 展开每核 CPU、每块网卡、每个挂载点的仪表
+- 按屏幕尺寸自动计算网格布局和缩放
+- 表盘静态部分缓存为背景，每帧只重画数值变化的仪表（NumPy 批量计算指针端点）
+- 新样本到达时指针缓动到新值，动画结束后主循环睡眠，直到下一个快照或输入
+用法: python gauge_engine.py dashboards/home7.json
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import psutil
+import pygame
+
+import metrics_sampler
+import text_cache
+from dirty_rects import DirtyRectPresenter
+from frame_profiler import FrameProfiler
+from gauge_face import DEFAULT_STYLE, GaugeFaceCache, face_extent
+from metric_history import MetricHistory, SparklinePanel
+
+DASHBOARDS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dashboards")
+
+# 各类指标默认采样间隔(秒)：温度 1Hz、CPU 4Hz
+DEFAULT_INTERVALS = {
+    "cpu_temp": 1.0,
+    "cpu_usage": 0.25,
+    "cpu_core": 0.25,
+    "memory_usage": 1.0,
+    "disk_usage": 5.0,
+    "net": 1.0,
+}
+
+SIMPLE_SOURCES = ("cpu_temp", "cpu_usage", "memory_usage", "net_sent", "net_recv")
+
+ANIMATION_MS = 150      # 指针从旧值转到新值的时长，配置项 animation_ms，0 表示直接跳变
+IDLE_POLL_MS = 50       # 空闲时每隔多久醒来处理一次输入事件
+
+
+def load_config(path):
+    with open(path, "rb") as f:
+        if path.endswith(".toml"):
+            import tomllib
+            return tomllib.load(f)
+        return json.load(f)
+
+
+def normalize_style(style):
+    """合并默认样式，JSON 里的颜色列表转成元组，便于做缓存键"""
+    merged = dict(DEFAULT_STYLE)
+    merged.update(style)
+    return {k: tuple(v) if isinstance(v, list) else v for k, v in merged.items()}
+
+
+def _expand_keys(value, all_keys):
+    if value == "*":
+        return list(all_keys)
+    return value if isinstance(value, list) else [value]
+
+
+def expand_gauges(config):
+    """把配置里的仪表展开成一张平铺列表，每个仪表对应一个指标名"""
+    base_style = config.get("style", {})
+    gauges = []
+    for spec in config["gauges"]:
+        source = spec["source"]
+        style = normalize_style(dict(base_style, **spec.get("style", {})))
+        exclude = set(spec.get("exclude", ()))
+        entries = []
+        if source == "cpu_core":
+            for core in _expand_keys(spec.get("core", "*"), range(psutil.cpu_count())):
+                entries.append((f"cpu_core:{core}", {"core": core}))
+        elif source in ("net_sent", "net_recv") and "nic" in spec:
+            for nic in _expand_keys(spec["nic"], sorted(psutil.net_if_stats())):
+                entries.append((f"{source}:{nic}", {"nic": nic}))
+        elif source == "disk_usage":
+            mounts = [p.mountpoint for p in psutil.disk_partitions()]
+            for mount in _expand_keys(spec.get("mount", "/"), mounts):
+                entries.append((f"disk_usage:{mount}", {"mount": mount}))
+        elif source in SIMPLE_SOURCES:
+            entries.append((source, {}))
+        else:
+            raise ValueError(f"未知的指标源: {source}")
+
+        for metric, fields in entries:
+            if exclude & set(map(str, fields.values())):
+                continue
+            gauges.append({
+                "name": spec.get("name", metric).format(**fields),
+                "metric": metric,
+                "min_value": spec.get("min_value", 0),
+                "max_value": spec.get("max_value", 100),
+                "style": style,
+            })
+    return gauges
+
+
+def build_sampler(gauges, intervals=None):
+    """只为配置里用到的指标建立采样源，同类的多核/多网卡/多磁盘合并成一次读取"""
+    iv = dict(DEFAULT_INTERVALS, **(intervals or {}))
+    metrics = {g["metric"] for g in gauges}
+    sampler = metrics_sampler.MetricsSampler()
+    if "cpu_temp" in metrics:
+        sampler.add("cpu_temp", metrics_sampler.get_cpu_temperature, iv["cpu_temp"])
+    if "cpu_usage" in metrics:
+        sampler.add("cpu_usage", metrics_sampler.get_cpu_usage, iv["cpu_usage"])
+    if "memory_usage" in metrics:
+        sampler.add("memory_usage", metrics_sampler.get_memory_usage, iv["memory_usage"])
+    if {"net_sent", "net_recv"} & metrics:
+        sampler.add(("net_sent", "net_recv"), metrics_sampler.get_network_speed, iv["net"])
+    if any(m.startswith("cpu_core:") for m in metrics):
+        names = tuple(f"cpu_core:{i}" for i in range(psutil.cpu_count()))
+        sampler.add(names, metrics_sampler.get_cpu_core_usage, iv["cpu_core"])
+    nics = sorted({m.split(":", 1)[1] for m in metrics if m.startswith(("net_sent:", "net_recv:"))})
+    if nics:
+        names = tuple(n for nic in nics for n in (f"net_sent:{nic}", f"net_recv:{nic}"))
+        sampler.add(names, metrics_sampler.make_nic_reader(nics), iv["net"])
+    mounts = sorted({m.split(":", 1)[1] for m in metrics if m.startswith("disk_usage:")})
+    if mounts:
+        names = tuple(f"disk_usage:{m}" for m in mounts)
+        sampler.add(names, metrics_sampler.make_disk_reader(mounts), iv["disk_usage"])
+    return sampler
+
+
+def grid_layout(n, size, cell_size, max_scale=1.0):
+    """
+    在 size 内排 n 个参考尺寸为 cell_size 的格子，选缩放最大的列数（同缩放时行数最少）。
+    返回 (列数, 缩放, 网格左上角)
+    """
+    width, height = size
+    cell_w, cell_h = cell_size
+    best_cols, best_scale = n, 0.0
+    for cols in range(n, 0, -1):
+        rows = -(-n // cols)
+        scale = min(width / (cols * cell_w), height / (rows * cell_h), max_scale)
+        if scale > best_scale:
+            best_cols, best_scale = cols, scale
+    rows = -(-n // best_cols)
+    origin = ((width - best_cols * cell_w * best_scale) / 2,
+              (height - rows * cell_h * best_scale) / 2)
+    return best_cols, best_scale, origin
+
+
+def grid_centers(styles, size, spacing, min_bottom=0):
+    """
+    计算每个仪表的圆心。格子参考尺寸由表盘、数值标签和历史面板的范围决定。
+    返回 (圆心数组 (n, 2), 缩放, ((格宽, 格高), 格子左边 x 列表, 格子上边 y 列表))
+    """
+    top = max(face_extent(s) for s in styles)
+    bottom = max(max(face_extent(s), s["value_offset"] + s["value_size"]) for s in styles)
+    bottom = max(bottom, min_bottom)
+    cell_w = max(s["diameter"] for s in styles) + spacing
+    cell_h = top + bottom
+    cols, scale, (ox, oy) = grid_layout(len(styles), size, (cell_w, cell_h))
+    rows, col = np.divmod(np.arange(len(styles)), cols)
+    centers = np.column_stack((ox + (col + 0.5) * cell_w * scale,
+                               oy + (rows * cell_h + top) * scale))
+    lefts = (ox + col * cell_w * scale).astype(int).tolist()
+    tops = (oy + rows * cell_h * scale).astype(int).tolist()
+    return centers, scale, ((cell_w, cell_h), lefts, tops)
+
+
+class NeedleAnimator:
+    """
+    新目标值到达时，把显示值用 ease-out 曲线从当前值过渡到目标值。
+    active 为 False 时显示值就是目标值，主循环可以进入空闲。
+    """
+    def __init__(self, n, duration):
+        self.duration = duration
+        self.shown = np.zeros(n)
+        self.origin = self.shown
+        self.targets = self.shown
+        self.t0 = 0.0
+        self.active = False
+        self.primed = False
+
+    def retarget(self, targets, now, snap=None):
+        """设置新目标；snap 为布尔数组时，这些仪表直接跳到目标值（变化太小不值得动画）"""
+        if not self.primed or self.duration <= 0:
+            # 第一次拿到数据时直接显示，不从 0 转过来
+            self.primed = True
+            self.shown = self.origin = self.targets = targets.copy()
+            self.active = False
+            return
+        origin = self.shown.copy()
+        if snap is not None:
+            origin[snap] = targets[snap]
+        self.origin, self.targets, self.t0 = origin, targets.copy(), now
+        self.active = bool(np.any(origin != self.targets))
+        if not self.active:
+            self.shown = self.targets.copy()
+
+    def step(self, now):
+        """返回 now 时刻的显示值"""
+        if self.active:
+            t = (now - self.t0) / self.duration
+            if t >= 1.0:
+                self.shown = self.targets.copy()
+                self.active = False
+            else:
+                ease = 1.0 - (1.0 - max(t, 0.0)) ** 3
+                self.shown = self.origin + (self.targets - self.origin) * ease
+        return self.shown
+
+
+class IdleWaiter:
+    """
+    空闲时让主循环睡眠：采样线程发布快照时立即唤醒，否则每 IDLE_POLL_MS 醒一次处理输入。
+    不用 pygame.event.wait(timeout)：SDL 在 KMSDRM、dummy 等驱动上用 1ms 轮询实现超时等待，
+    空闲时反而比 60fps 渲染更费 CPU。
+    """
+    def __init__(self, sampler):
+        self.wake = threading.Event()
+        sampler.on_publish = self.wake.set
+
+    def wait(self):
+        self.wake.wait(IDLE_POLL_MS / 1000)
+        self.wake.clear()
+
+
+class GaugeEngine:
+    def __init__(self, config, screen):
+        self.config = config
+        self.screen = screen
+        self.gauges = expand_gauges(config)
+        self.metrics = [g["metric"] for g in self.gauges]
+        n = len(self.gauges)
+        self.mins = np.array([g["min_value"] for g in self.gauges], dtype=np.float64)
+        spans = np.array([g["max_value"] - g["min_value"] for g in self.gauges], dtype=np.float64)
+        self.spans = np.where(spans == 0, 1.0, spans)
+        self.starts = np.array([g["style"]["needle_start"] for g in self.gauges], dtype=np.float64)
+        self.sweeps = np.array([g["style"]["sweep"] for g in self.gauges], dtype=np.float64)
+        self.prefixes = [f"{g['name']}: " for g in self.gauges]
+        self.targets = np.zeros(n)  # 最新样本值，数值标签显示它
+        self.values = np.zeros(n)   # 当前指针位置对应的值，动画期间在旧值和新值之间
+        self.stamp = None
+        self.animator = NeedleAnimator(n, config.get("animation_ms", ANIMATION_MS) / 1000)
+
+        self.spacing = config.get("spacing", 90)
+        self.panel_height = config.get("panel_height", 40)
+        self.panel_offset = config.get("panel_offset", 150)
+        self.panel_budget = config.get("panel_budget", 8)  # 每帧最多重画多少块历史面板
+        history_seconds = config.get("history_seconds", 0)
+        self.histories = [MetricHistory(history_seconds, 1.0) for _ in self.gauges] \
+            if history_seconds else None
+
+        self.face_cache = GaugeFaceCache()
+        self.presenter = DirtyRectPresenter(screen, self.draw_static, erase_prev=False)
+        self.size = None
+        self.layout(screen.get_size())
+
+    def layout(self, size):
+        """按屏幕尺寸重新排布，并让下一帧整屏重画"""
+        self.size = size
+        styles = [g["style"] for g in self.gauges]
+        min_bottom = self.panel_offset + self.panel_height + 10 if self.histories else 0
+        self.centers, scale, cell_rects = grid_centers(styles, size, self.spacing, min_bottom)
+        self.scale = scale
+        (cell_w, cell_h), lefts, tops = cell_rects
+        self.center_points = self.centers.astype(int).tolist()
+        self.cells = [pygame.Rect(x, y, int(cell_w * scale) + 1, int(cell_h * scale) + 1)
+                      for x, y in zip(lefts, tops)]
+        self.needle_lengths = np.array([s["diameter"] / 2 * s["needle_ratio"] for s in styles]) * scale
+        # 数值每变化 1，指针尖端移动多少像素；不到 1 像素的变化不做动画
+        self.tip_px = self.needle_lengths * np.radians(np.abs(self.sweeps)) / self.spans
+        self.needle_widths = [max(1, int(round(s["needle_width"] * scale))) for s in styles]
+        self.value_sizes = [max(8, int(round(s["value_size"] * scale))) for s in styles]
+        self.value_centers = [(x, int(y + s["value_offset"] * scale))
+                              for (x, y), s in zip(self.center_points, styles)]
+
+        if self.histories:
+            pw, ph = max(1, int(cell_w * scale - self.spacing * scale)), max(2, int(self.panel_height * scale))
+            self.panels = [SparklinePanel((pw, ph), g["min_value"], g["max_value"],
+                                          g["style"]["needle_color"]) for g in self.gauges]
+            self.panel_rects = [pygame.Rect(x - pw // 2, int(y + self.panel_offset * scale), pw, ph)
+                                for x, y in self.center_points]
+            self.pending_panels = deque()
+        # 指针扫过的圆可能碰到数值标签时，每次重画指针都要连标签一起重画
+        self.label_overlap = np.array([
+            cy + length + width >= vy - size
+            for (_, cy), length, width, (_, vy), size in zip(self.center_points, self.needle_lengths.tolist(),
+                                                            self.needle_widths, self.value_centers,
+                                                            self.value_sizes)])
+        self.reset_drawn()
+        self.presenter.invalidate()
+
+    def reset_drawn(self):
+        """整屏重画前调用：忘掉画过的指针和标签，下一帧全部重画"""
+        self.drawn_ends = np.full((len(self.gauges), 2), -1)
+        self.drawn_labels = np.full(len(self.gauges), np.nan)
+        self.dynamic_rects = [(None, None) for _ in self.gauges]
+
+    def draw_static(self, surface):
+        # 背景和所有表盘，只在首帧或布局变化时重画
+        surface.fill((0, 0, 0))
+        for g, center in zip(self.gauges, self.center_points):
+            self.face_cache.blit(surface, g["style"], g["min_value"], g["max_value"],
+                                 self.scale, center)
+
+    def idle(self):
+        """没有指针动画、整屏重画和待画的历史面板时返回 True，主循环可以阻塞等待"""
+        return not (self.animator.active or self.presenter.full
+                    or (self.histories and self.pending_panels))
+
+    def read(self, snapshot):
+        """快照更新时批量取出所有指标值，并把新样本写进历史"""
+        if snapshot.stamp == self.stamp:
+            return
+        self.stamp = snapshot.stamp
+        values = snapshot.values
+        self.targets = np.fromiter((values.get(m, 0.0) for m in self.metrics),
+                                   dtype=np.float64, count=len(self.metrics))
+        snap = np.abs(self.targets - self.animator.shown) * self.tip_px < 1.0
+        self.animator.retarget(self.targets, time.monotonic(), snap)
+        if self.histories:
+            pending = self.pending_panels
+            for i, (history, value) in enumerate(zip(self.histories, self.targets.tolist())):
+                if history.maybe_push(value) and i not in pending:
+                    pending.append(i)
+
+    def draw(self, snapshot):
+        if self.screen.get_size() != self.size:
+            self.layout(self.screen.get_size())
+        self.read(snapshot)
+        self.values = self.animator.step(time.monotonic())
+        presenter = self.presenter
+        screen = self.screen
+        if presenter.begin():
+            self.reset_drawn()
+            if self.histories:
+                self.pending_panels = deque(range(len(self.gauges)))
+
+        # 指针端点一次性向量化计算，只重画端点移动或数值变化的仪表
+        angles = np.radians((self.values - self.mins) / self.spans * self.sweeps + self.starts)
+        ends = self.centers + np.column_stack((np.cos(angles), np.sin(angles))) * self.needle_lengths[:, None]
+        ends = ends.astype(int)
+        relabel = self.targets != self.drawn_labels
+        changed = np.flatnonzero(np.any(ends != self.drawn_ends, axis=1) | relabel)
+        if len(changed):
+            labels = self.targets[changed].tolist()
+            redraw_labels = (relabel | self.label_overlap)[changed].tolist()
+            for i, end, value, redraw_label in zip(changed.tolist(), ends[changed].tolist(),
+                                                   labels, redraw_labels):
+                style = self.gauges[i]["style"]
+                screen.set_clip(self.cells[i])
+                needle_rect, label_rect = self.dynamic_rects[i]
+                if needle_rect:
+                    presenter.erase(needle_rect)
+                    presenter.mark(needle_rect)
+                if redraw_label and label_rect:
+                    presenter.erase(label_rect)
+                    presenter.mark(label_rect)
+                needle = pygame.draw.line(screen, style["needle_color"], self.center_points[i],
+                                          end, self.needle_widths[i])
+                presenter.mark(needle)
+                # 动画期间数值标签不变，只有指针可能扫到标签时才跟着重画
+                if redraw_label:
+                    label_rect = text_cache.draw_value(screen, self.prefixes[i], value, self.value_sizes[i],
+                                                       style["value_color"], center=self.value_centers[i])
+                    presenter.mark(label_rect)
+                self.dynamic_rects[i] = (needle.inflate(2, 2), label_rect)
+            screen.set_clip(None)
+            self.drawn_ends[changed] = ends[changed]
+            self.drawn_labels[changed] = self.targets[changed]
+
+        # 历史面板按预算分摊到多帧重画，避免同一秒所有面板挤在一帧
+        if self.histories:
+            for _ in range(min(self.panel_budget, len(self.pending_panels))):
+                i = self.pending_panels.popleft()
+                panel, _ = self.panels[i].render(self.histories[i])
+                screen.blit(panel, self.panel_rects[i])
+                presenter.mark(self.panel_rects[i])
+
+
+def run(config_path):
+    config = load_config(config_path)
+    if config.get("backend") == "gl":
+        import gl_dashboard
+        return gl_dashboard.run(config)
+    pygame.init()
+    # 设置屏幕为全屏模式
+    screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+    pygame.display.set_caption(config.get("title", "多个圆形仪表盘展示"))
+
+    engine = GaugeEngine(config, screen)
+    sampler = build_sampler(engine.gauges, config.get("intervals"))
+    waiter = IdleWaiter(sampler)
+    sampler.start()
+    sampler.ready.wait(1)
+    clock = pygame.time.Clock()
+    fps = config.get("fps", 60)
+
+    profiler = FrameProfiler()
+
+    # 主循环：有指针动画时按 fps 刷新，否则睡到下一个快照或输入事件
+    running = True
+    while running:
+        if engine.idle():
+            waiter.wait()
+        with profiler.stage("events"):
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_ESCAPE:
+                        running = False
+                if profiler.handle_event(event):
+                    # 浮层开关后整屏重画，擦掉旧浮层
+                    engine.presenter.invalidate()
+                engine.presenter.handle_event(event)
+
+        with profiler.stage("sample"):
+            engine.read(sampler.snapshot)
+        with profiler.stage("draw"):
+            engine.draw(sampler.snapshot)
+        hud = profiler.draw(screen)
+        if hud:
+            engine.presenter.mark(hud)
+        with profiler.stage("present"):
+            engine.presenter.present()
+        profiler.end_frame()
+        clock.tick(fps)
+
+    # 退出Pygame
+    sampler.stop()
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    run(sys.argv[1] if len(sys.argv) > 1 else os.path.join(DASHBOARDS_DIR, "home7.json"))
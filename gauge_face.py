@@ -0,0 +1,128 @@
+"""
+仪表盘静态表盘缓存
+外圈、刻度线和刻度标签只渲染一次到 Surface，
+主循环每帧只需 blit 表盘，再画指针和数值。
+刻度几何用 NumPy 一次算出，同样式、同尺寸的表盘共享同一张 Surface。
+"""
+import numpy as np
+import pygame
+import text_cache
+
+LABEL_MARGIN = 20  # 表盘 Surface 四周留白，容纳超出刻度的标签
+
+# 默认样式即 home7 的表盘，长度单位是直径 200 像素时的像素数
+DEFAULT_STYLE = {
+    "diameter": 200,
+    "color": (0, 255, 255),         # 青色
+    "ring_width": 2,
+    "tick_step": 30,                # 每隔多少度一个刻度
+    "tick_start": 135,              # 第一个刻度的角度
+    "tick_radius": 120,             # 刻度外端半径
+    "tick_length": 15,              # 刻度线长度，0 表示只画点
+    "tick_width": 2,
+    "labels": "rotated",            # rotated / upright / offset / none
+    "label_size": 18,
+    "label_color": (255, 255, 255),
+    "label_divisor": 10,            # 第 k 个刻度标签为 k * (max_value // label_divisor)
+    "label_offset": 30,             # offset 模式下标签距刻度外端的距离
+    "needle_color": (255, 165, 0),  # 橙色
+    "needle_width": 3,
+    "needle_ratio": 0.7,            # 指针长度 / 半径
+    "needle_start": -135,           # 最小值对应的指针角度
+    "sweep": 270,                   # 最小值到最大值指针转过的角度
+    "value_size": 24,
+    "value_color": (255, 255, 255),
+    "value_offset": 130,            # 数值标签中心在圆心下方的距离
+}
+
+
+def tick_geometry(style, scale=1.0, center=(0.0, 0.0)):
+    """返回 (刻度角度, 起点数组, 终点数组)，起止点形状为 (n, 2)"""
+    degrees = np.arange(0, 360, style["tick_step"], dtype=np.float64)
+    angles = degrees + style["tick_start"]
+    rad = np.radians(angles)
+    unit = np.column_stack((np.cos(rad), np.sin(rad)))
+    outer = style["tick_radius"] * scale
+    inner = outer - style["tick_length"] * scale
+    center = np.asarray(center, dtype=np.float64)
+    return angles, center + unit * inner, center + unit * outer
+
+
+def face_extent(style):
+    """表盘中心到表盘 Surface 边缘的距离（未缩放）"""
+    extent = max(style["diameter"] // 2, style["tick_radius"])
+    if style["labels"] == "offset":
+        extent += style["label_offset"]
+    return extent + LABEL_MARGIN
+
+
+def render_gauge_face(style, max_value, scale=1.0):
+    """把外圈、刻度和标签画到一张透明 Surface 上，圆心位于 Surface 中心"""
+    half = int(round(face_extent(style) * scale))
+    face = pygame.Surface((half * 2, half * 2), pygame.SRCALPHA)
+    center = (half, half)
+    color = style["color"]
+
+    # 外圈
+    if style["ring_width"]:
+        radius = int(round(style["diameter"] / 2 * scale))
+        pygame.draw.circle(face, color, center, radius, style["ring_width"])
+
+    # 刻度线
+    angles, starts, ends = tick_geometry(style, scale, center)
+    starts = starts.astype(int).tolist()
+    ends = ends.astype(int).tolist()
+    for start, end in zip(starts, ends):
+        pygame.draw.line(face, color, start, end, style["tick_width"])
+
+    # 刻度标签
+    mode = style["labels"]
+    if mode == "none":
+        return face
+    size = max(8, int(round(style["label_size"] * scale)))
+    step = max_value // style["label_divisor"]
+    rad = np.radians(angles)
+    offset = style["label_offset"] * scale
+    for k, (angle, end) in enumerate(zip(angles.tolist(), ends)):
+        label = str(int(k * step))
+        text = text_cache.render(label, size, style["label_color"])
+        if mode == "offset":
+            pos = (int(end[0] + offset * np.cos(rad[k])), int(end[1] + offset * np.sin(rad[k])))
+            face.blit(text, text.get_rect(center=pos))
+            continue
+        text_rect = text.get_rect(center=end)
+        if mode == "rotated":
+            # 旋转标签以匹配刻度方向
+            text = text_cache.render(label, size, style["label_color"], angle=-angle)
+        face.blit(text, text_rect)
+    return face
+
+
+def style_key(style):
+    return tuple(sorted(style.items()))
+
+
+class GaugeFaceCache:
+    """
+    按 (样式, 量程, 缩放) 缓存表盘 Surface，屏幕尺寸变化时整体失效
+    """
+    def __init__(self):
+        self.screen_size = None
+        self.faces = {}
+
+    def get(self, style, min_value, max_value, scale, screen_size):
+        if screen_size != self.screen_size:
+            self.faces.clear()
+            self.screen_size = screen_size
+        key = (style_key(style), min_value, max_value, scale)
+        face = self.faces.get(key)
+        if face is None:
+            face = render_gauge_face(style, max_value, scale)
+            face = face.convert_alpha() if pygame.display.get_surface() else face
+            self.faces[key] = face
+        return face
+
+    def blit(self, target, style, min_value, max_value, scale, center):
+        """把表盘贴到 target 上，使表盘圆心对齐 center"""
+        face = self.get(style, min_value, max_value, scale, target.get_size())
+        target.blit(face, face.get_rect(center=center))
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+moderngl 仪表盘后端
+所有仪表的外圈、刻度和指针在片元着色器里按距离场计算，一次实例化绘制画完，
+每个仪表的数值、量程和样式放在每实例缓冲里；文字来自有符号距离场(SDF)字形图集，
+所有文字也是一次实例化绘制。适合 4K 和几百个仪表，CPU 只负责写缓冲。
+配置里 "backend": "gl" 时由 gauge_engine.run 调用；历史曲线面板只在 pygame 后端提供。
+无显示器时可用 Mesa llvmpipe 离屏渲染:
+    python gl_dashboard.py dashboards/build_host.json --headless out.png
+"""
+import sys
+import time
+
+import moderngl
+import numpy as np
+import pygame
+
+import gauge_engine
+import text_cache
+from gauge_face import face_extent
+
+GLYPH_PX = 48   # 字形图集的光栅化字号
+CELL = 64       # 图集里每个字形格子的边长
+SPREAD = 8      # 距离场的最大距离(像素)
+ATLAS_CHARS = [chr(c) for c in range(32, 127)] + ["°"]
+
+GAUGE_VS = """
+#version 330
+uniform vec2 screen;
+in vec2 in_corner;
+in vec2 in_center;
+in float in_extent;
+in float in_radius;
+in float in_ring_width;
+in float in_value;
+in vec2 in_range;
+in vec4 in_needle;      // 起始角, 扫过角度, 长度, 宽度
+in vec4 in_ticks;       // 起始角, 间隔角, 外端半径, 长度
+in float in_tick_width;
+in vec3 in_color;
+in vec3 in_needle_color;
+out vec2 v_local;
+flat out float v_radius;
+flat out float v_ring_width;
+flat out vec2 v_needle_dir;
+flat out vec2 v_needle;
+flat out vec4 v_ticks;
+flat out float v_tick_width;
+flat out vec3 v_color;
+flat out vec3 v_needle_color;
+void main() {
+    v_local = in_corner * in_extent;
+    vec2 px = in_center + v_local;
+    gl_Position = vec4(px.x / screen.x * 2.0 - 1.0, 1.0 - px.y / screen.y * 2.0, 0.0, 1.0);
+    float span = in_range.y - in_range.x;
+    float frac = (in_value - in_range.x) / (span == 0.0 ? 1.0 : span);
+    float angle = radians(frac * in_needle.y + in_needle.x);
+    v_needle_dir = vec2(cos(angle), sin(angle));
+    v_needle = in_needle.zw;
+    v_radius = in_radius;
+    v_ring_width = in_ring_width;
+    v_ticks = in_ticks;
+    v_tick_width = in_tick_width;
+    v_color = in_color;
+    v_needle_color = in_needle_color;
+}
+"""
+
+GAUGE_FS = """
+#version 330
+in vec2 v_local;
+flat in float v_radius;
+flat in float v_ring_width;
+flat in vec2 v_needle_dir;
+flat in vec2 v_needle;
+flat in vec4 v_ticks;
+flat in float v_tick_width;
+flat in vec3 v_color;
+flat in vec3 v_needle_color;
+out vec4 f_color;
+
+float coverage(float sd) {
+    return clamp(0.5 - sd, 0.0, 1.0);
+}
+
+void main() {
+    float d = length(v_local);
+    // 外圈
+    float ring = v_ring_width > 0.0 ? coverage(abs(d - v_radius) - v_ring_width * 0.5) : 0.0;
+    // 刻度：到最近刻度方向的弧长 + 径向范围
+    float a = degrees(atan(v_local.y, v_local.x));
+    float rel = mod(a - v_ticks.x, v_ticks.y);
+    float arc = radians(min(rel, v_ticks.y - rel)) * d;
+    float len = max(v_ticks.w, v_tick_width);
+    float radial = max(v_ticks.z - len - d, d - v_ticks.z);
+    float tick = coverage(max(arc - v_tick_width * 0.5, radial));
+    // 指针：到线段的距离
+    float t = clamp(dot(v_local, v_needle_dir), 0.0, v_needle.x);
+    float needle = coverage(length(v_local - v_needle_dir * t) - v_needle.y * 0.5);
+
+    float face = max(ring, tick);
+    vec3 rgb = mix(v_color, v_needle_color, needle);
+    f_color = vec4(rgb, max(face, needle));
+}
+"""
+
+TEXT_VS = """
+#version 330
+uniform vec2 screen;
+in vec2 in_corner;
+in vec2 in_anchor;
+in vec2 in_offset;
+in vec2 in_size;
+in float in_angle;
+in vec4 in_uv;
+in vec3 in_color;
+out vec2 v_uv;
+flat out vec3 v_color;
+void main() {
+    vec2 local = in_offset + in_corner * in_size;
+    float c = cos(radians(in_angle));
+    float s = sin(radians(in_angle));
+    // 与 pygame.transform.rotate 相同：角度为正时逆时针（屏幕 y 轴向下）
+    vec2 px = in_anchor + vec2(c * local.x + s * local.y, -s * local.x + c * local.y);
+    gl_Position = vec4(px.x / screen.x * 2.0 - 1.0, 1.0 - px.y / screen.y * 2.0, 0.0, 1.0);
+    v_uv = mix(in_uv.xy, in_uv.zw, in_corner);
+    v_color = in_color;
+}
+"""
+
+TEXT_FS = """
+#version 330
+uniform sampler2D atlas;
+in vec2 v_uv;
+flat in vec3 v_color;
+out vec4 f_color;
+void main() {
+    float dist = texture(atlas, v_uv).r;
+    float w = max(fwidth(dist), 1e-4);
+    f_color = vec4(v_color, smoothstep(0.5 - w, 0.5 + w, dist));
+}
+"""
+
+GAUGE_FORMAT = "2f 1f 1f 1f 1f 2f 4f 4f 1f 3f 3f /i"
+GAUGE_ATTRS = ("in_center", "in_extent", "in_radius", "in_ring_width", "in_value", "in_range",
+               "in_needle", "in_ticks", "in_tick_width", "in_color", "in_needle_color")
+GAUGE_FLOATS = 23
+VALUE_COLUMN = 5
+
+TEXT_FORMAT = "2f 2f 2f 1f 4f 3f /i"
+TEXT_ATTRS = ("in_anchor", "in_offset", "in_size", "in_angle", "in_uv", "in_color")
+TEXT_FLOATS = 14
+
+
+def signed_distance(mask, spread):
+    """暴力计算二值图的有符号距离场（内部为正），只在启动时对每个字形算一次"""
+    h, w = mask.shape
+    padded = np.pad(mask, 1, mode="constant")
+    # 边界像素：自身在内部且四邻域有外部像素
+    neighbours_out = ~padded[:-2, 1:-1] | ~padded[2:, 1:-1] | ~padded[1:-1, :-2] | ~padded[1:-1, 2:]
+    edge = np.argwhere(mask & neighbours_out).astype(np.float32)
+    if len(edge) == 0:
+        return np.zeros((h, w), dtype=np.uint8)
+    coords = np.indices((h, w), dtype=np.float32).reshape(2, -1).T
+    dist = np.full(len(coords), np.inf, dtype=np.float32)
+    for chunk in np.array_split(edge, max(1, len(edge) // 256)):
+        diff = coords[:, None, :] - chunk[None, :, :]
+        dist = np.minimum(dist, np.sqrt((diff ** 2).sum(axis=2)).min(axis=1))
+    dist = dist.reshape(h, w)
+    signed = np.where(mask, dist, -dist)
+    return (np.clip(0.5 + signed / (2 * spread), 0.0, 1.0) * 255).astype(np.uint8)
+
+
+def build_glyph_atlas(chars=ATLAS_CHARS):
+    """
+    返回 (图集数组, 字形表)。字形表: 字符 -> (uv 四元组, 字宽)，长度单位为 GLYPH_PX 字号下的像素
+    """
+    font = text_cache.get_font(GLYPH_PX)
+    cols = 16
+    rows = -(-len(chars) // cols)
+    atlas = np.zeros((rows * CELL, cols * CELL), dtype=np.uint8)
+    glyphs = {}
+    inner = CELL - 2 * SPREAD
+    for i, ch in enumerate(chars):
+        surf = font.render(ch, True, (255, 255, 255))
+        alpha = pygame.surfarray.array_alpha(surf).T[:inner, :inner]
+        mask = np.zeros((CELL, CELL), dtype=bool)
+        mask[SPREAD:SPREAD + alpha.shape[0], SPREAD:SPREAD + alpha.shape[1]] = alpha > 127
+        r, c = divmod(i, cols)
+        atlas[r * CELL:(r + 1) * CELL, c * CELL:(c + 1) * CELL] = signed_distance(mask, SPREAD)
+        uv = (c * CELL / atlas.shape[1], r * CELL / atlas.shape[0],
+              (c + 1) * CELL / atlas.shape[1], (r + 1) * CELL / atlas.shape[0])
+        glyphs[ch] = (uv, font.size(ch)[0])
+    return atlas, glyphs, font.get_height()
+
+
+class GLDashboard:
+    def __init__(self, ctx, config, size):
+        self.ctx = ctx
+        self.config = config
+        self.gauges = gauge_engine.expand_gauges(config)
+        self.metrics = [g["metric"] for g in self.gauges]
+        self.spacing = config.get("spacing", 90)
+        self.stamp = None
+        self.animator = gauge_engine.NeedleAnimator(
+            len(self.gauges), config.get("animation_ms", gauge_engine.ANIMATION_MS) / 1000)
+
+        self.gauge_prog = ctx.program(vertex_shader=GAUGE_VS, fragment_shader=GAUGE_FS)
+        self.text_prog = ctx.program(vertex_shader=TEXT_VS, fragment_shader=TEXT_FS)
+        corners = np.array([0, 0, 1, 0, 0, 1, 1, 1], dtype="f4")
+        self.gauge_corners = ctx.buffer((corners * 2 - 1).tobytes())
+        self.text_corners = ctx.buffer(corners.tobytes())
+
+        atlas, self.glyphs, self.line_height = build_glyph_atlas()
+        self.atlas = ctx.texture((atlas.shape[1], atlas.shape[0]), 1, atlas.tobytes())
+        self.atlas.filter = (moderngl.LINEAR, moderngl.LINEAR)
+        self.text_prog["atlas"] = 0
+
+        self.gauge_buffer = ctx.buffer(reserve=max(1, len(self.gauges)) * GAUGE_FLOATS * 4, dynamic=True)
+        self.gauge_vao = ctx.vertex_array(self.gauge_prog, [
+            (self.gauge_corners, "2f", "in_corner"),
+            (self.gauge_buffer, GAUGE_FORMAT, *GAUGE_ATTRS)])
+        self.text_buffer = None
+        self.text_vao = None
+        self.text_count = 0
+        self.layout(size)
+
+    def layout(self, size):
+        """重算圆心、缩放，生成每实例仪表数据和静态刻度标签"""
+        self.size = size
+        styles = [g["style"] for g in self.gauges]
+        self.centers, scale, _ = gauge_engine.grid_centers(styles, size, self.spacing)
+        self.scale = scale
+        data = np.zeros((len(self.gauges), GAUGE_FLOATS), dtype="f4")
+        for i, (g, s) in enumerate(zip(self.gauges, styles)):
+            data[i] = (*self.centers[i], face_extent(s) * scale, s["diameter"] / 2 * scale,
+                       s["ring_width"] * scale if s["ring_width"] else 0.0, g["min_value"],
+                       g["min_value"], g["max_value"],
+                       s["needle_start"], s["sweep"], s["diameter"] / 2 * s["needle_ratio"] * scale,
+                       max(1.0, s["needle_width"] * scale),
+                       s["tick_start"], s["tick_step"], s["tick_radius"] * scale,
+                       s["tick_length"] * scale, max(1.0, s["tick_width"] * scale),
+                       *(np.array(s["color"]) / 255.0), *(np.array(s["needle_color"]) / 255.0))
+        self.gauge_data = data
+        self.gauge_prog["screen"] = size
+        self.text_prog["screen"] = size
+        self.static_text = self._tick_labels(styles, scale)
+        self.values = None
+        self.uploaded = None  # 上次写进每实例缓冲的指针值
+
+    def _text_rows(self, text, px, color, anchor, angle=0.0, align="center"):
+        """把一串文字排成 SDF 字形实例，anchor 为文字中心（align="left" 时为左边中点）"""
+        k = px / GLYPH_PX
+        glyphs = [self.glyphs.get(ch, self.glyphs["?"]) for ch in text]
+        width = sum(adv for _, adv in glyphs) * k
+        x = -width / 2 if align == "center" else 0.0
+        y = -self.line_height * k / 2
+        rgb = tuple(c / 255.0 for c in color)
+        rows = []
+        for uv, adv in glyphs:
+            rows.append((*anchor, x - SPREAD * k, y - SPREAD * k, CELL * k, CELL * k, angle, *uv, *rgb))
+            x += adv * k
+        return rows
+
+    def _tick_labels(self, styles, scale):
+        rows = []
+        for g, s, center in zip(self.gauges, styles, self.centers.tolist()):
+            mode = s["labels"]
+            if mode == "none":
+                continue
+            px = s["label_size"] * scale
+            step = g["max_value"] // s["label_divisor"]
+            angles = np.arange(0, 360, s["tick_step"]) + s["tick_start"]
+            radius = s["tick_radius"] * scale + (s["label_offset"] * scale if mode == "offset" else 0)
+            for k, angle in enumerate(angles.tolist()):
+                rad = np.radians(angle)
+                anchor = (center[0] + radius * np.cos(rad), center[1] + radius * np.sin(rad))
+                rows += self._text_rows(str(int(k * step)), px, s["label_color"], anchor,
+                                        -angle if mode == "rotated" else 0.0)
+        return rows
+
+    def _upload_text(self, rows):
+        data = np.array(rows, dtype="f4").reshape(-1, TEXT_FLOATS)
+        if self.text_buffer is None or self.text_buffer.size < data.nbytes:
+            if self.text_buffer is not None:
+                self.text_vao.release()
+                self.text_buffer.release()
+            self.text_buffer = self.ctx.buffer(reserve=max(data.nbytes, 4096) * 2, dynamic=True)
+            self.text_vao = self.ctx.vertex_array(self.text_prog, [
+                (self.text_corners, "2f", "in_corner"),
+                (self.text_buffer, TEXT_FORMAT, *TEXT_ATTRS)])
+        self.text_buffer.write(data.tobytes())
+        self.text_count = len(data)
+
+    def update(self, snapshot):
+        """快照变化时设置指针动画目标并重排数值标签"""
+        if snapshot.stamp == self.stamp and self.values is not None:
+            return
+        self.stamp = snapshot.stamp
+        values = snapshot.values
+        self.values = np.fromiter((values.get(m, 0.0) for m in self.metrics),
+                                  dtype=np.float64, count=len(self.metrics))
+        self.animator.retarget(self.values, time.monotonic())
+
+        rows = list(self.static_text)
+        for g, center, value in zip(self.gauges, self.centers.tolist(), self.values.tolist()):
+            s = g["style"]
+            rows += self._text_rows(f"{g['name']}: {value:.2f}", s["value_size"] * self.scale,
+                                    s["value_color"], (center[0], center[1] + s["value_offset"] * self.scale))
+        self._upload_text(rows)
+
+    def render(self, snapshot):
+        self.update(snapshot)
+        shown = self.animator.step(time.monotonic())
+        if shown is not self.uploaded:
+            self.gauge_data[:, VALUE_COLUMN] = shown
+            self.gauge_buffer.write(self.gauge_data.tobytes())
+            self.uploaded = shown
+        ctx = self.ctx
+        ctx.clear(0.0, 0.0, 0.0)
+        ctx.enable(moderngl.BLEND)
+        ctx.blend_func = moderngl.SRC_ALPHA, moderngl.ONE_MINUS_SRC_ALPHA
+        # 一次实例化绘制画完所有外圈、刻度和指针
+        self.gauge_vao.render(moderngl.TRIANGLE_STRIP, instances=len(self.gauges))
+        if self.text_count:
+            self.atlas.use(0)
+            self.text_vao.render(moderngl.TRIANGLE_STRIP, instances=self.text_count)
+
+
+def run(config):
+    pygame.init()
+    screen = pygame.display.set_mode((0, 0), pygame.OPENGL | pygame.DOUBLEBUF | pygame.FULLSCREEN)
+    pygame.display.set_caption(config.get("title", "多个圆形仪表盘展示"))
+    ctx = moderngl.create_context()
+    dashboard = GLDashboard(ctx, config, screen.get_size())
+    sampler = gauge_engine.build_sampler(dashboard.gauges, config.get("intervals"))
+    waiter = gauge_engine.IdleWaiter(sampler)
+    sampler.start()
+    sampler.ready.wait(1)
+    clock = pygame.time.Clock()
+    fps = config.get("fps", 60)
+
+    # 主循环：指针动画期间按 fps 刷新，快照没变时睡眠
+    running = True
+    while running:
+        idle = not dashboard.animator.active and sampler.snapshot.stamp == dashboard.stamp
+        if idle:
+            waiter.wait()
+        events = pygame.event.get()
+        for event in events:
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    running = False
+        if idle and not events and sampler.snapshot.stamp == dashboard.stamp:
+            continue  # 只是等待超时醒来：没有新快照也没有事件，不重画、不 flip
+        dashboard.render(sampler.snapshot)
+        pygame.display.flip()
+        clock.tick(fps)
+
+    sampler.stop()
+    pygame.quit()
+
+
+def render_headless(config, path, size=(1920, 1080)):
+    """用 EGL 离屏上下文（如 llvmpipe）渲染一帧并保存为图片"""
+    pygame.font.init()
+    ctx = moderngl.create_standalone_context(backend="egl")
+    fbo = ctx.simple_framebuffer(size)
+    fbo.use()
+    dashboard = GLDashboard(ctx, config, size)
+    sampler = gauge_engine.build_sampler(dashboard.gauges, config.get("intervals")).start()
+    sampler.ready.wait(1)
+    dashboard.render(sampler.snapshot)
+    sampler.stop()
+    image = pygame.image.frombuffer(fbo.read(components=3), size, "RGB")
+    pygame.image.save(pygame.transform.flip(image, False, True), path)
+
+
+if __name__ == "__main__":
+    config = gauge_engine.load_config(sys.argv[1])
+    if "--headless" in sys.argv:
+        render_headless(config, sys.argv[sys.argv.index("--headless") + 1])
+    else:
+        run(config)
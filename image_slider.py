@@ -26,6 +26,9 @@ current_image_index = 0
 # 图片滚动速度
 scroll_speed = 10
 
+clock = pygame.time.Clock()
+loaded_index = None
+
 # 主循环
 running = True
 while running:
@@ -39,13 +42,15 @@ while running:
             elif event.button == 3:  # 右键
                 current_image_index = (current_image_index - 1) % len(images)
 
-    # 加载当前图片并调整大小
-    try:
-        image = pygame.image.load(images[current_image_index])
-        image = pygame.transform.scale(image, (screen_width, screen_height))
-    except Exception as e:
-        print(f"Error loading image: {e}")
-        running = False
+    # 切换图片时才加载并调整大小
+    if current_image_index != loaded_index:
+        try:
+            image = pygame.image.load(images[current_image_index])
+            image = pygame.transform.scale(image, (screen_width, screen_height)).convert()
+            loaded_index = current_image_index
+        except Exception as e:
+            print(f"Error loading image: {e}")
+            running = False
 
     # 绘制图片
     screen.blit(image, (0, 0))
@@ -54,7 +59,7 @@ while running:
     pygame.display.flip()
 
     # 控制帧率
-    pygame.time.Clock().tick(60)
+    clock.tick(60)
 
 # 退出Pygame
 pygame.quit()
@@ -0,0 +1,102 @@
+"""
+指标历史：NumPy 环形缓冲 + 迷你折线/最大最小值带面板
+每个指标按固定周期（默认 1Hz）记录，默认保留 10 分钟。
+面板按像素列对历史做向量化降采样，一次 draw.polygon 画最大最小值带，
+一次 draw.lines 画均值折线；只有新样本进来时才重画面板 Surface。
+"""
+import time
+import numpy as np
+import pygame
+
+
+class MetricHistory:
+    """固定容量的环形缓冲，version 每次写入加一，供面板判断是否需要重画"""
+    def __init__(self, capacity=600, period=1.0):
+        self.data = np.zeros(capacity, dtype=np.float32)
+        self.capacity = capacity
+        self.period = period
+        self.index = 0       # 下一次写入的位置
+        self.count = 0
+        self.version = 0
+        self.last_push = None
+
+    def push(self, value):
+        self.data[self.index] = value
+        self.index = (self.index + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self.version += 1
+
+    def maybe_push(self, value, now=None):
+        """距上次记录满一个周期才写入，返回是否写入"""
+        now = time.monotonic() if now is None else now
+        if self.last_push is not None and now - self.last_push < self.period:
+            return False
+        self.last_push = now
+        self.push(value)
+        return True
+
+    def values(self):
+        """按时间顺序返回有效样本（最旧的在前）"""
+        if self.count < self.capacity:
+            return self.data[:self.count]
+        return np.concatenate((self.data[self.index:], self.data[:self.index]))
+
+
+def draw_sparkline(surface, rect, values, min_value, max_value,
+                   line_color=(255, 165, 0), band_color=(0, 90, 90)):
+    """在 rect 内画历史曲线；样本多于像素列时按列取最小/最大/均值"""
+    n = len(values)
+    if n < 2:
+        return
+    rect = pygame.Rect(rect)
+    w = rect.width
+    span = float(max_value - min_value) or 1.0
+
+    if n > w:
+        edges = np.linspace(0, n, w + 1).astype(np.intp)[:-1]
+        counts = np.diff(np.append(edges, n))
+        lows = np.minimum.reduceat(values, edges)
+        highs = np.maximum.reduceat(values, edges)
+        means = np.add.reduceat(values, edges) / counts
+        xs = rect.x + np.arange(w)
+    else:
+        lows = highs = means = values
+        xs = rect.x + np.linspace(0, w - 1, n)
+
+    def to_y(v):
+        v = np.clip((v - min_value) / span, 0.0, 1.0)
+        return rect.bottom - 1 - v * (rect.height - 1)
+
+    if highs is not lows:
+        top = np.column_stack((xs, to_y(highs)))
+        bottom = np.column_stack((xs[::-1], to_y(lows)[::-1]))
+        pygame.draw.polygon(surface, band_color, np.concatenate((top, bottom)).tolist())
+    line = np.column_stack((xs, to_y(means)))
+    pygame.draw.lines(surface, line_color, False, line.tolist(), 1)
+
+
+class SparklinePanel:
+    """
+    缓存一块面板 Surface，history.version 变化时才重画
+    """
+    def __init__(self, size, min_value, max_value, line_color=(255, 165, 0),
+                 band_color=(0, 90, 90), frame_color=(40, 40, 40)):
+        self.surface = pygame.Surface(size)
+        self.min_value = min_value
+        self.max_value = max_value
+        self.line_color = line_color
+        self.band_color = band_color
+        self.frame_color = frame_color
+        self.version = None
+
+    def render(self, history):
+        """返回 (surface, 是否重画过)"""
+        if history.version == self.version:
+            return self.surface, False
+        self.version = history.version
+        self.surface.fill((0, 0, 0))
+        rect = self.surface.get_rect()
+        pygame.draw.rect(self.surface, self.frame_color, rect, 1)
+        draw_sparkline(self.surface, rect.inflate(-2, -2), history.values(),
+                       self.min_value, self.max_value, self.line_color, self.band_color)
+        return self.surface, True
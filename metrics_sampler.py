@@ -0,0 +1,175 @@
+"""
+后台系统指标采样器
+在独立线程里按各自的间隔采样（如温度 1Hz、CPU 4Hz），
+每次采样后发布一个不可变快照，渲染循环直接读取 sampler.snapshot，无需加锁。
+快照里同时带有每个指标最近一次采样的耗时，便于发现卡住的 sysfs 读取。
+"""
+import heapq
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+import psutil
+
+# values: 指标名 -> 数值；costs: 指标名 -> 最近一次采样耗时(秒)
+# max_costs: 指标名 -> 历史最大耗时(秒)；errors: 指标名 -> 失败次数；stamp: 发布时间
+Snapshot = namedtuple("Snapshot", "values costs max_costs errors stamp")
+
+EMPTY = MappingProxyType({})
+
+
+# 获取系统信息的函数
+def get_cpu_temperature():
+    with open("/sys/class/thermal/thermal_zone0/temp", "r") as f:
+        temp = int(f.read()) / 1000.0
+    return temp
+
+def get_network_speed():
+    net_io = psutil.net_io_counters()
+    return net_io.bytes_sent / 1024 / 1024, net_io.bytes_recv / 1024 / 1024
+
+def get_disk_usage():
+    disk = psutil.disk_usage('/')
+    return disk.percent
+
+def get_memory_usage():
+    memory = psutil.virtual_memory()
+    return memory.percent
+
+def get_cpu_usage():
+    return psutil.cpu_percent()
+
+def get_cpu_core_usage():
+    return psutil.cpu_percent(percpu=True)
+
+def make_nic_reader(nics):
+    """按网卡读取收发总量(MB)，返回 [nic0_sent, nic0_recv, nic1_sent, ...]"""
+    def read():
+        counters = psutil.net_io_counters(pernic=True)
+        out = []
+        for nic in nics:
+            c = counters.get(nic)
+            if c is None:
+                out += [0.0, 0.0]
+            else:
+                out += [c.bytes_sent / 1024 / 1024, c.bytes_recv / 1024 / 1024]
+        return out
+    return read
+
+def make_disk_reader(mounts):
+    """按挂载点读取磁盘使用率(%)"""
+    def read():
+        return [psutil.disk_usage(m).percent for m in mounts]
+    return read
+
+
+class MetricsSampler:
+    """
+    一个后台线程调度所有指标源。
+    add(names, func, interval)：names 为单个名字或名字元组，
+    元组时 func 需返回同样长度的序列（如 get_network_speed）
+    on_publish：可选回调，每次发布新快照后在采样线程里调用（如唤醒空闲的主循环）
+    """
+    def __init__(self):
+        self.sources = []
+        self.on_publish = None
+        self.snapshot = Snapshot(EMPTY, EMPTY, EMPTY, EMPTY, 0.0)
+        self.ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._values = {}
+        self._costs = {}
+        self._max_costs = {}
+        self._errors = {}
+
+    def add(self, names, func, interval=1.0, initial=0.0):
+        single = isinstance(names, str)
+        names = (names,) if single else tuple(names)
+        for name in names:
+            self._values[name] = initial
+            self._costs[name] = 0.0
+            self._max_costs[name] = 0.0
+            self._errors[name] = 0
+        # 单个名字时把返回值包成一元组，和多名字的源统一处理
+        if single:
+            read = func
+            func = lambda: (read(),)
+        self.sources.append((names, func, interval))
+        return self
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=1)
+
+    def _sample(self, names, func):
+        t0 = time.perf_counter()
+        try:
+            result = func()
+        except Exception:
+            # 读取失败时保留上一次的数值，只记录错误次数
+            for name in names:
+                self._errors[name] += 1
+            result = None
+        cost = time.perf_counter() - t0
+        if result is not None:
+            for name, value in zip(names, result):
+                self._values[name] = value
+        for name in names:
+            self._costs[name] = cost
+            self._max_costs[name] = max(self._max_costs[name], cost)
+
+    def _publish(self):
+        # 每次发布全新的只读字典，渲染线程拿到的引用永远不会被修改
+        self.snapshot = Snapshot(MappingProxyType(dict(self._values)),
+                                 MappingProxyType(dict(self._costs)),
+                                 MappingProxyType(dict(self._max_costs)),
+                                 MappingProxyType(dict(self._errors)),
+                                 time.monotonic())
+        if self.on_publish is not None:
+            self.on_publish()
+
+    def _run(self):
+        now = time.monotonic()
+        schedule = []
+        for idx, (names, func, interval) in enumerate(self.sources):
+            self._sample(names, func)
+            heapq.heappush(schedule, (now + interval, idx))
+        self._publish()
+        self.ready.set()
+
+        while schedule and not self._stop.is_set():
+            due, idx = schedule[0]
+            delay = due - time.monotonic()
+            if delay > 0:
+                if self._stop.wait(delay):
+                    break
+                continue
+            # 同一时刻到期的指标一起采样，只发布一次快照
+            now = time.monotonic()
+            while schedule and schedule[0][0] <= now:
+                due, idx = heapq.heappop(schedule)
+                names, func, interval = self.sources[idx]
+                self._sample(names, func)
+                # 采样变慢时不追赶积压的周期，直接从当前时间重新排期
+                heapq.heappush(schedule, (max(due + interval, now), idx))
+            self._publish()
+
+
+def default_sampler(temp_interval=1.0, cpu_interval=0.25, net_interval=1.0,
+                    memory_interval=1.0, disk_interval=5.0):
+    """仪表盘常用指标的采样器：温度 1Hz、CPU 4Hz，其余默认 1Hz"""
+    sampler = MetricsSampler()
+    sampler.add("cpu_temp", get_cpu_temperature, temp_interval)
+    sampler.add(("net_sent", "net_recv"), get_network_speed, net_interval)
+    sampler.add("memory_usage", get_memory_usage, memory_interval)
+    sampler.add("disk_usage", get_disk_usage, disk_interval)
+    sampler.add("cpu_usage", get_cpu_usage, cpu_interval)
+    return sampler
@@ -0,0 +1,156 @@
+"""
+视频开头帧预热缓存
+后台线程依次为菜单里的视频做探测、选解码后端，并预先解码开头几帧放进按字节数限额的 LRU 缓存。
+点击播放时缓存里的帧立刻送进帧缓冲池显示，真正的解码器同时启动，跳过这几帧后接着往下播，
+点击到第一帧不用再等 ffmpeg 启动、探测和解出第一个 GOP。
+没预热过的视频由 TapWarmer 在手指按下时开始同样的工作，松手时已经做了一部分；按下后拖动就取消。
+"""
+import queue
+import subprocess
+import sys
+import threading
+from collections import OrderedDict, namedtuple
+
+PREWARM_FRAMES = 8           # 30fps 下约 0.27 秒，足够 ffmpeg 启动并追上
+CACHE_BYTES = 64 << 20       # 720p NV12 每条约 11MB
+
+Entry = namedtuple("Entry", "info backend frames")
+
+
+class FirstFrameCache:
+    """路径 → Entry 的 LRU 缓存，总帧字节数超过 budget 时淘汰最久没用的"""
+    def __init__(self, budget=CACHE_BYTES):
+        self.budget = budget
+        self.entries = OrderedDict()
+        self.used = 0
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None:
+                self.entries.move_to_end(path)
+            return entry
+
+    def put(self, path, entry):
+        size = sum(len(f) for f in entry.frames)
+        with self.lock:
+            old = self.entries.pop(path, None)
+            if old is not None:
+                self.used -= sum(len(f) for f in old.frames)
+            self.entries[path] = entry
+            self.used += size
+            while self.used > self.budget and len(self.entries) > 1:
+                _, evicted = self.entries.popitem(last=False)
+                self.used -= sum(len(f) for f in evicted.frames)
+
+    def full(self):
+        with self.lock:
+            return self.used >= self.budget
+
+
+def read_frames(cmd, frame_size, count, cancel=None):
+    """运行 ffmpeg 命令读出最多 count 帧，返回 bytes 列表（片子比 count 短时更少）；cancel 置位后提前停下"""
+    pipe = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    frames = []
+    try:
+        for _ in range(count):
+            if cancel is not None and cancel.is_set():
+                break
+            frame = pipe.stdout.read(frame_size)
+            if len(frame) < frame_size:
+                break
+            frames.append(frame)
+    finally:
+        pipe.kill()
+        pipe.wait()
+    return frames
+
+
+class Prewarmer:
+    """
+    后台线程预热：load(path) 返回 Entry（探测、选后端、解开头几帧都在里面做）。
+    启动时按菜单顺序预热，缓存满了就不再预热，不让后面的视频把前面的挤掉；
+    request(path) 是播放过的视频，总会放进缓存，由 LRU 淘汰最久没播的。
+    """
+    def __init__(self, paths, load, cache):
+        self.load = load
+        self.cache = cache
+        self.queue = queue.Queue()
+        for path in paths:
+            self.queue.put((path, True))
+        self.thread = threading.Thread(target=self._run, name="prewarm", daemon=True)
+        self.thread.start()
+
+    def request(self, path):
+        self.queue.put((path, False))
+
+    def _run(self):
+        while True:
+            path, speculative = self.queue.get()
+            if path is None:
+                return
+            if speculative and self.cache.full():
+                continue
+            if self.cache.get(path) is not None:
+                continue
+            try:
+                entry = self.load(path)
+            except Exception as e:  # 坏文件、探测失败都只跳过这一个，线程还要接着预热后面的
+                print(f"预热 {path} 失败：{e}", file=sys.stderr)
+                continue
+            if entry.frames:
+                self.cache.put(path, entry)
+
+    def stop(self):
+        self.queue.put((None, False))
+
+
+class TapWarmer:
+    """
+    按下即预热：手指按在某个视频按钮上时 press(path) 在后台线程里调用 load(path, cancel)，
+    和点击后播放器自己要做的探测、选后端、解开头几帧是同一件事，松手前的时间不再浪费。
+    按下后变成拖动（或松开在别处）时 cancel()；松手成点击时 take(path) 等后台做完并取走 Entry。
+    """
+    def __init__(self, load, cache=None):
+        self.load = load
+        self.cache = cache   # 预热缓存里已经有的不再重复做
+        self.path = None
+        self.entry = None
+        self.cancelled = None
+        self.thread = None
+
+    def press(self, path):
+        self.cancel()
+        if self.cache is not None and self.cache.get(path) is not None:
+            return
+        self.path, self.entry = path, None
+        self.cancelled = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(path, self.cancelled),
+                                       name="tap-warm", daemon=True)
+        self.thread.start()
+
+    def _run(self, path, cancelled):
+        try:
+            entry = self.load(path, cancelled)
+        except Exception as e:  # 预热失败就当没预热，点击后播放器自己再试一次
+            if not cancelled.is_set():
+                print(f"预热 {path} 失败：{e}", file=sys.stderr)
+            return
+        if not cancelled.is_set():
+            self.entry = entry
+
+    def cancel(self):
+        if self.cancelled is not None:
+            self.cancelled.set()   # 读开头帧的 ffmpeg 在下一帧前被杀掉
+        self.path = self.entry = self.cancelled = self.thread = None
+
+    def take(self, path):
+        """点击了 path：等按下时开始的预热做完，返回 Entry；没有对应的预热（或失败）时返回 None"""
+        if path != self.path:
+            self.cancel()
+            return None
+        self.thread.join()
+        entry = self.entry
+        self.path = self.entry = self.cancelled = self.thread = None
+        return entry
@@ -0,0 +1,315 @@
+"""
+关键帧索引、拖动预览和进度条
+- KeyframeIndex：每个视频的关键帧时间表，用 ffprobe 读包标志，没有 ffprobe 时直接解析 MP4 的样本表
+  （stss/stts/ctts/elst），按 路径 + 修改时间 + 大小 缓存到磁盘；跳转时从最近的关键帧重启解码器
+- PreviewStrip：拖动进度条时用一个只解关键帧（-skip_frame nokey）的 ffmpeg 在后台把各关键帧解成小图，
+  手指移动时直接显示离手指位置最近的已解出的小图，不用等解码
+- Timeline：屏幕底部的进度条，负责命中测试、x 坐标和时间互换，以及画到 Surface / OpenGL 上
+"""
+import bisect
+import hashlib
+import json
+import os
+import shutil
+import struct
+import subprocess
+import threading
+
+import numpy as np
+import pygame
+
+INDEX_DIR = os.environ.get("KEYFRAME_DIR", os.path.expanduser("~/.cache/screentest/keyframes"))
+CHAPTERS = 10            # 左右键按时长 1/10 跳转
+PREVIEW_WIDTH = 256
+PREVIEW_LIMIT = 400      # 最多缓存这么多张预览小图，关键帧更多时均匀抽取
+BAR_HEIGHT = 64
+BAR_SECONDS = 3          # 跳转后进度条再显示几秒
+
+
+# ------------------ 关键帧索引 ------------------
+class KeyframeIndex:
+    def __init__(self, times, duration):
+        self.times = sorted(times) or [0.0]
+        self.duration = duration or self.times[-1]
+        # 章节：把时长等分，每段起点取它之前最近的关键帧
+        step = self.duration / CHAPTERS
+        self.chapters = sorted({self.before(i * step) for i in range(CHAPTERS)})
+
+    def position(self, t):
+        """t 之前（含）最近的关键帧序号"""
+        return max(0, bisect.bisect_right(self.times, t) - 1)
+
+    def before(self, t):
+        """t 之前（含）最近的关键帧时间，从这里重启解码器不用先解码前面的帧"""
+        return self.times[self.position(t)]
+
+    def chapter(self, t, step):
+        """从 t 往后（step=1）或往前（step=-1）的下一个章节起点"""
+        if step > 0:
+            later = [c for c in self.chapters if c > t + 0.05]
+            return later[0] if later else None
+        # 往前：离当前位置太近（刚跳过来）时再往前一个
+        earlier = [c for c in self.chapters if c < t - 1.0]
+        return earlier[-1] if earlier else 0.0
+
+
+def _probe_keyframes(path):
+    out = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "v:0",
+         "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", path],
+        capture_output=True, text=True, timeout=60).stdout
+    times = []
+    for line in out.splitlines():
+        pts, _, flags = line.partition(",")
+        if "K" in flags and pts not in ("", "N/A"):
+            times.append(float(pts))
+    return times
+
+
+def _boxes(f, start, end):
+    """遍历 [start, end) 内的 MP4 box，产出 (类型, 内容起点, 结束位置)"""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        size, kind = struct.unpack(">I4s", f.read(8))
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield kind, pos + header, pos + size
+        pos += size
+
+
+def _child(f, start, end, *path):
+    for kind, body, stop in _boxes(f, start, end):
+        if kind == path[0]:
+            return (body, stop) if len(path) == 1 else _child(f, body, stop, *path[1:])
+    return None
+
+
+def _table(f, box, fmt):
+    """读 full box 里 entry_count 个 fmt 结构，返回二维数组"""
+    f.seek(box[0] + 4)
+    count = struct.unpack(">I", f.read(4))[0]
+    size = struct.calcsize(fmt)
+    data = f.read(count * size)
+    return np.array(list(struct.iter_unpack(fmt, data)), dtype=np.int64).reshape(count, -1)
+
+
+def _mp4_keyframes(path):
+    """解析 MP4 视频轨的样本表，返回 (关键帧显示时间列表, 时长)；不是 MP4 或没有视频轨时返回 None"""
+    with open(path, "rb") as f:
+        end = os.fstat(f.fileno()).st_size
+        moov = _child(f, 0, end, b"moov")
+        if moov is None:
+            return None
+        for kind, body, stop in _boxes(f, *moov):
+            if kind != b"trak":
+                continue
+            hdlr = _child(f, body, stop, b"mdia", b"hdlr")
+            f.seek(hdlr[0] + 8)
+            if f.read(4) != b"vide":
+                continue
+            mdhd = _child(f, body, stop, b"mdia", b"mdhd")
+            f.seek(mdhd[0])
+            if f.read(1)[0] == 1:
+                f.seek(mdhd[0] + 20)
+                timescale, duration = struct.unpack(">IQ", f.read(12))
+            else:
+                f.seek(mdhd[0] + 12)
+                timescale, duration = struct.unpack(">II", f.read(8))
+            stbl = _child(f, body, stop, b"mdia", b"minf", b"stbl")
+            stts = _table(f, _child(f, *stbl, b"stts"), ">II")
+            # 每个样本的解码时间
+            deltas = np.repeat(stts[:, 1], stts[:, 0])
+            dts = np.concatenate(([0], np.cumsum(deltas)[:-1]))
+            pts = dts.copy()
+            ctts_box = _child(f, *stbl, b"ctts")
+            if ctts_box is not None:
+                # 版本 0 的偏移按规范是无符号的，实际编码器都不会超过 2^31，统一按有符号读
+                ctts = _table(f, ctts_box, ">Ii")
+                pts += np.repeat(ctts[:, 1], ctts[:, 0])[:len(pts)]
+            # 编辑列表：第一段非空编辑的 media_time 是显示时间 0 对应的媒体时间
+            elst_box = _child(f, body, stop, b"edts", b"elst")
+            if elst_box is not None:
+                f.seek(elst_box[0])
+                fmt = ">Qqi" if f.read(1)[0] == 1 else ">Iii"
+                elst = _table(f, elst_box, fmt)
+                media_times = [m for m in elst[:, 1] if m >= 0]
+                if media_times:
+                    pts -= media_times[0]
+            stss_box = _child(f, *stbl, b"stss")
+            if stss_box is None:
+                keys = np.arange(len(pts))  # 没有 stss：每个样本都是关键帧
+            else:
+                stss = _table(f, stss_box, ">I")
+                keys = stss[:, 0] - 1
+            return (pts[keys] / timescale).tolist(), duration / timescale
+    return None
+
+
+def _cache_file(path):
+    st = os.stat(path)
+    key = f"{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}"
+    return os.path.join(INDEX_DIR, hashlib.sha1(key.encode()).hexdigest() + ".json")
+
+
+def load_index(path, duration=None):
+    """返回 path 的 KeyframeIndex；磁盘上有未过期的缓存就直接读，否则建索引并写缓存"""
+    cache = _cache_file(path)
+    try:
+        with open(cache) as f:
+            data = json.load(f)
+        return KeyframeIndex(data["times"], data["duration"])
+    except (OSError, ValueError, KeyError):
+        pass
+    times = None
+    try:
+        if shutil.which("ffprobe"):
+            times = _probe_keyframes(path)
+        if not times:
+            parsed = _mp4_keyframes(path)
+            if parsed:
+                times, duration = parsed[0], duration or parsed[1]
+    except (OSError, struct.error, ValueError, TypeError, subprocess.SubprocessError):
+        times = None
+    if not times:
+        return KeyframeIndex([0.0], duration)  # 不缓存，下次再试
+    times = [max(0.0, round(t, 4)) for t in times]
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    tmp = cache + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"times": times, "duration": duration}, f)
+    os.replace(tmp, cache)
+    return KeyframeIndex(times, duration)
+
+
+# ------------------ 拖动预览 ------------------
+def preview_size(width, height):
+    """预览小图尺寸：宽 PREVIEW_WIDTH，高按宽高比取偶数"""
+    return PREVIEW_WIDTH, max(2, round(PREVIEW_WIDTH * height / width / 2) * 2)
+
+
+class PreviewStrip:
+    """
+    后台只解关键帧，按关键帧序号存小图（NV12 或 RGB24 字节）。
+    ffmpeg 的输出顺序就是关键帧顺序，第 i 张对应 index.times[i]。
+    """
+    def __init__(self, path, index, size, pix_fmt="nv12"):
+        self.path, self.index, self.size = path, index, size
+        self.pix_fmt = pix_fmt
+        pixels = size[0] * size[1]
+        self.frame_size = pixels * 3 if pix_fmt == "rgb24" else pixels * 3 // 2
+        # 关键帧太多时每 stride 张存一张
+        self.stride = -(-len(index.times) // PREVIEW_LIMIT)
+        self.frames = {}
+        self.pipe = None
+        self.thread = None
+        self.halt = threading.Event()
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self._run, name="preview", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        w, h = self.size
+        self.pipe = subprocess.Popen(
+            ["ffmpeg", "-loglevel", "error", "-skip_frame", "nokey", "-i", self.path,
+             "-vsync", "passthrough", "-s", f"{w}x{h}", "-f", "rawvideo", "-pix_fmt", self.pix_fmt, "-"],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        # close() 可能在 Popen 返回前就来了，那时它还看不到 pipe，只能由这里杀掉
+        pipe = self.pipe
+        try:
+            i = 0
+            while not self.halt.is_set():
+                frame = pipe.stdout.read(self.frame_size)
+                if len(frame) < self.frame_size or self.halt.is_set():
+                    break
+                if i % self.stride == 0:
+                    self.frames[i] = frame
+                i += 1
+        finally:
+            pipe.kill()
+            pipe.stdout.close()
+            pipe.wait()
+
+    def nearest(self, t):
+        """离 t 最近的、已经解出来的关键帧小图，没有时返回 None"""
+        target = self.index.position(t)
+        target -= target % self.stride
+        for i in range(target, -1, -self.stride):
+            frame = self.frames.get(i)
+            if frame is not None:
+                return frame
+        return None
+
+    def close(self):
+        """停掉 ffmpeg 并等读线程退出，之后不会再有小图写进来"""
+        self.halt.set()
+        if self.pipe is not None:
+            self.pipe.kill()
+        if self.thread is not None:
+            self.thread.join(timeout=1)
+        self.frames = {}
+
+
+# ------------------ 进度条 ------------------
+def on_bar(pos, screen_size):
+    """pos 是否落在屏幕底部的进度条上（进度条没显示时也算，按住底部就能拖动）"""
+    return pos[1] >= screen_size[1] - BAR_HEIGHT
+
+
+class Timeline:
+    """屏幕底部 BAR_HEIGHT 高的进度条，负责 x 坐标和时间互换以及绘制"""
+    def __init__(self, screen_size, duration):
+        self.width, self.height = screen_size
+        self.duration = max(duration or 0.0, 0.001)
+        self.rect = pygame.Rect(0, self.height - BAR_HEIGHT, self.width, BAR_HEIGHT)
+        self.track = self.rect.inflate(-40, -BAR_HEIGHT + 8)
+        self.surface = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        self.drawn = None  # 上次画的 (进度像素, 章节)，不变时不重画
+
+    def time_at(self, x):
+        ratio = (x - self.track.left) / self.track.width
+        return min(max(ratio, 0.0), 1.0) * self.duration
+
+    def _render(self, t, chapters):
+        x = int(self.track.width * min(max(t / self.duration, 0.0), 1.0))
+        if self.drawn == (x, chapters):
+            return self.surface
+        self.drawn = (x, chapters)
+        s = self.surface
+        s.fill((0, 0, 0, 160))
+        track = self.track.move(0, -self.rect.top)
+        pygame.draw.rect(s, (90, 90, 90, 255), track, border_radius=4)
+        pygame.draw.rect(s, (0, 150, 255, 255), (track.left, track.top, x, track.height), border_radius=4)
+        for c in chapters:
+            cx = track.left + int(track.width * c / self.duration)
+            pygame.draw.line(s, (230, 230, 230, 255), (cx, track.top - 6), (cx, track.bottom + 5))
+        pygame.draw.circle(s, (255, 255, 255, 255), (track.left + x, track.centery), 12)
+        return s
+
+    def draw(self, surface, t, chapters=()):
+        """软件渲染：画到 surface 底部，返回更新区域"""
+        surface.blit(self._render(t, tuple(chapters)), self.rect)
+        return self.rect
+
+    def draw_gl(self, t, chapters=()):
+        """OpenGL 显示上用 glDrawPixels 叠加（和 FrameProfiler.draw_gl 一样）"""
+        from OpenGL import GL
+        bar = self._render(t, tuple(chapters))
+        data = pygame.image.tobytes(bar, "RGBA", True)
+        program = GL.glGetIntegerv(GL.GL_CURRENT_PROGRAM)
+        GL.glUseProgram(0)
+        GL.glEnable(GL.GL_BLEND)
+        GL.glBlendFunc(GL.GL_SRC_ALPHA, GL.GL_ONE_MINUS_SRC_ALPHA)
+        GL.glWindowPos2i(0, 0)
+        GL.glDrawPixels(self.rect.width, self.rect.height, GL.GL_RGBA, GL.GL_UNSIGNED_BYTE, data)
+        GL.glDisable(GL.GL_BLEND)
+        GL.glUseProgram(program)
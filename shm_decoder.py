@@ -0,0 +1,190 @@
+"""
+独立解码进程 + 共享内存帧环
+解码进程启动 ffmpeg，把输出用 readinto 直接读进 multiprocessing.shared_memory 里的 NV12 槽位，
+渲染进程直接从槽位上传到 GL，不再经过本进程的管道读取，也不和渲染循环抢 GIL。
+单生产者单消费者，槽位的交接走两根管道，每个字节是一个令牌（相当于一对计数信号量）：
+- filled：解码进程写满一个槽位后写一个 FRAME，读完文件（或出错）退出前写一个 END_TOKEN
+- free：渲染进程用完一个槽位后写一个 FREE，解码进程拿到令牌才复用槽位，环满时阻塞在这里，不用轮询
+令牌经过内核，写令牌之前对共享内存的写入，读到令牌的一方一定看得到，ARM 这类弱内存序的 CPU 上也不会读到半帧。
+解码进程用当前解释器重新执行本文件启动（相当于 spawn），不从已经建了 GL 上下文、开了线程的渲染进程 fork；
+multiprocessing 的 spawn / forkserver 会在子进程里重新执行 game3.py 这种没有 __main__ 保护的脚本，所以不用。
+对渲染端提供和 frame_pool.FramePool 相同的接口（next_ready / release / arrays），可直接交给 FrameScheduler。
+"""
+import ctypes
+import json
+import os
+import subprocess
+import sys
+from multiprocessing import resource_tracker, shared_memory
+
+from frame_pool import END, skip_frames
+
+# 头部 int64 字段：WRITE 是累计写进环的帧数；EXITED 置 1 后 EXIT 是 ffmpeg 的退出码
+WRITE, EXITED, EXIT = range(3)
+HEADER_SIZE = 64
+FRAME, END_TOKEN, FREE = b"F", b"E", b"R"
+
+
+class ShmFrameRing:
+    def __init__(self, slot_size, slots=4, name=None):
+        """name 为 None 时新建共享内存和交接管道（渲染进程），否则按名字打开（解码进程）"""
+        self.slot_size = slot_size
+        self.slots = slots
+        data_offset = HEADER_SIZE + slots * 8
+        if name is None:
+            # 新建的共享内存全是 0，头部不用再清
+            self.shm = shared_memory.SharedMemory(create=True, size=data_offset + slot_size * slots)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            # 按名字打开也会登记到资源跟踪器，解码进程退出时会删掉共享内存；删除由渲染进程负责
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        buf = self.shm.buf
+        self.header = buf[:HEADER_SIZE].cast("q")
+        self.pts = buf[HEADER_SIZE:data_offset].cast("d")
+        self.views = [buf[data_offset + i * slot_size:data_offset + (i + 1) * slot_size]
+                      for i in range(slots)]
+        self.arrays = []
+        self.taken = 0      # 消费者已取走（还没归还）的序号
+        self.tokens = b""   # 从 filled 读到、还没处理的令牌
+        self.ended = False
+        self.free_r = self.free_w = self.filled_r = self.filled_w = None
+        if name is None:
+            self.arrays = [(ctypes.c_char * slot_size).from_buffer(buf, data_offset + i * slot_size)
+                           for i in range(slots)]
+            self.filled_r, self.filled_w = os.pipe()
+            self.free_r, self.free_w = os.pipe()
+            os.set_blocking(self.filled_r, False)
+            os.write(self.free_w, FREE * slots)
+
+    # ---------- 解码进程 ----------
+    def fill(self, stream, seq):
+        view = self.views[seq % self.slots]
+        filled = 0
+        while filled < self.slot_size:
+            n = stream.readinto(view[filled:])
+            if not n:
+                return False
+            filled += n
+        return True
+
+    # ---------- 渲染进程 ----------
+    def preload(self, frames, fps):
+        """把预先解好的开头几帧写进前几个槽位，要在解码进程启动前调用，解码进程从其后接着写"""
+        for seq, frame in enumerate(frames):
+            os.read(self.free_r, 1)
+            self.views[seq][:] = frame
+            self.pts[seq] = seq / fps
+        self.header[WRITE] = len(frames)
+        if frames:
+            os.write(self.filled_w, FRAME * len(frames))
+
+    def next_ready(self):
+        """取一个 (槽位, 时间戳) 或 END，没有时返回 None"""
+        if self.ended:
+            return None
+        if not self.tokens:
+            try:
+                self.tokens = os.read(self.filled_r, self.slots + 1)
+            except BlockingIOError:
+                return None
+            if not self.tokens:
+                # 管道写端都关了却没有结束令牌：解码进程异常退出，也当作读完
+                self.ended = True
+                return END
+        token, self.tokens = self.tokens[:1], self.tokens[1:]
+        if token == END_TOKEN:
+            self.ended = True  # END 只报告一次
+            return END
+        slot = self.taken % self.slots
+        self.taken += 1
+        return slot, self.pts[slot]
+
+    def release(self, index):
+        """按取出顺序归还槽位（FrameScheduler 总是先进先出地归还）"""
+        os.write(self.free_w, FREE)
+
+    # ---------- 遥测 ----------
+    def produced(self):
+        """累计解出的帧数"""
+        return self.header[WRITE]
+
+    def depth(self):
+        """已解出、渲染端还没取走的帧数"""
+        return self.header[WRITE] - self.taken
+
+    @property
+    def exit_code(self):
+        """解码进程里 ffmpeg 的退出码，还在运行时为 None"""
+        return self.header[EXIT] if self.header[EXITED] else None
+
+    def _release_views(self):
+        # 先丢掉所有指向共享内存的视图，否则 SharedMemory.close 会报 BufferError
+        for view in self.views + [self.header, self.pts]:
+            view.release()
+        self.views = self.arrays = []
+        self.header = self.pts = None
+
+    def close(self):
+        """关掉交接管道让解码进程退出，并释放共享内存"""
+        # 解码进程等空槽位时读到 EOF、写令牌时遇到 EPIPE，都会停下
+        for fd in (self.free_w, self.free_r, self.filled_r, self.filled_w):
+            if fd is not None:
+                os.close(fd)
+        self.free_r = self.free_w = self.filled_r = self.filled_w = None
+        self._release_views()
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _decoder_main(name, slot_size, slots, free_fd, filled_fd, cmd, fps, cores, start):
+    try:
+        ring = ShmFrameRing(slot_size, slots, name=name)
+    except FileNotFoundError:
+        return  # 还没起来渲染端就关掉了环
+    pipe = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0)
+    if cores:
+        os.sched_setaffinity(pipe.pid, cores)
+    # 渲染端预先放进环里的帧，ffmpeg 输出的对应帧读出来丢掉
+    seq = ring.header[WRITE]
+    try:
+        eof = not skip_frames(pipe.stdout, slot_size, seq)
+        # 拿到空槽位令牌才写；读到 EOF 说明渲染端已经关掉了环
+        while not eof and os.read(free_fd, 1) == FREE:
+            if not ring.fill(pipe.stdout, seq):
+                break
+            ring.pts[seq % slots] = start + seq / fps
+            ring.header[WRITE] = seq + 1
+            os.write(filled_fd, FRAME)
+            seq += 1
+    except BrokenPipeError:
+        pass  # 渲染端关环时正好在写令牌
+    finally:
+        pipe.kill()
+        # 渲染端读到结束令牌时退出码已经写好
+        ring.header[EXIT] = pipe.wait()
+        ring.header[EXITED] = 1
+        try:
+            os.write(filled_fd, END_TOKEN)
+        except BrokenPipeError:
+            pass
+        ring._release_views()
+        ring.shm.close()
+
+
+def start_decoder(ring, cmd, fps, cores=None, start=0.0):
+    """
+    启动解码进程往 ring 里写帧，cores 不为空时把 ffmpeg 绑到这些 CPU 核上。
+    cmd 从 start 秒处开始解码时，第 n 帧的时间戳是 start + n / fps。返回解码进程的 Popen
+    """
+    args = [ring.shm.name, ring.slot_size, ring.slots, ring.free_r, ring.filled_w,
+            cmd, fps, list(cores) if cores else None, start]
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), json.dumps(args)],
+                               pass_fds=(ring.free_r, ring.filled_w))
+    # 写端只留在解码进程里：它异常退出时渲染端读到 EOF
+    os.close(ring.filled_w)
+    ring.filled_w = None
+    return process
+
+
+if __name__ == "__main__":
+    _decoder_main(*json.loads(sys.argv[1]))
@@ -0,0 +1,209 @@
+"""
+播放遥测
+环境变量 TELEMETRY 指定输出目标后，每次播放作为一个会话，每隔 TELEMETRY_INTERVAL 秒（默认 1）输出一行 JSON：
+    TELEMETRY=/var/log/screentest/playback.jsonl   追加写入文件
+    TELEMETRY=unix:/run/screentest/telemetry.sock  发到本机 Unix 数据报套接字
+    TELEMETRY=udp:127.0.0.1:9999                   发 UDP 数据报
+每行的 type：
+    start     会话开始：墙上时间、视频、尺寸、帧率、解码后端（其它行的 t 是相对会话开始的秒数）
+    interval  周期统计：解码/显示帧率，队列占用(最小/平均/最大)，上传/绘制/交换耗时(平均/最大 ms)，
+              排帧用的刷新率，这段时间新增的丢帧/重复/迟到帧数和节奏错误数
+    restart   解码器重启：跳转(seek)或硬解失败改软件解码(fallback)
+    exit      ffmpeg 自己退出（读到文件尾或出错）时的退出码
+    end       会话结束：原因(eof/user)和累计计数
+渲染循环每帧只做几次加法和比较，到点时才拼 JSON 写出；文件按行缓冲，套接字非阻塞，没人接收时直接丢掉。
+没设 TELEMETRY 时 session() 返回空会话，所有调用都是空操作。
+"""
+import json
+import os
+import socket
+import threading
+import time
+from collections import Counter
+
+TARGET = os.environ.get("TELEMETRY", "")
+INTERVAL = float(os.environ.get("TELEMETRY_INTERVAL", "1"))
+
+
+class _FileSink:
+    def __init__(self, path):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.file = open(path, "a", buffering=1)
+
+    def send(self, line):
+        self.file.write(line + "\n")
+
+
+class _SocketSink:
+    def __init__(self, family, address):
+        self.address = address
+        self.sock = socket.socket(family, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+
+    def send(self, line):
+        try:
+            self.sock.sendto(line.encode(), self.address)
+        except OSError:
+            pass  # 没有接收端或缓冲满：遥测不能拖慢播放，丢掉这一行
+
+
+def open_sink(target):
+    if target.startswith("unix:"):
+        return _SocketSink(socket.AF_UNIX, target[5:])
+    if target.startswith("udp:"):
+        host, _, port = target[4:].rpartition(":")
+        return _SocketSink(socket.AF_INET, (host, int(port)))
+    return _FileSink(target)
+
+
+_sink = None
+_lock = threading.Lock()  # 播放列表在后台线程里开会话，写出要串行
+
+
+def _emit(record):
+    global _sink
+    line = json.dumps(record, ensure_ascii=False)
+    with _lock:
+        if _sink is None:
+            _sink = open_sink(TARGET)
+        _sink.send(line)
+
+
+def _summary(values):
+    """(次数, 总和, 最大) → 平均/最大 ms"""
+    n, total, peak = values
+    return {"mean": round(total / n * 1000, 3), "max": round(peak * 1000, 3)} if n else None
+
+
+class Session:
+    """
+    一次播放的遥测。播放器每次启动解码时 attach 新的缓冲池和调度器，停止时 detach，
+    跳转前后的计数累加在一起；渲染循环每帧调用 frame()，再调用 poll() 到点输出。
+    """
+    def __init__(self, video, info, backend, interval=INTERVAL):
+        self.video = video
+        self.interval = interval
+        self.t0 = time.monotonic()
+        self.next_emit = self.t0 + interval
+        self.pool = self.scheduler = None
+        self.base_decoded = 0         # 已 detach 的各段解出的帧数
+        self.base_stats = Counter()   # 已 detach 的各段的调度计数
+        self.restarts = 0
+        self.last = (self.t0, 0, Counter())  # 上次输出时的 (时刻, 解码帧数, 调度计数)
+        self._reset_window()
+        _emit({"type": "start", "t": 0.0, "time": round(time.time(), 3), "video": video,
+               "width": info.width, "height": info.height, "fps": info.fps, "codec": info.codec,
+               "backend": backend})
+
+    def _reset_window(self):
+        self.depth = [0, 0, None, None]  # 次数, 总和, 最小, 最大
+        self.upload = [0, 0.0, 0.0]      # 次数, 总和(秒), 最大
+        self.draw = [0, 0.0, 0.0]
+        self.swap = [0, 0.0, 0.0]
+
+    def _now(self):
+        return round(time.monotonic() - self.t0, 3)
+
+    # ---------- 播放器调用 ----------
+    def attach(self, pool, scheduler):
+        self.pool, self.scheduler = pool, scheduler
+
+    def detach(self):
+        """停止当前解码前调用（共享内存环关闭后就读不到计数了）"""
+        if self.pool is None:
+            return
+        self.base_decoded += self.pool.produced()
+        self.base_stats.update(self.scheduler.stats())
+        code = self.pool.exit_code
+        if code is not None:
+            _emit({"type": "exit", "t": self._now(), "video": self.video, "code": code})
+        self.pool = self.scheduler = None
+
+    def restart(self, reason, **fields):
+        self.restarts += 1
+        _emit(dict({"type": "restart", "t": self._now(), "video": self.video, "reason": reason}, **fields))
+
+    def frame(self, upload, draw, swap):
+        """一次刷新的耗时(秒)；这次没有上传新帧时 upload 为 None"""
+        if self.pool is not None:
+            depth = self.pool.depth() + len(self.scheduler.pending)
+            d = self.depth
+            d[0] += 1
+            d[1] += depth
+            d[2] = depth if d[2] is None else min(d[2], depth)
+            d[3] = depth if d[3] is None else max(d[3], depth)
+        for acc, value in ((self.upload, upload), (self.draw, draw), (self.swap, swap)):
+            if value is not None:
+                acc[0] += 1
+                acc[1] += value
+                if value > acc[2]:
+                    acc[2] = value
+
+    def _totals(self):
+        decoded, stats = self.base_decoded, Counter(self.base_stats)
+        if self.pool is not None:
+            decoded += self.pool.produced()
+            stats.update(self.scheduler.stats())
+        return decoded, stats
+
+    def poll(self, now):
+        """到输出时刻时写一行 interval 统计"""
+        if now < self.next_emit:
+            return
+        self.next_emit = now + self.interval
+        decoded, stats = self._totals()
+        t, last_decoded, last_stats = self.last
+        dt = max(now - t, 1e-6)
+        n, total, low, high = self.depth
+        record = {
+            "type": "interval", "t": round(now - self.t0, 3), "video": self.video,
+            "decode_fps": round((decoded - last_decoded) / dt, 2),
+            "present_fps": round((stats["presented"] - last_stats["presented"]) / dt, 2),
+            "queue": {"min": low, "mean": round(total / n, 2), "max": high} if n else None,
+            "upload_ms": _summary(self.upload),
+            "draw_ms": _summary(self.draw),
+            "swap_ms": _summary(self.swap),
+            "restarts": self.restarts,
+            "refresh_hz": round(self.scheduler.refresh, 3) if self.scheduler and self.scheduler.refresh else None,
+        }
+        for key in ("dropped", "repeated", "late", "cadence_errors"):
+            record[key] = stats[key] - last_stats[key]
+        _emit(record)
+        self.last = (now, decoded, stats)
+        self._reset_window()
+
+    def end(self, reason):
+        self.detach()
+        decoded, stats = self._totals()
+        _emit(dict({"type": "end", "t": self._now(), "video": self.video, "reason": reason,
+                    "decoded": decoded, "restarts": self.restarts}, **stats))
+
+
+class _NullSession:
+    def attach(self, pool, scheduler):
+        pass
+
+    def detach(self):
+        pass
+
+    def restart(self, reason, **fields):
+        pass
+
+    def frame(self, upload, draw, swap):
+        pass
+
+    def poll(self, now):
+        pass
+
+    def end(self, reason):
+        pass
+
+
+NULL = _NullSession()
+
+
+def session(video, info, backend):
+    """开一个播放会话；没设 TELEMETRY 时返回空会话"""
+    return Session(video, info, backend) if TARGET else NULL
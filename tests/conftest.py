@@ -0,0 +1,10 @@
+"""
+测试共用设置：模块都平铺在仓库根目录，把根目录放进 sys.path；
+pygame 用 dummy 驱动，不需要显示器和声卡
+"""
+import os
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,40 @@
+"""decoder_backend.choose：按测速结果挑解码后端"""
+import decoder_backend
+from decoder_backend import SOFTWARE, choose
+
+
+def result(backend, fps, cpu, ok=True):
+    return {"backend": backend, "ok": ok, "frames": 120, "fps": fps, "cpu": cpu}
+
+
+def test_nothing_works_falls_back_to_software():
+    assert choose([result("vaapi", 0, 0, ok=False)], 30) == SOFTWARE
+    assert choose([], 30) == SOFTWARE
+
+
+def test_realtime_hardware_that_saves_cpu_wins():
+    results = [result(SOFTWARE, 90, 100), result("vaapi", 60, 20)]
+    assert choose(results, 30) == "vaapi"
+
+
+def test_hardware_without_real_savings_is_ignored():
+    # 只省了 10% CPU：多半是 -hwaccel 悄悄退回了软件解码
+    cpu = 100 * decoder_backend.HW_CPU_RATIO + 10
+    results = [result(SOFTWARE, 90, 100), result("vaapi", 200, cpu)]
+    assert choose(results, 30) == SOFTWARE
+
+
+def test_cheapest_of_the_realtime_backends():
+    results = [result(SOFTWARE, 40, 100), result("vaapi", 35, 30), result("drm", 50, 20),
+               result("cuda", 25, 5)]
+    assert choose(results, 30) == "drm"
+
+
+def test_fastest_when_none_keeps_up():
+    results = [result(SOFTWARE, 20, 100), result("vaapi", 25, 50), result("drm", 10, 5)]
+    assert choose(results, 30) == "vaapi"
+
+
+def test_failed_software_run_does_not_block_hardware():
+    results = [result(SOFTWARE, 0, 0, ok=False), result("vaapi", 60, 90)]
+    assert choose(results, 30) == "vaapi"
@@ -0,0 +1,160 @@
+"""FrameScheduler：vsync 取整、丢帧 / 重复 / 迟到计数、finished() 和 prefetch，用假的缓冲池按需喂帧"""
+from collections import deque
+
+from frame_pool import END
+from frame_scheduler import FrameScheduler
+
+FPS, HZ = 24, 60
+# 24p 在 60Hz 上每帧的理想 vsync：3、2、3、2… 交替
+CADENCE = [0, 3, 5, 8, 10, 13, 15, 18, 20, 23]
+
+
+class FakePool:
+    """按顺序交出 (索引, 时间戳)；只交出前 available 帧（模拟解码欠载），全部交完后交一次 END"""
+    def __init__(self, count, fps=FPS, available=None):
+        self.frames = deque((i, i / fps) for i in range(count))
+        self.available = count if available is None else available
+        self.taken = 0
+        self.end_sent = False
+        self.released = []
+
+    def next_ready(self):
+        if self.frames and self.taken < self.available:
+            self.taken += 1
+            return self.frames.popleft()
+        if not self.frames and not self.end_sent:
+            self.end_sent = True
+            return END
+        return None
+
+    def release(self, index):
+        self.released.append(index)
+
+
+def vsync(k):
+    return k / HZ
+
+
+def test_slot_rounds_to_nearest_vsync():
+    scheduler = FrameScheduler(FakePool(0), FPS, HZ)
+    assert scheduler._slot(1 / 24) == 3      # 2.5 个周期向上取整
+    assert scheduler._slot(2 / 24) == 5
+    assert scheduler._slot(0.49 / HZ) == 0
+    assert scheduler._slot(0.51 / HZ) == 1
+
+
+def test_24p_on_60hz_keeps_cadence():
+    scheduler = FrameScheduler(FakePool(10), FPS, HZ)
+    shown = [k for k in range(30) if scheduler.next_frame(vsync(k)) is not None]
+    assert shown == CADENCE
+    assert scheduler.stats() == {"presented": 10, "dropped": 0, "repeated": 0, "late": 0,
+                                 "cadence_errors": 0}
+
+
+def test_late_wake_drops_older_frames():
+    pool = FakePool(10)
+    scheduler = FrameScheduler(pool, FPS, HZ)
+    assert scheduler.next_frame(vsync(0)) == 0
+    # 睡过了第 1 帧的 vsync：第 1、2 帧都已到时，只上传较新的第 2 帧
+    assert scheduler.next_frame(vsync(6)) == 2
+    assert scheduler.dropped == 1
+    assert pool.released == [1]
+    assert scheduler.late == 0
+
+
+def test_underrun_repeats_and_shifts_clock():
+    pool = FakePool(10, available=1)
+    scheduler = FrameScheduler(pool, FPS, HZ)
+    assert scheduler.next_frame(vsync(0)) == 0
+    for k in range(1, 6):
+        assert scheduler.next_frame(vsync(k)) is None
+    # 第 1 帧应在第 3 个 vsync 显示，第 4、5 个 vsync 各重复一次并把时钟顺延一个周期
+    assert scheduler.repeated == 2
+    pool.available = 2
+    assert scheduler.next_frame(vsync(6)) == 1
+    assert scheduler.late == 0
+
+
+def test_frame_arriving_late_is_counted():
+    pool = FakePool(10, available=1)
+    scheduler = FrameScheduler(pool, FPS, HZ)
+    assert scheduler.next_frame(vsync(0)) == 0
+    pool.available = 2
+    # 中间没有刷新（没机会记重复），第 1 帧晚了一帧多才显示
+    assert scheduler.next_frame(vsync(8)) == 1
+    assert scheduler.late == 1
+    assert scheduler.repeated == 0
+
+
+def test_finished_after_end_and_last_frame():
+    scheduler = FrameScheduler(FakePool(2), FPS, HZ)
+    assert not scheduler.finished()
+    assert scheduler.next_frame(vsync(0)) == 0
+    assert not scheduler.finished()
+    assert scheduler.next_frame(vsync(3)) == 1
+    assert scheduler.finished()
+
+
+def test_wait_time_sleeps_until_next_slot():
+    scheduler = FrameScheduler(FakePool(10), FPS, HZ)
+    scheduler.next_frame(vsync(0))
+    # 第 1 帧在第 3 个 vsync，前半个周期起算到时
+    assert abs(scheduler.wait_time(vsync(0)) - 2.5 / HZ) < 1e-9
+
+
+def play_prefetch(scheduler, vsyncs):
+    """
+    照 game3.upload_frames 的用法驱动 prefetch 调度器，PBO 只模拟“上传时先把上一块搬进纹理”：
+    返回 (每个 vsync 纹理里的帧, 经上传顺带搬进纹理的次数)
+    """
+    state = {"filled": None, "texture": None, "overlapped": 0}
+
+    def upload(index):
+        if state["filled"] is not None:
+            state["texture"] = state["filled"]
+            state["overlapped"] += 1
+        state["filled"] = index
+        if state["texture"] is None:  # 第一帧马上搬
+            state["texture"], state["filled"] = index, None
+
+    def flush():
+        if state["filled"] is not None:
+            state["texture"], state["filled"] = state["filled"], None
+
+    shown = []
+    for k in range(vsyncs):
+        now = vsync(k)
+        for _ in range(2):
+            index = scheduler.next_frame(now)
+            if index is not None:
+                upload(index)
+            if not scheduler.present_due(now):
+                break
+            flush()
+        shown.append(state["texture"])
+    return shown, state["overlapped"]
+
+
+def test_prefetch_shows_each_frame_on_its_slot():
+    scheduler = FrameScheduler(FakePool(10), FPS, HZ, prefetch=True)
+    shown, overlapped = play_prefetch(scheduler, 30)
+    first = [shown.index(i) for i in range(10)]
+    assert first == CADENCE
+    # 第一帧之后，除最后一帧外每帧都由下一帧的上传顺带搬进纹理
+    assert overlapped == 8
+    assert scheduler.finished()
+    assert scheduler.stats()["presented"] == 10
+    assert scheduler.stats()["cadence_errors"] == 0
+
+
+def test_prefetch_keeps_last_frame_pending_until_due():
+    scheduler = FrameScheduler(FakePool(2), FPS, HZ, prefetch=True)
+    assert scheduler.next_frame(vsync(0)) == 0
+    assert scheduler.present_due(vsync(0))
+    # PBO 空着：提前取出第 1 帧，还没到时
+    assert scheduler.next_frame(vsync(0)) == 1
+    assert not scheduler.present_due(vsync(0))
+    assert not scheduler.finished()
+    assert scheduler.next_frame(vsync(3)) is None
+    assert scheduler.present_due(vsync(3))
+    assert scheduler.finished()
@@ -0,0 +1,34 @@
+"""MetricHistory 环形缓冲：写满后回绕，values() 按时间顺序返回"""
+import numpy as np
+
+from metric_history import MetricHistory
+
+
+def test_values_before_full():
+    history = MetricHistory(capacity=4)
+    for v in (1, 2, 3):
+        history.push(v)
+    np.testing.assert_array_equal(history.values(), [1, 2, 3])
+    assert history.count == 3
+
+
+def test_wraparound_keeps_newest_in_order():
+    history = MetricHistory(capacity=4)
+    for v in range(1, 7):
+        history.push(v)
+    np.testing.assert_array_equal(history.values(), [3, 4, 5, 6])
+    assert history.count == 4
+    assert history.index == 2
+    assert history.version == 6
+    # 再写整整一圈，回到起点
+    for v in range(7, 11):
+        history.push(v)
+    np.testing.assert_array_equal(history.values(), [7, 8, 9, 10])
+
+
+def test_maybe_push_once_per_period():
+    history = MetricHistory(capacity=4, period=1.0)
+    assert history.maybe_push(1, now=10.0)
+    assert not history.maybe_push(2, now=10.5)
+    assert history.maybe_push(3, now=11.0)
+    np.testing.assert_array_equal(history.values(), [1, 3])
@@ -0,0 +1,122 @@
+"""关键帧索引的查找 / 章节，以及没有 ffprobe 时用的 MP4 样本表解析（stts/ctts/stss/elst）"""
+import shutil
+import struct
+import subprocess
+
+import pytest
+
+import seek
+from seek import KeyframeIndex
+
+
+def test_before_picks_previous_keyframe():
+    index = KeyframeIndex([4.0, 0.0, 2.0, 6.0], 8.0)
+    assert index.times == [0.0, 2.0, 4.0, 6.0]
+    assert index.before(3.9) == 2.0
+    assert index.before(4.0) == 4.0
+    assert index.before(-1.0) == 0.0
+    assert index.before(100.0) == 6.0
+
+
+def test_empty_index_starts_at_zero():
+    index = KeyframeIndex([], None)
+    assert index.times == [0.0]
+    assert index.before(5.0) == 0.0
+
+
+def test_chapters_step_forward_and_back():
+    index = KeyframeIndex([0.0, 2.0, 4.0, 6.0], 8.0)
+    assert index.chapters == [0.0, 2.0, 4.0, 6.0]
+    assert index.chapter(2.5, 1) == 4.0
+    assert index.chapter(6.0, 1) is None
+    # 往前：离当前位置不到 1 秒的章节跳过，再往前一个
+    assert index.chapter(4.5, -1) == 2.0
+    assert index.chapter(2.5, -1) == 0.0
+    assert index.chapter(0.5, -1) == 0.0
+
+
+# ---------- 手工拼一个只有样本表的 MP4 ----------
+def box(kind, *children):
+    body = b"".join(children)
+    return struct.pack(">I4s", 8 + len(body), kind) + body
+
+
+def full_box(kind, version, payload):
+    return box(kind, struct.pack(">I", version << 24) + payload)
+
+
+def table(kind, fmt, rows, version=0):
+    return full_box(kind, version, struct.pack(">I", len(rows)) +
+                    b"".join(struct.pack(fmt, *row) for row in rows))
+
+
+def track(handler, stbl, mdhd_version=0, elst=None, timescale=600, duration=6000):
+    if mdhd_version == 1:
+        mdhd = full_box(b"mdhd", 1, struct.pack(">QQIQ", 0, 0, timescale, duration) + b"\0" * 4)
+    else:
+        mdhd = full_box(b"mdhd", 0, struct.pack(">IIII", 0, 0, timescale, duration) + b"\0" * 4)
+    hdlr = full_box(b"hdlr", 0, b"\0" * 4 + handler + b"\0" * 12)
+    parts = [box(b"edts", elst)] if elst is not None else []
+    parts.append(box(b"mdia", mdhd, hdlr, box(b"minf", box(b"stbl", *stbl))))
+    return box(b"trak", *parts)
+
+
+def write_mp4(tmp_path, *traks):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(box(b"ftyp", b"isom\0\0\0\0") + box(b"moov", *traks) + box(b"mdat", b"\0" * 16))
+    return str(path)
+
+
+# 10 个样本，每个 60 个时间单位（600 单位/秒 → 0.1 秒）；B 帧的显示偏移和 elst 抵消开头的 120
+OFFSETS = [120, 300, 60, 60, 120, 300, 60, 60, 120, 120]
+STBL = [table(b"stts", ">II", [(10, 60)]),
+        table(b"ctts", ">Ii", [(1, off) for off in OFFSETS]),
+        table(b"stss", ">I", [(1,), (5,), (9,)])]
+
+
+@pytest.mark.parametrize("version", [0, 1])
+def test_mp4_sample_tables(tmp_path, version):
+    if version == 1:
+        elst = table(b"elst", ">Qqi", [(6000, 120, 0x10000)], version=1)
+    else:
+        elst = table(b"elst", ">Iii", [(6000, 120, 0x10000)])
+    sound = track(b"soun", [table(b"stts", ">II", [(1, 1024)])])
+    path = write_mp4(tmp_path, sound, track(b"vide", STBL, version, elst))
+    times, duration = seek._mp4_keyframes(path)
+    assert times == pytest.approx([0.0, 0.4, 0.8])
+    assert duration == pytest.approx(10.0)
+
+
+def test_mp4_empty_edit_is_skipped(tmp_path):
+    # 第一段是空编辑（media_time = -1），显示时间 0 对应第二段的 media_time
+    elst = table(b"elst", ">Iii", [(600, -1, 0x10000), (6000, 120, 0x10000)])
+    path = write_mp4(tmp_path, track(b"vide", STBL, elst=elst))
+    times, _ = seek._mp4_keyframes(path)
+    assert times == pytest.approx([0.0, 0.4, 0.8])
+
+
+def test_mp4_without_stss_is_all_keyframes(tmp_path):
+    path = write_mp4(tmp_path, track(b"vide", [table(b"stts", ">II", [(4, 150)])]))
+    times, _ = seek._mp4_keyframes(path)
+    assert times == pytest.approx([0.0, 0.25, 0.5, 0.75])
+
+
+def test_not_mp4(tmp_path):
+    path = tmp_path / "clip.ts"
+    path.write_bytes(b"\x47" + b"\0" * 187)
+    assert seek._mp4_keyframes(str(path)) is None
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="需要 ffmpeg")
+def test_mp4_from_ffmpeg(tmp_path):
+    path = str(tmp_path / "gop.mp4")
+    result = subprocess.run(["ffmpeg", "-loglevel", "error", "-y", "-f", "lavfi",
+                             "-i", "testsrc=size=128x72:rate=24", "-t", "2",
+                             "-c:v", "libx264", "-bf", "2", "-g", "12", "-keyint_min", "12",
+                             "-sc_threshold", "0", "-pix_fmt", "yuv420p", path],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if result.returncode != 0:
+        pytest.skip("ffmpeg 没有 libx264")
+    times, duration = seek._mp4_keyframes(path)
+    assert times == pytest.approx([0.0, 0.5, 1.0, 1.5], abs=1e-3)
+    assert duration == pytest.approx(2.0, abs=0.05)
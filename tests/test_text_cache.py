@@ -0,0 +1,37 @@
+"""text_cache.render 的 LRU：命中时挪到最新，超过上限淘汰最久没用的"""
+from collections import OrderedDict
+
+import pygame
+import pytest
+
+import text_cache
+
+
+@pytest.fixture
+def small_cache(monkeypatch):
+    pygame.font.init()
+    monkeypatch.setattr(text_cache, "MAX_SURFACES", 3)
+    monkeypatch.setattr(text_cache, "_surfaces", OrderedDict())
+    return text_cache._surfaces
+
+
+def cached_texts(cache):
+    return [key[0] for key in cache]
+
+
+def test_hit_returns_same_surface(small_cache):
+    first = text_cache.render("a", 20)
+    assert text_cache.render("a", 20) is first
+    # 颜色、字号不同是不同的条目
+    assert text_cache.render("a", 20, color=(255, 0, 0)) is not first
+    assert len(small_cache) == 2
+
+
+def test_evicts_least_recently_used(small_cache):
+    a = text_cache.render("a", 20)
+    text_cache.render("b", 20)
+    text_cache.render("c", 20)
+    assert text_cache.render("a", 20) is a   # a 变成最新
+    text_cache.render("d", 20)
+    assert cached_texts(small_cache) == ["c", "a", "d"]
+    assert len(small_cache) == text_cache.MAX_SURFACES
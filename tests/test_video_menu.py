@@ -0,0 +1,51 @@
+"""VideoMenu.index_at：屏幕坐标按格子尺寸直接算出按钮序号，空白处和边距返回 None"""
+import pytest
+
+from video_menu import GAP, MARGIN, VideoMenu
+
+
+@pytest.fixture
+def menu():
+    # 800×480、3 行、20 个视频：4 列，按钮 180×136，行距 146，可以往下滚两行
+    menu = VideoMenu([f"v{i}.mp4" for i in range(20)], (800, 480), rows=3)
+    yield menu
+    menu.close()
+
+
+def test_layout(menu):
+    assert (menu.cols, menu.btn_w, menu.btn_h) == (4, 180, 136)
+    assert (menu.pitch_w, menu.pitch_h) == (180 + GAP, 136 + GAP)
+    assert menu.max_scroll == 2 * menu.pitch_h
+
+
+def test_hits_buttons(menu):
+    assert menu.index_at((MARGIN, MARGIN)) == 0
+    assert menu.index_at((MARGIN + menu.pitch_w + 5, MARGIN + 5)) == 1
+    assert menu.index_at((MARGIN + 179, MARGIN + menu.pitch_h + 135)) == 4
+    assert menu.index_at((MARGIN + 3 * menu.pitch_w, MARGIN + 2 * menu.pitch_h)) == 11
+
+
+def test_gaps_and_margins_miss(menu):
+    assert menu.index_at((MARGIN + 180, MARGIN)) is None          # 两列之间的缝
+    assert menu.index_at((MARGIN, MARGIN + 136)) is None          # 两行之间的缝
+    assert menu.index_at((MARGIN - 1, MARGIN)) is None            # 左边距
+    assert menu.index_at((MARGIN, MARGIN - 1)) is None            # 上边距
+    assert menu.index_at((MARGIN, 480 - MARGIN)) is None          # 下边距
+    assert menu.index_at((MARGIN + 4 * menu.pitch_w, MARGIN)) is None  # 最后一列右边
+
+
+def test_scroll_offsets_rows(menu):
+    menu.scroll_to(menu.pitch_h)
+    assert menu.index_at((MARGIN, MARGIN)) == 4
+    # 滚到底：最后一行只有 20 - 16 = 4 个，都在
+    menu.scroll_to(menu.max_scroll)
+    assert menu.index_at((MARGIN + 3 * menu.pitch_w, MARGIN + 2 * menu.pitch_h)) == 19
+
+
+def test_past_last_video_misses():
+    menu = VideoMenu([f"v{i}.mp4" for i in range(10)], (800, 480), rows=3)
+    try:
+        assert menu.index_at((MARGIN + menu.pitch_w, MARGIN + 2 * menu.pitch_h)) == 9
+        assert menu.index_at((MARGIN + 2 * menu.pitch_w, MARGIN + 2 * menu.pitch_h)) is None
+    finally:
+        menu.close()
@@ -0,0 +1,50 @@
+"""NV12Converter 和逐像素浮点参考实现对照"""
+import numpy as np
+import pytest
+
+from yuv_convert import NV12Converter, yuv_coefficients
+
+
+def reference(nv12, width, height, matrix, full_range):
+    y_scale, y_offset, c_scale, rv, gu, gv, bu = yuv_coefficients(matrix, full_range)
+    y = nv12[:width * height].reshape(height, width).astype(np.float64)
+    uv = nv12[width * height:].reshape(height // 2, width // 2, 2).astype(np.float64)
+    # 色度最近邻放大到全分辨率
+    u = uv[..., 0].repeat(2, axis=0).repeat(2, axis=1) - 128
+    v = uv[..., 1].repeat(2, axis=0).repeat(2, axis=1) - 128
+    luma = (y - y_offset) * y_scale
+    rgb = np.stack((luma + c_scale * rv * v,
+                    luma + c_scale * (gu * u + gv * v),
+                    luma + c_scale * bu * u), axis=-1)
+    return np.clip(np.floor(rgb + 0.5), 0, 255).astype(np.uint8)
+
+
+@pytest.mark.parametrize("matrix", ["bt601", "bt709"])
+@pytest.mark.parametrize("full_range", [False, True])
+def test_matches_reference(matrix, full_range):
+    width, height = 16, 6
+    nv12 = np.random.default_rng(1).integers(0, 256, width * height * 3 // 2, dtype=np.uint8)
+    out = np.zeros((height, width, 3), dtype=np.uint8)
+    NV12Converter(width, height, matrix, full_range).convert(nv12.tobytes(), out)
+    expected = reference(nv12, width, height, matrix, full_range)
+    # float32 和 float64 的舍入差最多 1
+    assert np.abs(out.astype(int) - expected).max() <= 1
+
+
+def test_limited_range_black_and_white():
+    width, height = 4, 2
+    out = np.zeros((height, width, 3), dtype=np.uint8)
+    converter = NV12Converter(width, height)
+    for y, rgb in ((16, 0), (235, 255)):
+        nv12 = bytes([y]) * (width * height) + bytes([128]) * (width * height // 2)
+        converter.convert(nv12, out)
+        assert (out == rgb).all()
+
+
+def test_writes_into_view():
+    width, height = 8, 4
+    nv12 = bytes([235]) * (width * height) + bytes([128]) * (width * height // 2)
+    canvas = np.zeros((height, width * 2, 3), dtype=np.uint8)
+    NV12Converter(width, height).convert(nv12, canvas[:, width:])
+    assert (canvas[:, :width] == 0).all()
+    assert (canvas[:, width:] == 255).all()
@@ -0,0 +1,103 @@
+"""
+共享字体和文字 Surface 缓存
+- 字体对象按 (face, size, bold) 缓存，不再每帧构造 pygame.font.Font / SysFont
+- 渲染结果按 (text, size, color, angle, face, bold) 缓存，LRU 淘汰，数量有上限
+- 变化的数字（如 f"{name}: {value:.2f}"）用预渲染的数字字形拼接，不再整串重新光栅化
+"""
+from collections import OrderedDict
+import pygame
+
+MAX_SURFACES = 512  # 文字 Surface 缓存上限
+DIGITS = "0123456789.-+%e"
+
+_fonts = {}
+_surfaces = OrderedDict()
+_atlases = {}
+
+
+def get_font(size, face=None, bold=False):
+    """face 为 None 时使用 pygame 默认字体，否则按系统字体名加载"""
+    key = (face, size, bold)
+    font = _fonts.get(key)
+    if font is None:
+        if face is None:
+            font = pygame.font.Font(None, size)
+            font.set_bold(bold)
+        else:
+            font = pygame.font.SysFont(face, size, bold=bold)
+        _fonts[key] = font
+    return font
+
+
+def render(text, size, color=(255, 255, 255), angle=0, face=None, bold=False):
+    """返回缓存的文字 Surface，angle 非 0 时返回旋转后的结果"""
+    key = (text, size, tuple(color), angle, face, bold)
+    surf = _surfaces.get(key)
+    if surf is not None:
+        _surfaces.move_to_end(key)
+        return surf
+    surf = get_font(size, face, bold).render(text, True, color)
+    if angle:
+        surf = pygame.transform.rotate(surf, angle)
+    _surfaces[key] = surf
+    if len(_surfaces) > MAX_SURFACES:
+        _surfaces.popitem(last=False)
+    return surf
+
+
+class DigitAtlas:
+    """
+    一种字体、字号、颜色的数字字形表，数字串按字形逐个 blit
+    """
+    def __init__(self, size, color=(255, 255, 255), face=None, bold=False):
+        font = get_font(size, face, bold)
+        self.glyphs = {ch: font.render(ch, True, color) for ch in DIGITS}
+        self.height = font.get_height()
+
+    def width(self, digits):
+        glyphs = self.glyphs
+        return sum(glyphs[ch].get_width() for ch in digits)
+
+    def blit(self, target, digits, topleft):
+        x, y = topleft
+        for ch in digits:
+            glyph = self.glyphs[ch]
+            target.blit(glyph, (x, y))
+            x += glyph.get_width()
+
+
+def get_atlas(size, color=(255, 255, 255), face=None, bold=False):
+    key = (size, tuple(color), face, bold)
+    atlas = _atlases.get(key)
+    if atlas is None:
+        atlas = _atlases[key] = DigitAtlas(size, color, face, bold)
+    return atlas
+
+
+def draw_value(target, prefix, value, size, color=(255, 255, 255), fmt=".2f",
+               center=None, topleft=(0, 0), face=None, bold=False):
+    """
+    画 "prefix + 数值"：前缀走文字缓存，数值用数字字形拼接。
+    返回画过的区域，可直接交给 DirtyRectPresenter.mark
+    """
+    digits = format(value, fmt)
+    head = render(prefix, size, color, face=face, bold=bold)
+    if not all(ch in DIGITS for ch in digits):
+        # inf / nan 之类不在字形表里的，退回整串渲染
+        tail = render(digits, size, color, face=face, bold=bold)
+        atlas = None
+        tail_w = tail.get_width()
+    else:
+        atlas = get_atlas(size, color, face, bold)
+        tail_w = atlas.width(digits)
+    rect = pygame.Rect(0, 0, head.get_width() + tail_w, head.get_height())
+    if center is not None:
+        rect.center = center
+    else:
+        rect.topleft = topleft
+    target.blit(head, rect.topleft)
+    if atlas is None:
+        target.blit(tail, (rect.x + head.get_width(), rect.y))
+    else:
+        atlas.blit(target, digits, (rect.x + head.get_width(), rect.y))
+    return rect
@@ -0,0 +1,90 @@
+"""
+菜单缩略图
+每个视频用 ffmpeg 抽一帧并直接缩放到按钮大小写成 PNG，缓存在磁盘上，
+文件名由 路径 + 缩略图尺寸 + 修改时间 + 文件大小 的哈希决定，视频没变就不再重新抽帧。
+抽帧在有上限的线程池里做，菜单第一次画到某个按钮时才提交；还没好的先画占位，主循环不会被卡住。
+内存里只留最近用过的 MAX_SURFACES 张，淘汰的下次用到时从磁盘缓存重新加载。
+"""
+import hashlib
+import os
+import queue
+import shutil
+import subprocess
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+CACHE_DIR = os.environ.get("THUMBNAIL_DIR", os.path.expanduser("~/.cache/screentest/thumbnails"))
+WORKERS = 2
+SEEK_SECONDS = 1  # 跳过开头的黑场；片子太短时改抽第一帧
+MAX_SURFACES = 64
+
+
+def extract(path, out, size):
+    """抽一帧缩放到 size 以内（保持宽高比）写成 PNG，先写临时文件再改名，中途退出不会留下半个文件"""
+    w, h = size
+    tmp = out + ".tmp"
+    for seek in (["-ss", str(SEEK_SECONDS)], []):
+        subprocess.run(["ffmpeg", "-loglevel", "error", "-y"] + seek +
+                       ["-i", path, "-frames:v", "1",
+                        "-vf", f"scale={w}:{h}:force_original_aspect_ratio=decrease",
+                        "-f", "image2", "-c:v", "png", tmp],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=30)
+        if os.path.exists(tmp) and os.path.getsize(tmp) > 0:
+            os.replace(tmp, out)
+            return True
+    return False
+
+
+class Thumbnails:
+    def __init__(self, size, workers=WORKERS, cache_dir=CACHE_DIR, limit=MAX_SURFACES):
+        self.size = size
+        self.cache_dir = cache_dir
+        self.limit = limit
+        self.surfaces = OrderedDict()  # 路径 → 已转换成显示格式的 Surface；抽帧失败的是 None。LRU
+        self.pending = set()
+        self.done = queue.Queue()  # 工作线程 → 主线程：(路径, Surface 或 None)
+        self.enabled = shutil.which("ffmpeg") is not None
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail")
+
+    def cache_path(self, path):
+        st = os.stat(path)
+        key = f"{os.path.abspath(path)}|{self.size[0]}x{self.size[1]}|{st.st_mtime_ns}|{st.st_size}"
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode()).hexdigest() + ".png")
+
+    def _work(self, path):
+        surface = None
+        try:
+            out = self.cache_path(path)
+            if not os.path.exists(out):
+                os.makedirs(self.cache_dir, exist_ok=True)
+                extract(path, out, self.size)
+            if os.path.exists(out):
+                surface = pygame.image.load(out)
+        except (OSError, pygame.error, subprocess.SubprocessError):
+            surface = None
+        self.done.put((path, surface))
+
+    def get(self, path):
+        """返回 path 的缩略图 Surface；还没好（或抽帧失败）时返回 None，第一次调用时提交抽帧任务"""
+        while True:
+            try:
+                done, surface = self.done.get_nowait()
+            except queue.Empty:
+                break
+            # convert 要在主线程做
+            self.surfaces[done] = surface.convert() if surface is not None else None
+            self.pending.discard(done)
+            if len(self.surfaces) > self.limit:
+                self.surfaces.popitem(last=False)
+        if path in self.surfaces:
+            self.surfaces.move_to_end(path)
+            return self.surfaces[path]
+        if self.enabled and path not in self.pending:
+            self.pending.add(path)
+            self.executor.submit(self._work, path)
+        return None
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
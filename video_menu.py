@@ -0,0 +1,191 @@
+"""
+视频菜单
+按钮大小固定，一屏 rows 行、最多 MAX_COLS 列，视频再多就往下滚动翻页，不再把按钮越缩越小：
+- 只为可见的按钮渲染 Surface（底色 + 缩略图 + 文件名），渲染结果缓存，离开前后一页范围的丢掉
+- 点击位置按格子尺寸直接算出行列和序号，不再逐个 collidepoint
+- 只在滚动、缩略图到达或 invalidate() 之后重画并 flip，菜单静止时不再每帧重画
+滚动：竖向拖动（松手对齐到整行）、滚轮、上下方向键一行、PageUp/PageDown 一页、Home/End。
+点击在松手时才算（要和拖动区分开），按下落在按钮上时先调用 on_press(path) 让播放器提前准备，
+按下后变成拖动或松开在别处时调用 on_cancel()。
+"""
+import os
+
+import pygame
+
+import text_cache
+import thumbnails
+
+MAX_COLS = 4
+MARGIN = 20
+GAP = 10
+DRAG_THRESHOLD = 12   # 按下后移动超过这么多像素算拖动，松手不再当作点击
+BACKGROUND = (30, 30, 30)
+BUTTON = (0, 150, 255)
+
+
+class VideoMenu:
+    def __init__(self, paths, screen_size, rows=3, font_size=28, on_press=None, on_cancel=None):
+        self.paths = paths
+        self.on_press = on_press
+        self.on_cancel = on_cancel
+        self.width, self.height = screen_size
+        self.rows = rows
+        self.font_size = font_size
+        self.cols = max(1, min(MAX_COLS, (len(paths) + rows - 1) // rows))
+        usable_w, usable_h = self.width - 2 * MARGIN, self.height - 2 * MARGIN
+        self.btn_w = usable_w // self.cols - GAP
+        self.btn_h = usable_h // rows - GAP
+        self.pitch_w, self.pitch_h = self.btn_w + GAP, self.btn_h + GAP
+        self.viewport = pygame.Rect(0, MARGIN, self.width, usable_h)
+        total_rows = (len(paths) + self.cols - 1) // self.cols
+        self.max_scroll = max(0, total_rows - rows) * self.pitch_h
+        self.scroll = 0          # 内容往上滚过的像素
+        self.press = None        # (按下位置, 按下时的 scroll)
+        self.dragging = False
+        self.tiles = {}          # 序号 → (Surface, 是否带缩略图)
+        self.dirty = True
+        # 缩略图留出 4 像素蓝边，后台抽帧，磁盘缓存
+        self.thumbs = thumbnails.Thumbnails((self.btn_w - 8, self.btn_h - 8))
+
+    # ---------- 布局 ----------
+    def visible(self):
+        """当前屏幕上（含被裁掉一部分的）按钮序号"""
+        first = self.scroll // self.pitch_h
+        last = (self.scroll + self.viewport.height - 1) // self.pitch_h
+        return range(first * self.cols, min(len(self.paths), (last + 1) * self.cols))
+
+    def rect(self, index):
+        row, col = divmod(index, self.cols)
+        return pygame.Rect(MARGIN + col * self.pitch_w, MARGIN + row * self.pitch_h - self.scroll,
+                           self.btn_w, self.btn_h)
+
+    def index_at(self, pos):
+        """屏幕坐标 → 按钮序号，落在空白处返回 None"""
+        x, y = pos[0] - MARGIN, pos[1] - MARGIN
+        if x < 0 or not self.viewport.collidepoint(pos):
+            return None
+        col, dx = divmod(x, self.pitch_w)
+        row, dy = divmod(y + self.scroll, self.pitch_h)
+        if col >= self.cols or dx >= self.btn_w or dy >= self.btn_h:
+            return None
+        index = row * self.cols + col
+        return index if index < len(self.paths) else None
+
+    # ---------- 绘制 ----------
+    def _tile(self, index):
+        cached = self.tiles.get(index)
+        if cached is not None:
+            return cached[0]
+        path = self.paths[index]
+        surface = pygame.Surface((self.btn_w, self.btn_h)).convert()
+        surface.fill(BACKGROUND)
+        pygame.draw.rect(surface, BUTTON, surface.get_rect(), border_radius=12)
+        txt = text_cache.render(os.path.basename(path), self.font_size, face='arial', bold=True)
+        thumb = self.thumbs.get(path)  # 第一次画到时才提交抽帧；没好之前只画按钮和文件名
+        center = surface.get_rect().center
+        if thumb is None:
+            surface.blit(txt, txt.get_rect(center=center))
+        else:
+            surface.blit(thumb, thumb.get_rect(center=center))
+            surface.blit(txt, txt.get_rect(midbottom=(center[0], self.btn_h - 8)))
+        self.tiles[index] = (surface, thumb is not None)
+        return surface
+
+    def _evict(self, shown):
+        """只留可见范围前后各一页的按钮 Surface"""
+        page = self.rows * self.cols
+        low, high = shown.start - page, shown.stop + page
+        for index in [i for i in self.tiles if not low <= i < high]:
+            del self.tiles[index]
+
+    def _thumbs_arrived(self, shown):
+        """可见按钮里缩略图刚到的，丢掉旧 Surface 重画"""
+        for index in shown:
+            cached = self.tiles.get(index)
+            if cached is not None and not cached[1] and self.thumbs.get(self.paths[index]) is not None:
+                del self.tiles[index]
+                self.dirty = True
+
+    def invalidate(self):
+        """屏幕被别的内容盖过（比如播完视频回来），下次 draw 整屏重画"""
+        self.dirty = True
+
+    def draw(self, surface):
+        """有变化时重画整屏并 flip，没有变化时什么也不做"""
+        shown = self.visible()
+        self._thumbs_arrived(shown)
+        if not self.dirty:
+            return
+        surface.fill(BACKGROUND)
+        surface.set_clip(self.viewport)  # 拖动时上下露出一半的按钮不画进边距
+        for index in shown:
+            surface.blit(self._tile(index), self.rect(index))
+        surface.set_clip(None)
+        if self.max_scroll:
+            # 右边距里的滚动条
+            track = self.viewport.height
+            bar = max(24, track * track // (track + self.max_scroll))
+            top = MARGIN + (track - bar) * self.scroll // self.max_scroll
+            pygame.draw.rect(surface, (90, 90, 90), (self.width - MARGIN + 6, top, 8, bar), border_radius=4)
+        self._evict(shown)
+        pygame.display.flip()
+        self.dirty = False
+
+    # ---------- 输入 ----------
+    def scroll_to(self, scroll):
+        scroll = max(0, min(self.max_scroll, scroll))
+        if scroll != self.scroll:
+            self.scroll = scroll
+            self.dirty = True
+
+    def _snap(self):
+        self.scroll_to(round(self.scroll / self.pitch_h) * self.pitch_h)
+
+    def _pos(self, event):
+        if event.type in (pygame.FINGERDOWN, pygame.FINGERMOTION, pygame.FINGERUP):
+            return int(event.x * self.width), int(event.y * self.height)
+        return event.pos
+
+    def handle(self, event):
+        """处理一个事件，点中按钮时返回视频路径"""
+        if getattr(event, "touch", False):
+            return None  # SDL 从触摸合成的鼠标事件，已经按 FINGER* 处理过
+        if event.type in (pygame.FINGERDOWN, pygame.MOUSEBUTTONDOWN):
+            if event.type == pygame.FINGERDOWN or event.button == 1:
+                self.press, self.dragging = (self._pos(event), self.scroll), False
+                index = self.index_at(self.press[0])
+                if index is not None and self.on_press:
+                    self.on_press(self.paths[index])
+        elif event.type in (pygame.FINGERMOTION, pygame.MOUSEMOTION) and self.press is not None:
+            (x, y), scroll = self.press
+            dy = self._pos(event)[1] - y
+            if abs(dy) > DRAG_THRESHOLD and not self.dragging:
+                self.dragging = True
+                if self.on_cancel:
+                    self.on_cancel()
+            if self.dragging:
+                self.scroll_to(scroll - dy)
+        elif event.type in (pygame.FINGERUP, pygame.MOUSEBUTTONUP) and self.press is not None:
+            (pos, _), dragging = self.press, self.dragging
+            self.press, self.dragging = None, False
+            if dragging:
+                self._snap()
+                return None
+            # 按下和松开落在同一个按钮上才算点击
+            index = self.index_at(pos)
+            if index is not None and index == self.index_at(self._pos(event)):
+                return self.paths[index]
+            if self.on_cancel:
+                self.on_cancel()
+        elif event.type == pygame.MOUSEWHEEL:
+            self.scroll_to(self.scroll - event.y * self.pitch_h)
+        elif event.type == pygame.KEYDOWN:
+            step = {pygame.K_UP: -self.pitch_h, pygame.K_DOWN: self.pitch_h,
+                    pygame.K_PAGEUP: -self.rows * self.pitch_h, pygame.K_PAGEDOWN: self.rows * self.pitch_h,
+                    pygame.K_HOME: -self.max_scroll, pygame.K_END: self.max_scroll}.get(event.key)
+            if step is not None:
+                self.scroll_to(self.scroll + step)
+        return None
+
+    def close(self):
+        self.thumbs.close()
@@ -0,0 +1,108 @@
+"""
+读取视频流的元数据：分辨率、帧率、色彩矩阵和范围
+优先用 ffprobe 的 JSON 输出；没有 ffprobe 时解析 `ffmpeg -i` 打印的流信息。
+"""
+import json
+import re
+import shutil
+import subprocess
+from collections import namedtuple
+
+VideoInfo = namedtuple("VideoInfo", "codec width height fps matrix full_range duration")
+
+DEFAULT_FPS = 30.0
+DEFAULT_CODEC = "h264"
+
+# ffprobe 的 color_space 取值到 yuv_convert.MATRICES 的键
+COLOR_SPACES = {
+    "bt709": "bt709",
+    "bt470bg": "bt601",
+    "smpte170m": "bt601",
+    "bt601": "bt601",
+}
+
+
+def _rate(text):
+    """'30000/1001' → 29.97"""
+    try:
+        num, _, den = text.partition("/")
+        value = float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return None
+    return value if value > 0 else None
+
+
+def _guess_matrix(height, color_space):
+    # 没有标注时按惯例：高清用 BT.709，标清用 BT.601
+    if color_space in COLOR_SPACES:
+        return COLOR_SPACES[color_space]
+    return "bt709" if height >= 720 else "bt601"
+
+
+def _probe_ffprobe(path):
+    out = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "v:0", "-print_format", "json",
+         "-show_entries", "stream=codec_name,width,height,avg_frame_rate,r_frame_rate,color_space,color_range,pix_fmt"
+                          ":format=duration", path],
+        capture_output=True, text=True, timeout=10).stdout
+    data = json.loads(out or "{}")
+    streams = data.get("streams") or []
+    if not streams:
+        return None
+    s = streams[0]
+    width, height = int(s["width"]), int(s["height"])
+    fps = _rate(s.get("avg_frame_rate", "")) or _rate(s.get("r_frame_rate", "")) or DEFAULT_FPS
+    full_range = s.get("color_range") in ("pc", "jpeg") or s.get("pix_fmt", "").startswith("yuvj")
+    try:
+        duration = float(data.get("format", {}).get("duration"))
+    except (TypeError, ValueError):
+        duration = None
+    return VideoInfo(s.get("codec_name", DEFAULT_CODEC), width, height, fps,
+                     _guess_matrix(height, s.get("color_space")), full_range, duration)
+
+
+STREAM_RE = re.compile(r"Stream #\d+:\d+.*?: Video: (?P<desc>.*)")
+SIZE_RE = re.compile(r"\b(\d{2,5})x(\d{2,5})\b")
+FPS_RE = re.compile(r"([\d.]+) fps")
+DURATION_RE = re.compile(r"Duration: (\d+):(\d+):([\d.]+)")
+
+
+def _probe_ffmpeg(path):
+    # ffmpeg -i 没有输出文件时以错误退出，流信息在 stderr 里
+    err = subprocess.run(["ffmpeg", "-hide_banner", "-i", path],
+                         capture_output=True, text=True, timeout=10).stderr
+    match = STREAM_RE.search(err)
+    size = SIZE_RE.search(match.group("desc")) if match else None
+    if not size:
+        return None
+    desc = match.group("desc")
+    width, height = int(size.group(1)), int(size.group(2))
+    fps = FPS_RE.search(desc)
+    fps = float(fps.group(1)) if fps else DEFAULT_FPS
+    # 形如 "yuv420p(tv, bt709, progressive)" 或 "yuvj420p(pc)"
+    fmt = re.search(r"(yuvj?\w+)\(([^)]*)\)", desc)
+    tags = [t.strip() for t in fmt.group(2).split(",")] if fmt else []
+    full_range = "pc" in tags or (fmt is not None and fmt.group(1).startswith("yuvj"))
+    color_space = next((t.split("/")[0] for t in tags if t.split("/")[0] in COLOR_SPACES), None)
+    duration = DURATION_RE.search(err)
+    if duration:
+        h, m, s = duration.groups()
+        duration = int(h) * 3600 + int(m) * 60 + float(s)
+    codec = desc.split()[0].rstrip(",")
+    return VideoInfo(codec, width, height, fps, _guess_matrix(height, color_space), full_range, duration)
+
+
+def probe(path, default_size=(1280, 720)):
+    """返回 VideoInfo；探测失败时返回 H.264、默认尺寸、30fps、有限范围"""
+    info = None
+    try:
+        if shutil.which("ffprobe"):
+            info = _probe_ffprobe(path)
+        if info is None and shutil.which("ffmpeg"):
+            info = _probe_ffmpeg(path)
+    except (OSError, ValueError, KeyError, subprocess.SubprocessError):
+        info = None
+    if info is None:
+        width, height = default_size
+        info = VideoInfo(DEFAULT_CODEC, width, height, DEFAULT_FPS, _guess_matrix(height, None), False, None)
+    return info
@@ -0,0 +1,90 @@
+"""
+NV12 → RGB 的 NumPy 转换
+给没有可用 GL、ffmpeg 又只能输出 NV12（如硬解码器）的场合用。
+亮度在全分辨率上算一次，三项色度在半分辨率上算，横向复制（整数位运算，不拷贝两遍）后
+沿行方向广播加到亮度上，结果直接写进目标数组（如 surfarray.pixels3d 的视图），不分配临时帧。
+"""
+import numpy as np
+
+# (Kr, Kb)
+MATRICES = {
+    "bt601": (0.299, 0.114),
+    "bt709": (0.2126, 0.0722),
+}
+
+
+def yuv_coefficients(matrix="bt601", full_range=False):
+    """
+    返回 (亮度缩放, 亮度偏移, 色度缩放, Cr→R, Cb→G, Cr→G, Cb→B)，
+    RGB = (Y - 偏移) * 亮度缩放 + 色度缩放 * 系数 * (C - 128)
+    """
+    kr, kb = MATRICES[matrix]
+    kg = 1.0 - kr - kb
+    rv = 2.0 * (1.0 - kr)
+    bu = 2.0 * (1.0 - kb)
+    gu = -bu * kb / kg
+    gv = -rv * kr / kg
+    if full_range:
+        return 1.0, 0.0, 1.0, rv, gu, gv, bu
+    # 有限范围：Y 在 16..235，色度在 16..240
+    return 255.0 / 219.0, 16.0, 255.0 / 224.0, rv, gu, gv, bu
+
+
+def _duplicate_columns(half, out):
+    """把 (行, 列) float32 每列复制一份写进 (行, 2*列) 的 out：两个相同的 32 位拼成一个 64 位"""
+    bits = half.view(np.uint32)
+    np.multiply(bits, np.uint64(0x100000001), out=out.view(np.uint64).reshape(bits.shape),
+                dtype=np.uint64)
+
+
+class NV12Converter:
+    def __init__(self, width, height, matrix="bt601", full_range=False):
+        self.width, self.height = width, height
+        y_scale, y_offset, c_scale, rv, gu, gv, bu = yuv_coefficients(matrix, full_range)
+        self.y_scale = np.float32(y_scale)
+        # 四舍五入的 0.5 并进亮度偏移，最后转 uint8 时直接截断
+        self.y_bias = np.float32(0.5 - y_offset * y_scale)
+        self.c_scale = c_scale
+        self.coefficients = np.float32(rv), np.float32(gu), np.float32(gv), np.float32(bu)
+
+        h2, w2 = height // 2, width // 2
+        # 全分辨率像素按 (半高, 2, 宽) 排列，色度 (半高, 1, 宽) 沿第二维广播，内层循环是整行
+        self.luma = np.empty((h2, 2, width), dtype=np.float32)
+        self.u = np.empty((h2, w2), dtype=np.float32)
+        self.v = np.empty((h2, w2), dtype=np.float32)
+        self.half = np.empty((h2, w2), dtype=np.float32)
+        self.scratch = np.empty((h2, w2), dtype=np.float32)
+        self.term = np.empty((h2, 1, width), dtype=np.float32)
+        self.channel = np.empty((h2, 2, width), dtype=np.float32)
+
+    def convert(self, nv12, out):
+        """nv12：一帧 NV12 字节（bytes/bytearray/memoryview）；out：(高, 宽, 3) uint8 数组或视图"""
+        w, h = self.width, self.height
+        h2, w2 = h // 2, w // 2
+        y = np.frombuffer(nv12, dtype=np.uint8, count=w * h).reshape(h2, 2, w)
+        uv = np.frombuffer(nv12, dtype=np.uint8, count=w * h // 2, offset=w * h).reshape(h2, w2, 2)
+
+        np.multiply(y, self.y_scale, out=self.luma, dtype=np.float32)
+        self.luma += self.y_bias
+        u, v, half, term = self.u, self.v, self.half, self.term
+        np.subtract(uv[..., 0], 128, out=u, dtype=np.float32)
+        u *= np.float32(self.c_scale)
+        np.subtract(uv[..., 1], 128, out=v, dtype=np.float32)
+        v *= np.float32(self.c_scale)
+        rv, gu, gv, bu = self.coefficients
+
+        channel = self.channel
+        for i in range(3):
+            if i == 0:
+                np.multiply(v, rv, out=half)
+            elif i == 1:
+                np.multiply(u, gu, out=half)
+                np.multiply(v, gv, out=self.scratch)
+                half += self.scratch
+            else:
+                np.multiply(u, bu, out=half)
+            _duplicate_columns(half, term.reshape(h2, w))
+            np.add(self.luma, term, out=channel)
+            np.clip(channel, 0, 255, out=channel)
+            out[..., i] = channel.reshape(h, w)
+        return out